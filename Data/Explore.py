@@ -1,15 +1,23 @@
+import argparse
 import json
 import re
 import sqlite3
+import numpy as np
+from functools import partial
 from pathlib import Path
 
-file_path = "rigveda_data.json"
-db_path = Path(__file__).parent.parent / "hymn_vectors.db"
+from bulk_load import ReplaceTable
+from corpus import LoadCorpus
+from deity_matcher import DeityMatcher
+from migrations import (DEITY_INDEX_INDEXES, DEITY_INDEX_SQL, HYMN_VECTORS_INDEXES,
+                        HYMN_VECTORS_SQL, Migrate)
+from parallel import MapByBook
 
-with open(file_path, "r") as file:
-    data = json.load(file)
+DATA_DIR = Path(__file__).parent
+title_map_path = DATA_DIR / "JSONMaps" / "title_map.json"
+db_path = DATA_DIR.parent / "hymn_vectors.db"
 
-print(f"Total hymns: {data['total_hymns']}")
+corpus = LoadCorpus()
 title_map={}
 skipList=set(["variousdeities", "unknown", "etc", "the", "gods", "various", "press", "post", "go", "some", "others", "new", "others-", "fathers"])
 
@@ -31,111 +39,78 @@ def insertintoTitleMap(deity, ref):
         title_map[deity].append(ref)
 
 def get_title_map():
-    for i,book in data['books'].items():
-        for j,hymn in book['hymns'].items():
-            title=hymn['title'].split()
-            deity="UNKNOWN"
-
-            if len(title)>2:
-                deity="".join(title[2:])
-
-            ref=f"Book {book['book_number']}, Hymn {hymn['hymn_number']}"
-            deity=NormalizeWord(deity)
-            if deity in skipList:
-                continue
-            elif len(title)==3:
-                if "-" in deity:
-                    deity1=NormalizeWord(deity.split("-")[0])
-                    deity2=NormalizeWord(deity.split("-")[1])
-                    insertintoTitleMap(deity1, ref)
-                    insertintoTitleMap(deity2, ref)
-                else:
-                    insertintoTitleMap(deity, ref)
-            elif len(title)==4:
-                deity1=NormalizeWord(title[2])
-                deity2=NormalizeWord(title[3])
-                insertintoTitleMap(deity1, ref)
-                insertintoTitleMap(deity2, ref)
-            elif len(title)==5 and NormalizeWord(title[3]) == "and":
-                deity1=NormalizeWord(title[2])
-                deity2=NormalizeWord(title[4])
+    for hymn in corpus:
+        title=hymn.title.split()
+        deity="UNKNOWN"
+
+        if len(title)>2:
+            deity="".join(title[2:])
+
+        ref=f"Book {hymn.book_number}, Hymn {hymn.hymn_number}"
+        deity=NormalizeWord(deity)
+        if deity in skipList:
+            continue
+        elif len(title)==3:
+            if "-" in deity:
+                deity1=NormalizeWord(deity.split("-")[0])
+                deity2=NormalizeWord(deity.split("-")[1])
                 insertintoTitleMap(deity1, ref)
                 insertintoTitleMap(deity2, ref)
             else:
-                pass
+                insertintoTitleMap(deity, ref)
+        elif len(title)==4:
+            deity1=NormalizeWord(title[2])
+            deity2=NormalizeWord(title[3])
+            insertintoTitleMap(deity1, ref)
+            insertintoTitleMap(deity2, ref)
+        elif len(title)==5 and NormalizeWord(title[3]) == "and":
+            deity1=NormalizeWord(title[2])
+            deity2=NormalizeWord(title[4])
+            insertintoTitleMap(deity1, ref)
+            insertintoTitleMap(deity2, ref)
+        else:
+            pass
 
     sorted_title_map=dict(sorted(title_map.items(), key=lambda x: len(x[1]), reverse=True))
-    with open("title_map.json", "w", encoding='utf-8') as file:
+    with open(title_map_path, "w", encoding='utf-8') as file:
         json.dump(sorted_title_map, file, indent=4, ensure_ascii=False)
     for k in sorted_title_map.keys():
         print(k,len(sorted_title_map[k]))
 
     print(f"Total deities: {len(sorted_title_map)}")
 
-def CreateDatabaseSchema():
-    """Create database schema for hymn vectors"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute("DROP TABLE IF EXISTS hymn_vectors")
-    cursor.execute("DROP TABLE IF EXISTS deity_index")
-    
-    cursor.execute('''
-        CREATE TABLE hymn_vectors (
-            hymn_id TEXT PRIMARY KEY,
-            book_number INTEGER,
-            hymn_number INTEGER,
-            title TEXT,
-            deity_vector TEXT,
-            deity_names TEXT,
-            deity_count INTEGER,
-            hymn_score REAL
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE deity_index (
-            deity_id INTEGER PRIMARY KEY,
-            deity_name TEXT UNIQUE,
-            vector_position INTEGER,
-            deity_frequency INTEGER
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    print(f"✓ Database schema created at {db_path}")
+HYMN_VECTORS_COLUMNS = ("hymn_id", "book_number", "hymn_number", "title", "deity_vector", "deity_names", "deity_count", "hymn_score")
 
 def PopulateDeityIndex(deity_to_index, title_map):
-    """Populate deity index table with deity names, positions, and frequencies"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    for deity, idx in deity_to_index.items():
-        frequency = len(title_map[deity])
-        cursor.execute(
-            'INSERT OR REPLACE INTO deity_index (deity_id, deity_name, vector_position, deity_frequency) VALUES (?, ?, ?, ?)',
-            (idx, deity, idx, frequency)
-        )
-    
-    conn.commit()
-    conn.close()
-    print(f"✓ Populated deity index with {len(deity_to_index)} deities")
-
-def NormalizeTextWords(text):
-    """Split text into words and normalize each word"""
-    words = re.split(r'\s+', text)
-    normalized_words = set()
-    for word in words:
-        normalized = NormalizeWord(word)
-        if normalized:
-            normalized_words.add(normalized)
-    return normalized_words
-
-def CreateHymnVectors():
+    """Rebuild the deity index table with deity names, positions, and frequencies"""
+    rows = ((idx, deity, idx, len(title_map[deity])) for deity, idx in deity_to_index.items())
+    count = ReplaceTable("deity_index", DEITY_INDEX_SQL, ("deity_id", "deity_name", "vector_position", "deity_frequency"),
+                         rows, indexSql=DEITY_INDEX_INDEXES, dbPath=db_path)
+    print(f"✓ Populated deity index with {count} deities")
+
+def HymnVectorRow(matcher, deity_frequency, hymn):
+    """Build the hymn_vectors row for one hymn"""
+    # A deity is present when some normalized word of the title or text equals it
+    present = matcher.TokenPresence(hymn.title + " " + hymn.text)
+    
+    vector = [0] * len(matcher.names)
+    hymn_deities = []
+    hymn_score = 0.0
+    
+    for idx, deity in enumerate(matcher.names):
+        if present[idx]:
+            vector[idx] = 1
+            hymn_deities.append(deity)
+            hymn_score += deity_frequency[deity]
+    
+    vector_blob = np.packbits(np.array(vector, dtype=np.uint8)).tobytes()
+    return (hymn.hymn_id, hymn.book_number, hymn.hymn_number, hymn.title,
+            vector_blob, json.dumps(hymn_deities), sum(vector), hymn_score)
+
+def CreateHymnVectors(jobs=None):
     """Generate hymn vectors based on deity presence in text and store in database"""
     
-    with open("title_map.json", "r", encoding='utf-8') as file:
+    with open(title_map_path, "r", encoding='utf-8') as file:
         title_map = json.load(file)
     
     deity_list = list(title_map.keys())
@@ -143,52 +118,12 @@ def CreateHymnVectors():
     deity_frequency = {deity: len(refs) for deity, refs in title_map.items()}
     
     print(f"\nGenerating hymn vectors with {len(deity_list)} deities...")
-    CreateDatabaseSchema()
     PopulateDeityIndex(deity_to_index, title_map)
-    
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute('DELETE FROM hymn_vectors')
-    
-    total_hymns = 0
-    for book_key, book in data['books'].items():
-        for hymn_key, hymn in book['hymns'].items():
-            hymn_id = str(hymn['hymn_number'])
-            book_num = book['book_number']
-            hymn_num = hymn['hymn_number']
-            title = hymn['title']
-            
-            title_words = NormalizeTextWords(title)
-            text_words = NormalizeTextWords(hymn['text'])
-            all_words = title_words.union(text_words)
-            
-            vector = [0] * len(deity_list)
-            hymn_deities = []
-            hymn_score = 0.0
-            
-            for deity, idx in deity_to_index.items():
-                if deity in all_words:
-                    vector[idx] = 1
-                    hymn_deities.append(deity)
-                    hymn_score += deity_frequency[deity]
-            
-            vector_json = json.dumps(vector)
-            deities_json = json.dumps(hymn_deities)
-            deity_count = sum(vector)
-            
-            cursor.execute('''
-                INSERT INTO hymn_vectors 
-                (hymn_id, book_number, hymn_number, title, deity_vector, deity_names, deity_count, hymn_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (hymn_id, book_num, hymn_num, title, vector_json, deities_json, deity_count, hymn_score))
-            
-            total_hymns += 1
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"✓ Stored {total_hymns} hymn vectors in database")
+    matcher = DeityMatcher(deity_list, normalize=NormalizeWord)
+    rows = MapByBook(partial(HymnVectorRow, matcher, deity_frequency), jobs=jobs)
+    total_hymns = ReplaceTable("hymn_vectors", HYMN_VECTORS_SQL, HYMN_VECTORS_COLUMNS, rows,
+                               indexSql=HYMN_VECTORS_INDEXES, dbPath=db_path)
+    print(f"✓ Stored {total_hymns} hymn vectors in {db_path}")
     
     PrintVectorStatistics()
 
@@ -221,8 +156,14 @@ def PrintVectorStatistics():
     conn.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the deity index and hymn vectors")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    Migrate(db_path)
+    print(f"Total hymns: {len(corpus)}")
     get_title_map()
-    CreateHymnVectors()
+    CreateHymnVectors(args.jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+"""
+Benchmark the scraper against the local fixture server.
+
+Four crawls share one throwaway cache: cold (every page downloaded), warm
+(every page served from the cache, no network), revalidate (every page
+checked with a conditional request and answered 304) and reparse (offline,
+extraction only). The scraped hymns are compared with the corpus they were
+generated from, and the old sequential crawler's time is estimated from its
+fixed delays (1-3 s before every request plus 2-4 s after every hymn).
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from corpus import LoadCorpus
+from fetch_engine import FetchEngine
+from fixture_server import StartFixtureServer
+from hymn_parser import PARSER
+from rigveda_scraper import RigVedaScraper
+
+def Crawl(baseUrl: str, cacheDir: Path, concurrency: int, rate: float, parseJobs: int,
+          revalidate: bool = False, offline: bool = False):
+    engine = FetchEngine(cacheDir, concurrencyPerHost=concurrency, requestsPerSecond=rate,
+                         burst=concurrency, revalidate=revalidate, offline=offline)
+    scraper = RigVedaScraper(baseUrl, engine, journal_path=None, parse_jobs=parseJobs)
+    start = time.perf_counter()
+    result = asyncio.run(scraper.ScrapeAllBooks())
+    elapsed = time.perf_counter() - start
+    engine.Close()
+    return elapsed, result, engine.stats
+
+def CountMismatches(result, corpus) -> int:
+    """Hymns whose scraped title or text differs from the corpus"""
+    mismatches = 0
+    for hymn in corpus:
+        scraped = result['books'].get(hymn.book_number, {}).get('hymns', {}).get(hymn.hymn_number)
+        if scraped is None or scraped['title'] != hymn.title or scraped['text'] != hymn.text:
+            mismatches += 1
+    return mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraper against the fixture server")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fixture server adds per response")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1000.0, help="requests per second per host")
+    parser.add_argument("--parse-jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    corpus = LoadCorpus()
+    server = StartFixtureServer(latency=args.latency)
+    pages = len(server.handler.pages)
+    legacyEstimate = pages * 2.0 + len(corpus) * 3.0 + pages * args.latency
+
+    print(f"{pages} pages, latency {args.latency}s, concurrency {args.concurrency}, rate {args.rate}/s, "
+          f"parser {PARSER} x{args.parse_jobs}")
+    print(f"{'crawl':>12} {'seconds':>9} {'requests':>9} {'cached':>7} {'304':>5} {'mismatches':>11}")
+    with tempfile.TemporaryDirectory() as cacheDir:
+        for name, revalidate, offline in (("cold", False, False), ("warm", False, False),
+                                          ("revalidate", True, False), ("reparse", False, True)):
+            elapsed, result, stats = Crawl(server.base_url, Path(cacheDir), args.concurrency, args.rate,
+                                           args.parse_jobs, revalidate, offline)
+            print(f"{name:>12} {elapsed:>9.2f} {stats['requests']:>9} {stats['cache_hits']:>7} "
+                  f"{stats['not_modified']:>5} {CountMismatches(result, corpus):>11}")
+    server.shutdown()
+    print(f"Old sequential crawler, delays alone: ~{legacyEstimate / 3600:.1f} h")
+
+if __name__ == "__main__":
+    main()
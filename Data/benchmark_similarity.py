@@ -0,0 +1,65 @@
+"""
+Benchmark the tiled all-pairs similarity engine on synthetic hymn corpora.
+
+Synthetic hymns mirror the real deity vectors (89 deities, ~5.4 deities per
+hymn). For each corpus size the engine is timed end to end (tiles computed
+and filtered, nothing written to the database); the legacy per-pair loop is
+timed on a sample of pairs and extrapolated.
+"""
+
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from hymn_similarity import CosineSimilarity, IterPairwiseSimilarityBlocks, METRICS, PackVectorMatrix
+
+NUM_DEITIES = 89
+DEITIES_PER_HYMN = 5.4
+
+def MakeSyntheticVectors(numHymns: int, seed: int = 0) -> np.ndarray:
+    """Random 0/1 deity vectors with the real corpus density"""
+    rng = np.random.default_rng(seed)
+    return (rng.random((numHymns, NUM_DEITIES)) < DEITIES_PER_HYMN / NUM_DEITIES).astype(np.uint8)
+
+def TimeEngine(matrix: np.ndarray, metric: str, minSimilarity: float, jobs: int) -> tuple:
+    start = time.perf_counter()
+    kept = 0
+    packed = PackVectorMatrix(matrix)
+    for _, _, values in IterPairwiseSimilarityBlocks(packed, metric, minSimilarity, jobs):
+        kept += len(values)
+    return time.perf_counter() - start, kept
+
+def TimeLegacyLoop(matrix: np.ndarray, samplePairs: int = 20000) -> float:
+    """Seconds the old nested loop would need for all pairs, extrapolated from a sample"""
+    vectors = matrix.tolist()
+    numHymns = len(vectors)
+    rng = random.Random(0)
+    pairs = [(rng.randrange(numHymns), rng.randrange(numHymns)) for _ in range(samplePairs)]
+    start = time.perf_counter()
+    for i, j in pairs:
+        CosineSimilarity(vectors[i], vectors[j])
+    perPair = (time.perf_counter() - start) / samplePairs
+    return perPair * numHymns * (numHymns - 1) / 2
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark all-pairs hymn similarity")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--metric", choices=METRICS, default="cosine")
+    parser.add_argument("--min-similarity", type=float, default=0.3)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"Metric: {args.metric}, threshold: {args.min_similarity}, jobs: {args.jobs}")
+    print(f"{'hymns':>8} {'pairs':>15} {'kept':>15} {'engine (s)':>11} {'legacy est. (s)':>16} {'speedup':>8}")
+    for numHymns in args.sizes:
+        matrix = MakeSyntheticVectors(numHymns)
+        elapsed, kept = TimeEngine(matrix, args.metric, args.min_similarity, args.jobs)
+        legacy = TimeLegacyLoop(matrix)
+        totalPairs = numHymns * (numHymns - 1) // 2
+        print(f"{numHymns:>8,} {totalPairs:>15,} {kept:>15,} {elapsed:>11.2f} {legacy:>16.1f} {legacy / elapsed:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
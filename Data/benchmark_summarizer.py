@@ -0,0 +1,62 @@
+"""
+Benchmark the summarization engine against the local mock chat server.
+
+The mock enforces the given requests- and tokens-per-minute limits and adds
+a fixed latency per completion. Real hymns are summarized with several
+requests in flight; the achieved rate is compared with the limit, and the
+number of 429s shows how well the client-side limiter tracks the server.
+With --batch-size > 1 short hymns share a request, which cuts the repeated
+prompt overhead per hymn. The old loop slept 10 s after every call, i.e.
+under 6 requests per minute.
+"""
+
+import argparse
+import asyncio
+import time
+from itertools import islice
+
+from chat_client import ChatClient, TokenBucketLimiter
+from corpus import LoadCorpus
+from mock_chat_server import StartMockChatServer
+from summarize_hymns_groq import IterateHymns, PackBatches, SummarizeAll
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hymn summarization against a mock API")
+    parser.add_argument("--hymns", type=int, default=120)
+    parser.add_argument("--rpm", type=int, default=300)
+    parser.add_argument("--tpm", type=int, default=200000)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--batch-size", type=int, default=1, help="hymns per request (1 = no batching)")
+    parser.add_argument("--batch-tokens", type=int, default=1500)
+    args = parser.parse_args()
+
+    pending = list(islice(IterateHymns(LoadCorpus()), args.hymns))
+    batches = PackBatches(pending, args.batch_size, args.batch_tokens)
+    print(f"{args.hymns} hymns in {len(batches)} requests, limits {args.rpm} req/min and {args.tpm} tokens/min, "
+          f"latency {args.latency}s")
+    print(f"{'concurrency':>11} {'seconds':>8} {'hymns/min':>10} {'tok/hymn':>9} {'429s':>5} {'failed':>7}")
+    for concurrency in args.concurrency:
+        server = StartMockChatServer(rpm=args.rpm, tpm=args.tpm, latency=args.latency)
+
+        async def Run():
+            # Start with empty buckets so the run measures the sustained rate, not the burst
+            limiter = TokenBucketLimiter(args.rpm, args.tpm)
+            limiter.requestLevel = limiter.tokenLevel = 0.0
+            client = ChatClient("mock", server.api_url, limiter, concurrency=concurrency)
+            try:
+                return await SummarizeAll(client, batches, {}, concurrency), client.stats
+            finally:
+                client.Close()
+
+        start = time.monotonic()
+        counts, stats = asyncio.run(Run())
+        elapsed = time.monotonic() - start
+        server.shutdown()
+        print(f"{concurrency:>11} {elapsed:>8.1f} {counts['processed'] * 60 / elapsed:>10.1f} "
+              f"{stats['tokens'] / max(counts['processed'], 1):>9.0f} {server.handler.counter['rejected']:>5} "
+              f"{counts['failed']:>7}")
+    print(f"Old loop: < {60 / (10 + args.latency):.1f} req/min")
+
+if __name__ == "__main__":
+    main()
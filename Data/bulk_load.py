@@ -0,0 +1,134 @@
+"""
+Bulk loading helpers shared by the Data scripts.
+
+ReplaceTable rebuilds and indexes a table next to the live one, then swaps
+it in with a transaction that only drops the old table and renames the new
+one, so the API keeps reading the old rows until the new table (with its
+indexes) is complete. BulkUpdate applies many single-row
+updates with one executemany in one transaction.
+"""
+
+import re
+import sqlite3
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+DB_PATH = Path(__file__).parent.parent / "hymn_vectors.db"
+BATCH_SIZE = 10000
+
+# Only memory settings are relaxed while loading. Staging tables live in the
+# same file as the live tables, so every commit keeps SQLite's default
+# durability: an unsynced commit could corrupt the whole database on power
+# loss, not just the staging rows.
+LOAD_PRAGMAS = (
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+)
+
+def _Connect(dbPath: Path) -> sqlite3.Connection:
+    # Autocommit mode: transactions are opened explicitly below
+    conn = sqlite3.connect(dbPath, isolation_level=None, timeout=30)
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _ExecuteBatches(conn: sqlite3.Connection, sql: str, rows: Iterable[Sequence], batchSize: int) -> int:
+    inserted = 0
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batchSize))
+        if not batch:
+            return inserted
+        conn.executemany(sql, batch)
+        inserted += len(batch)
+
+INDEX_NAME = re.compile(r"CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)", re.IGNORECASE)
+
+def _StagingIndexSql(conn: sqlite3.Connection, tableName: str, stagingName: str, indexSql: Sequence[str]) -> List[str]:
+    """indexSql templates built on the staging table, named so the names survive the rename.
+
+    Index names are unique per database and the live table still holds its
+    indexes while the staging table is built, so the names alternate between
+    two generations: idx_{table}_... and idx_{table}__b_... .
+    """
+    existing = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    statements = []
+    for sql in indexSql:
+        if " ON {table}" not in sql:
+            raise ValueError(f"Index template must target {{table}}: {sql}")
+        onStaging = sql.replace(" ON {table}", f" ON {stagingName}")
+        for generation in (tableName, f"{tableName}__b"):
+            statement = onStaging.format(table=generation)
+            if INDEX_NAME.match(statement.strip()).group(1) not in existing:
+                break
+        else:
+            raise RuntimeError(f"Both index name generations are taken for {tableName}: {sql}")
+        statements.append(statement)
+    return statements
+
+def ReplaceTable(tableName: str, createSql: str, columns: Sequence[str], rows: Iterable[Sequence],
+                 indexSql: Sequence[str] = (), keepWhere: Optional[Tuple[str, Sequence]] = None,
+                 dbPath: Path = DB_PATH, batchSize: int = BATCH_SIZE) -> int:
+    """Load rows into a staging table, index it, and atomically swap it in for tableName.
+
+    createSql and indexSql are templates with a {table} placeholder, e.g.
+    "CREATE TABLE {table} (hymn_id TEXT PRIMARY KEY, ...)". keepWhere is an
+    optional (where clause, params) selecting live rows to carry over into
+    the new table, for tables shared by several writers. Returns the number
+    of rows loaded from rows.
+    """
+    stagingName = f"{tableName}__staging"
+    placeholders = ", ".join("?" for _ in columns)
+    insertSql = f'INSERT INTO {stagingName} ({", ".join(columns)}) VALUES ({placeholders})'
+
+    conn = _Connect(dbPath)
+    try:
+        conn.execute(f'DROP TABLE IF EXISTS {stagingName}')
+        conn.execute(createSql.format(table=stagingName))
+
+        conn.execute('BEGIN')
+        liveExists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tableName,)).fetchone()
+        if keepWhere is not None and liveExists:
+            whereSql, params = keepWhere
+            columnList = ", ".join(columns)
+            conn.execute(f'INSERT INTO {stagingName} ({columnList}) SELECT {columnList} FROM {tableName} WHERE {whereSql}', params)
+        loaded = _ExecuteBatches(conn, insertSql, rows, batchSize)
+        # Indexes are built here, so the swap below holds the write lock only briefly
+        for sql in _StagingIndexSql(conn, tableName, stagingName, indexSql):
+            conn.execute(sql)
+        conn.execute('COMMIT')
+
+        # Swap: readers see either the old table or the complete new one. The
+        # old table's indexes go with it; the new ones keep their names.
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(f'DROP TABLE IF EXISTS {tableName}')
+        conn.execute(f'ALTER TABLE {stagingName} RENAME TO {tableName}')
+        conn.execute('COMMIT')
+        return loaded
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        conn.execute(f'DROP TABLE IF EXISTS {stagingName}')
+        raise
+    finally:
+        conn.close()
+
+def BulkUpdate(tableName: str, keyColumn: str, columns: Sequence[str], rows: Iterable[Sequence],
+               dbPath: Path = DB_PATH, batchSize: int = BATCH_SIZE) -> int:
+    """Apply (value..., key) rows as UPDATEs in a single transaction"""
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    updateSql = f'UPDATE {tableName} SET {assignments} WHERE {keyColumn} = ?'
+
+    conn = _Connect(dbPath)
+    try:
+        conn.execute('BEGIN')
+        updated = _ExecuteBatches(conn, updateSql, rows, batchSize)
+        conn.execute('COMMIT')
+        return updated
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,182 @@
+"""
+Rate-limited asyncio client for an OpenAI-style chat-completions API.
+
+Several requests can be in flight at once; a TokenBucketLimiter decides when
+each may start. Every request reserves one request slot plus an estimate of
+the tokens it will use (prompt size + max completion). The estimate is
+settled against the reported usage once the response arrives, and the
+provider's x-ratelimit-* headers pull the buckets back in line whenever the
+server has counted more than we have. A 429 pauses every request for
+Retry-After.
+"""
+
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+def Log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+def ParseDuration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a rate-limit reset value such as "7.66s", "2m59.56s" or "120ms" """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+def EstimateTokens(messages: List[Dict[str, str]], maxCompletionTokens: int) -> int:
+    """Upper-end guess at a request's token usage, made before sending it"""
+    promptChars = sum(len(message["content"]) for message in messages)
+    return promptChars // 3 + 8 * len(messages) + maxCompletionTokens
+
+class TokenBucketLimiter:
+    """Request and token buckets, each refilled continuously at its per-minute limit"""
+
+    def __init__(self, requestsPerMinute: int = 30, tokensPerMinute: int = 8000):
+        self.requestCapacity = float(requestsPerMinute)
+        self.tokenCapacity = float(tokensPerMinute)
+        self.requestLevel = self.requestCapacity
+        self.tokenLevel = self.tokenCapacity
+        self.updated = time.monotonic()
+        self.blockedUntil = 0.0
+        self._lock = asyncio.Lock()
+
+    def _Refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.requestLevel = min(self.requestCapacity, self.requestLevel + elapsed * self.requestCapacity / 60.0)
+        self.tokenLevel = min(self.tokenCapacity, self.tokenLevel + elapsed * self.tokenCapacity / 60.0)
+        self.updated = now
+
+    async def Acquire(self, tokens: int) -> None:
+        """Wait until one request and `tokens` tokens are available, then take them"""
+        tokens = min(float(tokens), self.tokenCapacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blockedUntil:
+                    await asyncio.sleep(self.blockedUntil - now)
+                    continue
+                self._Refill(now)
+                if self.requestLevel >= 1 and self.tokenLevel >= tokens:
+                    self.requestLevel -= 1
+                    self.tokenLevel -= tokens
+                    return
+                wait = max((1 - self.requestLevel) * 60.0 / self.requestCapacity,
+                           (tokens - self.tokenLevel) * 60.0 / self.tokenCapacity)
+                await asyncio.sleep(max(wait, 0.001))
+
+    def Settle(self, estimatedTokens: int, usedTokens: int) -> None:
+        """Replace a request's estimate with its actual usage (may leave the bucket in debt)"""
+        self._Refill(time.monotonic())
+        self.tokenLevel = min(self.tokenCapacity, self.tokenLevel + estimatedTokens - usedTokens)
+
+    def Block(self, seconds: float) -> None:
+        self.blockedUntil = max(self.blockedUntil, time.monotonic() + seconds)
+
+    def Observe(self, headers: Mapping[str, str]) -> None:
+        """Fold the provider's x-ratelimit-* response headers into the buckets"""
+        self._Refill(time.monotonic())
+        remainingTokens = headers.get("x-ratelimit-remaining-tokens")
+        if remainingTokens is not None:
+            try:
+                self.tokenLevel = min(self.tokenLevel, float(remainingTokens))
+            except ValueError:
+                pass
+        remainingRequests = headers.get("x-ratelimit-remaining-requests")
+        if remainingRequests is not None and remainingRequests.strip() == "0":
+            reset = ParseDuration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.Block(reset)
+
+class ChatClient:
+    """POST chat completions from a thread pool, paced by a TokenBucketLimiter"""
+
+    def __init__(self, apiKey: str, apiUrl: str, limiter: TokenBucketLimiter, concurrency: int = 4,
+                 model: str = "openai/gpt-oss-120b", maxAttempts: int = 8, baseDelaySeconds: float = 1.5):
+        self.apiKey = apiKey
+        self.apiUrl = apiUrl
+        self.limiter = limiter
+        self.model = model
+        self.maxAttempts = maxAttempts
+        self.baseDelaySeconds = baseDelaySeconds
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "tokens": 0}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def _Post(self, body: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        req = Request(
+            self.apiUrl,
+            data=json.dumps(body).encode("utf-8"),
+            headers={
+                "Authorization": f"Bearer {self.apiKey}",
+                "Content-Type": "application/json",
+            },
+            method="POST",
+        )
+        with urlopen(req, timeout=90) as resp:
+            return json.loads(resp.read().decode("utf-8")), {k.lower(): v for k, v in resp.headers.items()}
+
+    async def Complete(self, messages: List[Dict[str, str]], maxCompletionTokens: int = 64,
+                       **params: Any) -> Tuple[str, Dict[str, Any]]:
+        """Content of the first choice and the raw response, retrying transient errors"""
+        body = {"model": self.model, "messages": messages, "max_completion_tokens": maxCompletionTokens, **params}
+        estimate = EstimateTokens(messages, maxCompletionTokens)
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                await self.limiter.Acquire(estimate)
+                self.stats["requests"] += 1
+                try:
+                    data, headers = await loop.run_in_executor(self._executor, self._Post, body)
+                except HTTPError as e:
+                    # A rejected request used no tokens
+                    self.limiter.Settle(estimate, 0)
+                    headers = {k.lower(): v for k, v in e.headers.items()} if e.headers else {}
+                    self.limiter.Observe(headers)
+                    attempt += 1
+                    if e.code not in RETRY_STATUSES or attempt >= self.maxAttempts:
+                        Log(f"request: failed after {attempt} attempts, status={e.code}")
+                        raise
+                    delay = ParseDuration(headers.get("retry-after")) or self.baseDelaySeconds * attempt
+                    delay += random.uniform(0, 0.5)
+                    if e.code == 429:
+                        self.stats["rate_limited"] += 1
+                        # Everyone waits, not just this request
+                        self.limiter.Block(delay)
+                    self.stats["retries"] += 1
+                    Log(f"request: transient error status={e.code}, attempt={attempt}, sleeping={delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                except URLError:
+                    self.limiter.Settle(estimate, 0)
+                    Log(f"request: URLError, attempt={attempt + 1}")
+                    raise
+
+                usage = data.get("usage") if isinstance(data, dict) else None
+                usedTokens = usage.get("total_tokens") if isinstance(usage, dict) else None
+                usedTokens = usedTokens if isinstance(usedTokens, int) and usedTokens > 0 else estimate
+                self.limiter.Settle(estimate, usedTokens)
+                self.limiter.Observe(headers)
+                self.stats["tokens"] += usedTokens
+                return data["choices"][0]["message"]["content"].strip(), data
+
+    def Close(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,177 @@
+"""
+Compact, memory-mapped form of rigveda_data.json.
+
+The corpus directory holds three files:
+- hymns.npy: one fixed-width record per hymn (hymn and book number plus the
+  byte offsets of its title, text and url), in corpus order
+- strings.bin: every title, text and url as one UTF-8 blob
+- corpus.json: the size and mtime of the source JSON it was built from
+
+Loading maps both files without parsing anything; strings are decoded only
+when a hymn is read. LoadCorpus (used by the Data scripts) rebuilds the
+corpus when the source JSON changes. OpenCorpus (used by the API) only
+opens a corpus built beforehand, e.g. at image build time.
+
+    python corpus.py            # (re)build Data/Corpus from JSONMaps/rigveda_data.json
+"""
+
+import json
+import mmap
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+DATA_DIR = Path(__file__).parent
+DATA_JSON_PATH = DATA_DIR / "JSONMaps" / "rigveda_data.json"
+CORPUS_DIR = DATA_DIR / "Corpus"
+
+HYMN_DTYPE = np.dtype([
+    ("hymn_number", np.int32),
+    ("book_number", np.int16),
+    ("title_start", np.int64), ("title_end", np.int64),
+    ("text_start", np.int64), ("text_end", np.int64),
+    ("url_start", np.int64), ("url_end", np.int64),
+])
+
+class Hymn(NamedTuple):
+    hymn_id: str
+    book_number: int
+    hymn_number: int
+    title: str
+    text: str
+    url: str
+
+def _SourceStamp(sourcePath: Path) -> Dict[str, int]:
+    stat = sourcePath.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def BuildCorpus(sourcePath: Path = DATA_JSON_PATH, corpusDir: Path = CORPUS_DIR) -> int:
+    """Convert the scraped JSON into the columnar corpus; returns the number of hymns"""
+    stamp = _SourceStamp(sourcePath)
+    with open(sourcePath, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    corpusDir.mkdir(parents=True, exist_ok=True)
+    records = []
+    fd, blobTmp = tempfile.mkstemp(dir=corpusDir, suffix=".bin.tmp")
+    with os.fdopen(fd, "wb") as blob:
+        offset = 0
+        def Write(value: str):
+            nonlocal offset
+            encoded = (value or "").encode("utf-8")
+            blob.write(encoded)
+            offset += len(encoded)
+            return offset - len(encoded), offset
+
+        for book in data["books"].values():
+            for hymn in book["hymns"].values():
+                records.append((hymn["hymn_number"], book["book_number"],
+                                *Write(hymn.get("title", "")), *Write(hymn.get("text", "")), *Write(hymn.get("url", ""))))
+
+    fd, indexTmp = tempfile.mkstemp(dir=corpusDir, suffix=".npy.tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.array(records, dtype=HYMN_DTYPE))
+
+    # The blob goes first so a reader never sees offsets pointing past its end
+    os.replace(blobTmp, corpusDir / "strings.bin")
+    os.replace(indexTmp, corpusDir / "hymns.npy")
+    metaTmp = corpusDir / "corpus.json.tmp"
+    metaTmp.write_text(json.dumps({"source": stamp, "hymns": len(records)}))
+    os.replace(metaTmp, corpusDir / "corpus.json")
+    return len(records)
+
+class Corpus:
+    """Read-only view of the corpus files; strings are decoded on access"""
+
+    def __init__(self, corpusDir: Path = CORPUS_DIR):
+        self.hymns = np.load(corpusDir / "hymns.npy", mmap_mode="r")
+        with open(corpusDir / "strings.bin", "rb") as f:
+            # mmap cannot map an empty file
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        self._positions: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.hymns)
+
+    def _String(self, start: int, end: int) -> str:
+        return self._blob[start:end].decode("utf-8")
+
+    @property
+    def hymnIds(self) -> List[str]:
+        return [str(number) for number in self.hymns["hymn_number"].tolist()]
+
+    def Position(self, hymnId: str) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {hymnId: i for i, hymnId in enumerate(self.hymnIds)}
+        return self._positions.get(str(hymnId))
+
+    def Title(self, i: int) -> str:
+        record = self.hymns[i]
+        return self._String(record["title_start"], record["title_end"])
+
+    def Text(self, i: int) -> str:
+        record = self.hymns[i]
+        return self._String(record["text_start"], record["text_end"])
+
+    def Hymn(self, i: int) -> Hymn:
+        record = self.hymns[i]
+        return Hymn(str(record["hymn_number"]), int(record["book_number"]), int(record["hymn_number"]),
+                    self._String(record["title_start"], record["title_end"]),
+                    self._String(record["text_start"], record["text_end"]),
+                    self._String(record["url_start"], record["url_end"]))
+
+    def GetHymn(self, hymnId: str) -> Optional[Hymn]:
+        i = self.Position(hymnId)
+        return None if i is None else self.Hymn(i)
+
+    def __iter__(self) -> Iterator[Hymn]:
+        for i in range(len(self)):
+            yield self.Hymn(i)
+
+_corpora: Dict[Path, Corpus] = {}
+_corpusLock = threading.Lock()
+
+def _IsCurrent(sourcePath: Path, corpusDir: Path) -> bool:
+    try:
+        meta = json.loads((corpusDir / "corpus.json").read_text())
+    except (OSError, ValueError):
+        return False
+    return meta.get("source") == _SourceStamp(sourcePath) and (corpusDir / "hymns.npy").exists()
+
+def LoadCorpus(sourcePath: Path = DATA_JSON_PATH, corpusDir: Optional[Path] = None) -> Corpus:
+    """Return the corpus for sourcePath, building it first if missing or stale"""
+    sourcePath = Path(sourcePath)
+    corpusDir = Path(corpusDir) if corpusDir else (CORPUS_DIR if sourcePath == DATA_JSON_PATH else sourcePath.with_suffix(".corpus"))
+    with _corpusLock:
+        if corpusDir in _corpora and _IsCurrent(sourcePath, corpusDir):
+            return _corpora[corpusDir]
+        if not _IsCurrent(sourcePath, corpusDir):
+            BuildCorpus(sourcePath, corpusDir)
+        _corpora[corpusDir] = Corpus(corpusDir)
+        return _corpora[corpusDir]
+
+_opened: Dict[Path, Corpus] = {}
+
+def OpenCorpus(corpusDir: Path = CORPUS_DIR) -> Corpus:
+    """Open an already built corpus once per process, never checking or rebuilding it.
+
+    Raises FileNotFoundError if the corpus has not been built (python corpus.py).
+    """
+    corpus = _opened.get(corpusDir)
+    if corpus is None:
+        with _corpusLock:
+            corpus = _opened.get(corpusDir)
+            if corpus is None:
+                corpus = _opened[corpusDir] = Corpus(corpusDir)
+    return corpus
+
+def main():
+    count = BuildCorpus()
+    print(f"✓ Built corpus of {count} hymns at {CORPUS_DIR}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
-import json
 import re
 import sys
-from typing import Any, Dict
+from pathlib import Path
+
+from corpus import Corpus, LoadCorpus
 
 
 wordPattern = re.compile(r"\b[\w’'-]+\b", flags=re.UNICODE)
@@ -11,25 +12,19 @@ def CountWordsInText(text: str) -> int:
     return len(wordPattern.findall(text))
 
 
-def CountTotalWords(jsonPath: str) -> int:
-    with open(jsonPath, "r", encoding="utf-8") as f:
-        data: Dict[str, Any] = json.load(f)
-
+def CountTotalWords(corpus: Corpus) -> int:
     totalWords = 0
-    books = data.get("books", {})
-    for _, book in books.items():
-        hymns = book.get("hymns", {})
-        for _, hymn in hymns.items():
-            text = hymn.get("text", "") or ""
-            if text:
-                totalWords += CountWordsInText(text)
+    for i in range(len(corpus)):
+        text = corpus.Text(i)
+        if text:
+            totalWords += CountWordsInText(text)
     return totalWords
 
 
 def Main() -> None:
-    defaultPath = "/Users/nikunjgoyal/Codes/rigveda/Data/JSONMaps/rigveda_data.json"
+    defaultPath = Path(__file__).parent / "JSONMaps" / "rigveda_data.json"
     jsonPath = sys.argv[1] if len(sys.argv) > 1 else defaultPath
-    print(CountTotalWords(jsonPath))
+    print(CountTotalWords(LoadCorpus(jsonPath)))
 
 
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
 import sqlite3
 import json
+from pathlib import Path
+
+from bulk_load import BulkUpdate
+from migrations import Migrate
 
 # Connect to database
-db_path = '/Users/nikunjgoyal/Codes/rigveda/hymn_vectors.db'
+DATA_DIR = Path(__file__).parent
+db_path = DATA_DIR.parent / 'hymn_vectors.db'
+Migrate(db_path)  # adds deity_color to databases that predate it
 conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
 
@@ -59,26 +65,13 @@ for i, (deity_id, deity_name, hymn_count, freq) in enumerate(deities):
     }
     print(f"{deity_name:15} (ID: {deity_id:2}) → {color}  [{hymn_count} hymns, {freq} mentions]")
 
-# Add deity_color column if it doesn't exist
-cursor.execute("PRAGMA table_info(deity_index)")
-columns = [col[1] for col in cursor.fetchall()]
-if 'deity_color' not in columns:
-    print("\nAdding deity_color column to deity_index table...")
-    cursor.execute("ALTER TABLE deity_index ADD COLUMN deity_color TEXT")
-    conn.commit()
-
 # Update deity colors in database
 print("\nUpdating deity colors in database...")
-for deity_id, data in deity_colors.items():
-    cursor.execute(
-        "UPDATE deity_index SET deity_color = ? WHERE deity_id = ?",
-        (data['color'], deity_id)
-    )
-
-conn.commit()
+BulkUpdate("deity_index", "deity_id", ("deity_color",),
+           [(data['color'], deity_id) for deity_id, data in deity_colors.items()], dbPath=db_path)
 
 # Save color mapping to JSON for reference
-output_path = '/Users/nikunjgoyal/Codes/rigveda/Data/JSONMaps/deity_colors.json'
+output_path = DATA_DIR / 'JSONMaps' / 'deity_colors.json'
 with open(output_path, 'w') as f:
     json.dump(deity_colors, f, indent=2)
 
@@ -0,0 +1,94 @@
+"""
+Multi-pattern deity matcher shared by the deity scripts.
+
+All names are compiled into one regex: a trie of the names inside a
+lookahead, so a single left-to-right scan reports, at every offset, the
+longest name starting there. Shorter names that are prefixes of it are
+added from a precomputed table, which recovers every overlapping
+occurrence the way an Aho-Corasick automaton would. The scan cost depends
+on the text length, not on the number of names.
+
+Token mode (for Explore) instead splits the text on whitespace, normalizes
+each distinct token once and looks it up in a dict of names.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Sequence
+
+def _TrieRegex(names: Sequence[str]) -> str:
+    """Regex for the names with shared prefixes factored out; matches the longest name"""
+    root: Dict = {}
+    for name in names:
+        node = root
+        for ch in name:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def Build(node: Dict) -> str:
+        branches = [re.escape(ch) + Build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Greedy optional tail: prefer the longer name when a shorter one also ends here
+        return f"(?:{body})?" if "" in node else body
+
+    return Build(root)
+
+class DeityMatcher:
+    """Count, locate and detect many names in a text with one scan"""
+
+    def __init__(self, names: Sequence[str], normalize: Optional[Callable[[str], str]] = None):
+        self.names = list(names)
+        if any(not name for name in self.names) or len(set(self.names)) != len(self.names):
+            raise ValueError("Deity names must be non-empty and unique")
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._pattern = re.compile(f"(?=({_TrieRegex(self.names)}))")
+        # Every name that is a prefix of a given name, itself included
+        self._prefixes = {name: [self._index[other] for other in self.names if name.startswith(other)]
+                          for name in self.names}
+        self.normalize = normalize
+        self._tokens: Dict[str, int] = {}
+
+    def Positions(self, text: str) -> List[List[int]]:
+        """Start offsets of every occurrence of each name, overlapping ones included"""
+        positions: List[List[int]] = [[] for _ in self.names]
+        prefixes = self._prefixes
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            for i in prefixes[match.group(1)]:
+                positions[i].append(start)
+        return positions
+
+    def Counts(self, text: str) -> List[int]:
+        """Non-overlapping occurrences of each name, as text.count(name) would report"""
+        counts = []
+        for name, starts in zip(self.names, self.Positions(text)):
+            count = 0
+            nextFree = 0
+            for start in starts:
+                if start >= nextFree:
+                    count += 1
+                    nextFree = start + len(name)
+            counts.append(count)
+        return counts
+
+    def Present(self, text: str) -> List[bool]:
+        """Whether each name occurs anywhere in the text"""
+        present = [False] * len(self.names)
+        for match in self._pattern.finditer(text):
+            for i in self._prefixes[match.group(1)]:
+                present[i] = True
+        return present
+
+    def TokenPresence(self, text: str) -> List[bool]:
+        """Whether each name equals some whitespace-separated token after normalization"""
+        present = [False] * len(self.names)
+        tokens = self._tokens
+        for token in text.split():
+            i = tokens.get(token)
+            if i is None:
+                normalized = self.normalize(token) if self.normalize else token
+                i = tokens[token] = self._index.get(normalized, -1)
+            if i >= 0:
+                present[i] = True
+        return present
@@ -0,0 +1,105 @@
+"""
+Persistent, memory-mapped store of hymn summary embeddings.
+
+Rows live in a float16 .npy file; a JSON sidecar records, for each row, the
+hymn id and a hash of (model name, summary text). Re-running only encodes
+summaries whose hash changed.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DATA_DIR = Path(__file__).parent
+EMBEDDINGS_DIR = DATA_DIR / "Embeddings"
+EMBEDDINGS_PATH = EMBEDDINGS_DIR / "summary_embeddings.npy"
+EMBEDDINGS_META_PATH = EMBEDDINGS_DIR / "summary_embeddings.json"
+
+def SummaryHash(text: str, modelName: str) -> str:
+    """Hash a summary together with the model that embeds it"""
+    return hashlib.sha256(f"{modelName}\0{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    def __init__(self, embeddingsPath: Path = EMBEDDINGS_PATH, metaPath: Path = EMBEDDINGS_META_PATH):
+        self.embeddingsPath = Path(embeddingsPath)
+        self.metaPath = Path(metaPath)
+        self.modelName: Optional[str] = None
+        self.ids: List[str] = []
+        self.hashes: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+
+        if self.embeddingsPath.exists() and self.metaPath.exists():
+            with open(self.metaPath, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.load(self.embeddingsPath, mmap_mode="r")
+            hashes = meta.get("hashes", [])
+            if matrix.shape[0] == len(meta["ids"]) == len(hashes):
+                self.modelName = meta.get("model")
+                self.ids = meta["ids"]
+                self.hashes = hashes
+                self.matrix = matrix
+
+    def Diff(self, summaries: Dict[str, str], modelName: str) -> Tuple[List[str], List[str]]:
+        """Return (changed or new ids, removed ids) relative to the stored rows"""
+        stored = dict(zip(self.ids, self.hashes))
+        changed = [hymnId for hymnId in sorted(summaries)
+                   if stored.get(hymnId) != SummaryHash(summaries[hymnId], modelName)]
+        removed = [hymnId for hymnId in self.ids if hymnId not in summaries]
+        return changed, removed
+
+    def Update(self, summaries: Dict[str, str], encode: Callable[[List[str]], np.ndarray],
+               modelName: str) -> Tuple[List[str], List[str]]:
+        """Encode only new or changed summaries and persist them; returns (changed, removed)"""
+        changed, removed = self.Diff(summaries, modelName)
+        if not changed and not removed:
+            return changed, removed
+
+        newVectors = np.asarray(encode([summaries[hymnId] for hymnId in changed]), dtype=np.float16) if changed else None
+        hymnIds = sorted(summaries)
+        hashes = [SummaryHash(summaries[hymnId], modelName) for hymnId in hymnIds]
+
+        sameShape = self.matrix is not None and newVectors is not None and newVectors.shape[1] == self.matrix.shape[1]
+        if hymnIds == self.ids and sameShape:
+            # Same rows as before: patch the changed rows in place
+            rowOf = {hymnId: i for i, hymnId in enumerate(self.ids)}
+            matrix = np.load(self.embeddingsPath, mmap_mode="r+")
+            for vector, hymnId in zip(newVectors, changed):
+                matrix[rowOf[hymnId]] = vector
+            matrix.flush()
+            del matrix
+        else:
+            dimension = newVectors.shape[1] if newVectors is not None else self.matrix.shape[1]
+            self.embeddingsPath.parent.mkdir(parents=True, exist_ok=True)
+            tmpPath = self.embeddingsPath.with_name(self.embeddingsPath.stem + ".tmp.npy")
+            matrix = np.lib.format.open_memmap(tmpPath, mode="w+", dtype=np.float16, shape=(len(hymnIds), dimension))
+            oldRow = {hymnId: i for i, hymnId in enumerate(self.ids)}
+            newRow = {hymnId: i for i, hymnId in enumerate(changed)}
+            for i, hymnId in enumerate(hymnIds):
+                matrix[i] = newVectors[newRow[hymnId]] if hymnId in newRow else self.matrix[oldRow[hymnId]]
+            matrix.flush()
+            del matrix
+            self.matrix = None
+            os.replace(tmpPath, self.embeddingsPath)
+
+        # The sidecar is written last, so an interrupted run only re-encodes
+        tmpMeta = self.metaPath.with_suffix(".json.tmp")
+        with open(tmpMeta, "w", encoding="utf-8") as f:
+            json.dump({"model": modelName, "ids": hymnIds, "hashes": hashes}, f)
+        os.replace(tmpMeta, self.metaPath)
+
+        self.modelName = modelName
+        self.ids = hymnIds
+        self.hashes = hashes
+        self.matrix = np.load(self.embeddingsPath, mmap_mode="r")
+        return changed, removed
+
+    def Normalized(self) -> np.ndarray:
+        """Return all embeddings as unit-length float32 rows"""
+        matrix = np.asarray(self.matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
@@ -0,0 +1,208 @@
+"""
+Polite, cache-backed HTTP fetching for the scraper.
+
+Requests run concurrently on an asyncio loop (the blocking requests calls go
+to a thread pool), with two limits per host: a semaphore capping how many
+requests are in flight and a token bucket capping the request rate. A 429 or
+503 pauses the whole host for the server's Retry-After before retrying.
+
+Every response body is kept in an on-disk cache keyed by URL, together with
+its ETag and Last-Modified. A cached URL is served without touching the
+network, so an interrupted crawl resumes where it stopped; with
+revalidate=True the cache is checked with a conditional request instead and
+a 304 reuses the stored body.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+RETRY_STATUSES = (429, 503)
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blockedUntil = 0.0
+        self._lock = asyncio.Lock()
+
+    def Block(self, seconds: float):
+        """Hand out nothing for the next `seconds` (server asked us to back off)"""
+        self.blockedUntil = max(self.blockedUntil, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def Acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blockedUntil:
+                    await asyncio.sleep(self.blockedUntil - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class HttpCache:
+    """Response bodies and validators on disk, one pair of files per URL"""
+
+    def __init__(self, cacheDir: Path):
+        self.cacheDir = Path(cacheDir)
+        self.cacheDir.mkdir(parents=True, exist_ok=True)
+
+    def _Paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        folder = self.cacheDir / key[:2]
+        return folder / f"{key}.body", folder / f"{key}.json"
+
+    def Get(self, url: str) -> Optional[Dict]:
+        """Cached entry ({'url', 'etag', 'last_modified', 'fetched_at', 'body'}) or None"""
+        bodyPath, metaPath = self._Paths(url)
+        try:
+            meta = json.loads(metaPath.read_text(encoding="utf-8"))
+            meta["body"] = bodyPath.read_bytes()
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def Put(self, url: str, body: bytes, etag: Optional[str] = None, lastModified: Optional[str] = None):
+        bodyPath, metaPath = self._Paths(url)
+        bodyPath.parent.mkdir(exist_ok=True)
+        meta = {"url": url, "etag": etag, "last_modified": lastModified, "fetched_at": time.time()}
+        # Body before metadata: an entry only counts once its metadata exists
+        for path, data in ((bodyPath, body), (metaPath, json.dumps(meta).encode("utf-8"))):
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+class FetchEngine:
+    """Concurrent GETs with per-host limits, retries and an HTTP cache"""
+
+    def __init__(self, cacheDir: Path, concurrencyPerHost: int = 4, requestsPerSecond: float = 2.0,
+                 burst: int = 4, maxRetries: int = 3, timeout: float = 30.0,
+                 revalidate: bool = False, offline: bool = False):
+        self.cache = HttpCache(cacheDir)
+        self.concurrencyPerHost = concurrencyPerHost
+        self.requestsPerSecond = requestsPerSecond
+        self.burst = burst
+        self.maxRetries = maxRetries
+        self.timeout = timeout
+        self.revalidate = revalidate
+        self.offline = offline
+        self.stats = {"requests": 0, "cache_hits": 0, "not_modified": 0, "downloaded": 0, "retries": 0, "failures": 0}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _Session(self) -> requests.Session:
+        # requests.Session is not safe to share between threads
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update({'User-Agent': USER_AGENT})
+        return session
+
+    def _Get(self, url: str, headers: Dict[str, str]) -> requests.Response:
+        return self._Session().get(url, headers=headers, timeout=self.timeout)
+
+    def _Host(self, url: str):
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.concurrencyPerHost)
+            self._buckets[host] = TokenBucket(self.requestsPerSecond, self.burst)
+        return self._semaphores[host], self._buckets[host]
+
+    async def Fetch(self, url: str) -> Optional[bytes]:
+        """Body of url, from the cache when possible; None if it could not be fetched"""
+        cached = self.cache.Get(url)
+        if cached is not None and (self.offline or not self.revalidate):
+            self.stats["cache_hits"] += 1
+            return cached["body"]
+        if self.offline:
+            logger.error(f"Not in cache (offline): {url}")
+            self.stats["failures"] += 1
+            return None
+
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(4, self.concurrencyPerHost * 2))
+        semaphore, bucket = self._Host(url)
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.maxRetries):
+            async with semaphore:
+                await bucket.Acquire()
+                self.stats["requests"] += 1
+                try:
+                    response = await loop.run_in_executor(self._executor, self._Get, url, headers)
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Request failed for {url}: {str(e)}")
+                    response = None
+
+            if response is not None:
+                if response.status_code == 304 and cached is not None:
+                    self.stats["not_modified"] += 1
+                    return cached["body"]
+                if response.status_code == 200:
+                    self.stats["downloaded"] += 1
+                    self.cache.Put(url, response.content, response.headers.get("ETag"),
+                                   response.headers.get("Last-Modified"))
+                    return response.content
+                if response.status_code not in RETRY_STATUSES:
+                    logger.error(f"HTTP {response.status_code} for URL: {url}")
+                    break
+
+            if attempt < self.maxRetries - 1:
+                wait_time = _RetryAfter(response) if response is not None else None
+                if wait_time is None:
+                    wait_time = 2 ** attempt * (5 if response is not None else 1)
+                logger.warning(f"Backing off {url} for {wait_time} seconds before retry {attempt + 1}")
+                # Pause the whole host, not just this request
+                bucket.Block(wait_time)
+                self.stats["retries"] += 1
+
+        self.stats["failures"] += 1
+        return None
+
+    async def FetchAll(self, urls: Iterable[str]) -> List[Optional[bytes]]:
+        return await asyncio.gather(*(self.Fetch(url) for url in urls))
+
+    def Close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+def _RetryAfter(response: requests.Response) -> Optional[float]:
+    """Seconds from a numeric Retry-After header, if the server sent one"""
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
@@ -0,0 +1,135 @@
+"""
+Local stand-in for the sacred-texts.com Rig-Veda pages.
+
+Pages are generated from the corpus in the same shape the scraper expects:
+an index linking every book (rviNN.htm), one page per book linking its
+hymns (rvBBHHH.htm, link text = hymn title) and one page per hymn with the
+title in an <h3> and the text in the following <p>. Responses carry an ETag
+and Last-Modified and answer conditional requests with 304.
+
+    python fixture_server.py --port 8765 --latency 0.05
+    python rigveda_scraper.py --base-url http://127.0.0.1:8765/hin/rigveda/index.htm
+"""
+
+import argparse
+import hashlib
+import html
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from corpus import LoadCorpus
+
+ROOT = "/hin/rigveda/"
+
+def _Page(title: str, body: str) -> bytes:
+    return f"<html><head><title>{html.escape(title)}</title></head><body>{body}</body></html>".encode("utf-8")
+
+def BuildPages(corpus=None) -> Dict[str, bytes]:
+    """Path -> page body for the index, every book and every hymn"""
+    corpus = corpus if corpus is not None else LoadCorpus()
+    books: Dict[int, list] = {}
+    pages: Dict[str, bytes] = {}
+    for hymn in corpus:
+        name = f"rv{hymn.hymn_number:05d}.htm"
+        books.setdefault(hymn.book_number, []).append((name, hymn.title))
+        # The scraper drops verse digits, so the leading "1" disappears again
+        pages[ROOT + name] = _Page(hymn.title, f"<h3>{html.escape(hymn.title)}</h3>\n<p>1{html.escape(hymn.text)}</p>")
+
+    indexLinks = []
+    for book, hymns in sorted(books.items()):
+        name = f"rvi{book:02d}.htm"
+        indexLinks.append(f'<a href="{name}">Book {book}</a><br>')
+        links = "".join(f'<a href="{href}">{html.escape(title)}</a><br>\n' for href, title in hymns)
+        pages[ROOT + name] = _Page(f"Rig-Veda Book {book}", f"<h1>Rig-Veda Book {book}</h1>\n{links}")
+    pages[ROOT + "index.htm"] = _Page("The Rig Veda", "<h1>The Rig Veda</h1>\n" + "\n".join(indexLinks))
+    return pages
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Set on the subclass built by StartFixtureServer
+    pages: Dict[str, bytes] = {}
+    etags: Dict[str, str] = {}
+    lastModified = formatdate(usegmt=True)
+    latency = 0.0
+    throttleEvery = 0
+    counter = {"requests": 0, "not_modified": 0, "throttled": 0}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.counter["requests"] += 1
+            count = self.counter["requests"]
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.throttleEvery and count % self.throttleEvery == 0:
+            with self.lock:
+                self.counter["throttled"] += 1
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = self.pages.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = self.etags[self.path]
+        if self.headers.get("If-None-Match") == etag or (
+                "If-None-Match" not in self.headers and self.headers.get("If-Modified-Since") == self.lastModified):
+            with self.lock:
+                self.counter["not_modified"] += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.lastModified)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def StartFixtureServer(port: int = 0, latency: float = 0.0, throttleEvery: int = 0,
+                       pages: Optional[Dict[str, bytes]] = None) -> ThreadingHTTPServer:
+    """Serve the fixture pages from a daemon thread; the index is at server.base_url"""
+    pages = pages if pages is not None else BuildPages()
+    handler = type("Handler", (FixtureHandler,), {
+        "pages": pages,
+        "etags": {path: '"' + hashlib.sha1(body).hexdigest() + '"' for path, body in pages.items()},
+        "latency": latency,
+        "throttleEvery": throttleEvery,
+        "counter": {"requests": 0, "not_modified": 0, "throttled": 0},
+        "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.handler = handler
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}{ROOT}index.htm"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sacred-texts-shaped Rig-Veda pages locally")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--throttle-every", type=int, default=0, help="answer every Nth request with 429")
+    args = parser.parse_args()
+
+    server = StartFixtureServer(args.port, args.latency, args.throttle_every)
+    print(f"Serving {len(server.handler.pages)} pages at {server.base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Hymn page parsing for the scraper, separate from fetching.
+
+Raw pages live in the fetch engine's HTTP cache, so extraction can be rerun
+over the whole corpus without touching the network. ParseHymnPages is the
+unit of work handed to a process pool; it uses lxml when installed and
+falls back to the pure-Python html.parser otherwise.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+_DIGIT_SPLIT = re.compile(r'(\d)')
+
+def MakeSoup(body: bytes) -> BeautifulSoup:
+    return BeautifulSoup(body, PARSER)
+
+def AssembleText(text_parts: List[str]) -> str:
+    """Concatenate the paragraphs with verse digits (and whitespace-only runs between them) dropped"""
+    return "".join(f for text_part in text_parts for f in _DIGIT_SPLIT.split(text_part)
+                   if f.strip() and not f.isdigit())
+
+def ParseHymnPage(body: Optional[bytes], hymn_url: str) -> Dict[str, str]:
+    """Extract hymn text and metadata from a hymn page"""
+    if body is None:
+        return {'text': '', 'title': '', 'error': 'Failed to fetch page'}
+    soup = MakeSoup(body)
+
+    # Extract title
+    title = ''
+    h3_elements = soup.find_all('h3')
+    if h3_elements:
+        title = h3_elements[0].get_text(strip=True)
+
+    # Main text: only the paragraph following each h3
+    text_parts = []
+    for h3 in h3_elements:
+        next_p = h3.find_next_sibling('p')
+        if next_p:
+            text = next_p.get_text(strip=True)
+            if text:
+                text_parts.append(text)
+
+    return {
+        'text': AssembleText(text_parts),
+        'title': title,
+        'url': hymn_url
+    }
+
+def ParseHymnPages(pages: List[Tuple[Optional[bytes], str]]) -> List[Dict[str, str]]:
+    """ParseHymnPage over (body, url) pairs; picklable unit of work for a process pool"""
+    return [ParseHymnPage(body, url) for body, url in pages]
@@ -1,10 +1,46 @@
+import argparse
+import hashlib
+import heapq
 import json
+import os
 import sqlite3
+import tempfile
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Iterator, Optional, Set
+
+from bulk_load import ReplaceTable
+from migrations import NEIGHBORS_TOP_K, SIMILARITY_INDEXES, SIMILARITY_TABLE_SQL, Migrate
+from neighbor_table import FindAffectedHymns, RankPairNeighbors
 
 DB_PATH = Path(__file__).parent.parent / "hymn_vectors.db"
+# Metrics stored in hymn_similarities_<metric> and ranked into hymn_neighbors (higher = more similar)
+METRICS = ("cosine", "jaccard", "dice")
+BLOCK_SIZE = 256
+
+# (row positions, column positions, similarities) for one tile of pairs
+PairBlock = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+def GetDeityCount(conn: sqlite3.Connection) -> int:
+    """Number of deities, i.e. the bit length of every deity vector"""
+    return conn.execute('SELECT COUNT(*) FROM deity_index').fetchone()[0]
+
+def PackDeityVector(vector: List[int]) -> bytes:
+    """Pack a 0/1 deity vector into bytes (most significant bit first)"""
+    return np.packbits(np.asarray(vector, dtype=np.uint8)).tobytes()
+
+def _PackedRow(value, numBytes: int) -> np.ndarray:
+    # Databases built before vectors were bit-packed store a JSON list
+    if isinstance(value, str):
+        return np.packbits(np.asarray(json.loads(value), dtype=np.uint8))
+    return np.frombuffer(value, dtype=np.uint8, count=numBytes)
+
+def UnpackDeityVector(value, numDeities: int) -> List[int]:
+    """Decode a stored deity vector back into a list of 0/1 ints"""
+    packed = _PackedRow(value, (numDeities + 7) // 8)
+    return np.unpackbits(packed, count=numDeities).astype(int).tolist()
 
 def GetHymnVector(hymnId: str) -> Tuple[List[int], str, int, int]:
     """Retrieve hymn vector and metadata from database"""
@@ -18,10 +54,11 @@ def GetHymnVector(hymnId: str) -> Tuple[List[int], str, int, int]:
     ''', (hymnId,))
     
     result = cursor.fetchone()
+    numDeities = GetDeityCount(conn)
     conn.close()
     
     if result:
-        vector = json.loads(result[0])
+        vector = UnpackDeityVector(result[0], numDeities)
         return vector, result[1], result[2], result[3]
     return None, None, None, None
 
@@ -37,14 +74,44 @@ def GetAllHymnVectors() -> Dict[str, Tuple[List[int], str, int, int]]:
     ''')
     
     hymns = {}
-    for row in cursor.fetchall():
+    rows = cursor.fetchall()
+    numDeities = GetDeityCount(conn)
+    for row in rows:
         hymnId = row[0]
-        vector = json.loads(row[1])
+        vector = UnpackDeityVector(row[1], numDeities)
         hymns[hymnId] = (vector, row[2], row[3], row[4])
     
     conn.close()
     return hymns
 
+def GetHymnMetadata() -> Dict[str, Tuple[None, str, int, int]]:
+    """Titles and positions of all hymns, shaped like GetAllHymnVectors without the vectors"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute('''
+        SELECT hymn_id, title, book_number, hymn_number
+        FROM hymn_vectors
+        ORDER BY book_number, hymn_number
+    ''').fetchall()
+    conn.close()
+    return {row[0]: (None, row[1], row[2], row[3]) for row in rows}
+
+def LoadPackedVectorMatrix() -> Tuple[List[str], np.ndarray, int]:
+    """Load every deity vector as a packed uint8 matrix (hymns x ceil(deities / 8))"""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute('''
+        SELECT hymn_id, deity_vector
+        FROM hymn_vectors
+        ORDER BY book_number, hymn_number
+    ''').fetchall()
+    numDeities = GetDeityCount(conn)
+    conn.close()
+
+    numBytes = (numDeities + 7) // 8
+    packed = np.zeros((len(rows), numBytes), dtype=np.uint8)
+    for i, (_, value) in enumerate(rows):
+        packed[i] = _PackedRow(value, numBytes)
+    return [row[0] for row in rows], packed, numDeities
+
 def CosineSimilarity(vector1: List[int], vector2: List[int]) -> float:
     """Calculate cosine similarity between two vectors"""
     v1 = np.array(vector1)
@@ -109,100 +176,274 @@ def CalculateSimilarity(hymnId1: str, hymnId2: str, metric: str = "cosine") -> f
     elif metric == "dice":
         return DiceSimilarity(vector1, vector2)
     elif metric == "hamming":
-        return float(HammingDistance(vector1, vector2))
+        # Distance turned into a similarity in [0, 1] like the other metrics
+        return 1.0 - HammingDistance(vector1, vector2) / len(vector1) if vector1 else 1.0
     else:
         raise ValueError(f"Unknown metric: {metric}")
 
-def CalculateAllPairwiseSimilarities(metric: str = "cosine", minSimilarity: float = 0.0):
+def PackVectorMatrix(vectors: np.ndarray) -> np.ndarray:
+    """Bit-pack a (hymns x deities) 0/1 matrix into uint8 rows"""
+    return np.packbits(np.asarray(vectors, dtype=np.uint8), axis=1)
+
+def _AsWords(packed: np.ndarray) -> np.ndarray:
+    """View packed rows as zero-padded uint64 words so popcount runs 64 bits at a time"""
+    numBytes = packed.shape[1]
+    paddedBytes = max(8, -(-numBytes // 8) * 8)
+    padded = np.zeros((packed.shape[0], paddedBytes), dtype=np.uint8)
+    padded[:, :numBytes] = packed
+    return padded.view(np.uint64)
+
+def _BitCounts(words: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+
+def _SimilarityFromWords(rowWords: np.ndarray, rowSizes: np.ndarray, colWords: np.ndarray,
+                         colSizes: np.ndarray, metric: str) -> np.ndarray:
+    """Similarity of every (row, column) pair of packed word vectors.
+
+    The intersection size of every pair is a popcount of the ANDed words;
+    every metric follows from it and the per-row bit counts.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+
+    # Small counts accumulate fastest in the narrowest type that cannot overflow
+    countType = np.uint8 if rowWords.shape[1] * 64 <= np.iinfo(np.uint8).max else np.uint16
+    intersection = np.zeros((rowWords.shape[0], colWords.shape[0]), dtype=countType)
+    for w in range(rowWords.shape[1]):
+        intersection += np.bitwise_count(rowWords[:, w, None] & colWords[None, :, w])
+
+    intersection = intersection.astype(np.float64)
+    rowSizes = rowSizes[:, None].astype(np.float64)
+    colSizes = colSizes[None, :].astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if metric == "cosine":
+            result = intersection / (np.sqrt(rowSizes) * np.sqrt(colSizes))
+            result[(rowSizes == 0) | (colSizes == 0)] = 0.0
+        elif metric == "jaccard":
+            result = intersection / (rowSizes + colSizes - intersection)
+            result[(rowSizes == 0) & (colSizes == 0)] = 1.0
+        else:
+            result = 2 * intersection / (rowSizes + colSizes)
+            result[(rowSizes == 0) & (colSizes == 0)] = 1.0
+    return result
+
+def ComputeSimilarityBlock(words: np.ndarray, rowStart: int, rowEnd: int, metric: str,
+                           sizes: Optional[np.ndarray] = None, colStart: int = 0) -> np.ndarray:
+    """Similarity of rows [rowStart, rowEnd) against rows [colStart, end) of a packed word matrix"""
+    if sizes is None:
+        sizes = _BitCounts(words)
+    return _SimilarityFromWords(words[rowStart:rowEnd], sizes[rowStart:rowEnd], words[colStart:], sizes[colStart:], metric)
+
+def ComputeSimilarityRows(words: np.ndarray, rows: np.ndarray, metric: str,
+                          sizes: Optional[np.ndarray] = None) -> np.ndarray:
+    """Similarity of an arbitrary set of rows against every row of a packed word matrix"""
+    if sizes is None:
+        sizes = _BitCounts(words)
+    return _SimilarityFromWords(words[rows], sizes[rows], words, sizes, metric)
+
+def _UpperTrianglePairs(words: np.ndarray, sizes: np.ndarray, rowStart: int, rowEnd: int,
+                        metric: str, minSimilarity: float) -> PairBlock:
+    # Only columns right of the tile's first row can hold upper-triangle pairs
+    colStart = rowStart + 1
+    similarities = ComputeSimilarityBlock(words, rowStart, rowEnd, metric, sizes, colStart)
+    rowPositions = np.arange(rowStart, rowEnd)[:, None]
+    keep = (np.arange(colStart, words.shape[0])[None, :] > rowPositions) & (similarities >= minSimilarity)
+    rows, cols = np.nonzero(keep)
+    return (rows + rowStart).astype(np.int32), (cols + colStart).astype(np.int32), similarities[rows, cols]
+
+_workerSizes: Dict[str, np.ndarray] = {}
+
+def _SimilarityBlockWorker(args: Tuple[str, int, int, str, float]) -> PairBlock:
+    """Process-pool entry point: map the shared word matrix and compute one tile"""
+    wordsPath, rowStart, rowEnd, metric, minSimilarity = args
+    words = np.load(wordsPath, mmap_mode="r")
+    if wordsPath not in _workerSizes:
+        _workerSizes[wordsPath] = _BitCounts(words)
+    return _UpperTrianglePairs(words, _workerSizes[wordsPath], rowStart, rowEnd, metric, minSimilarity)
+
+def IterPairwiseSimilarityBlocks(packed: np.ndarray, metric: str = "cosine", minSimilarity: float = 0.0,
+                                 jobs: Optional[int] = None, blockSize: int = BLOCK_SIZE) -> Iterator[PairBlock]:
+    """Yield upper-triangle pairs at or above the threshold, one row tile at a time.
+
+    packed is the bit-packed vector matrix from LoadPackedVectorMatrix. Tiles
+    are computed with vectorized popcounts and, when jobs > 1, spread over a
+    process pool. Workers read the vectors from a memory-mapped .npy, and at
+    most a few tiles are in flight, so memory stays bounded for large corpora.
+    Tiles are yielded in row order regardless of which worker finishes first.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    words = _AsWords(packed)
+    numHymns = words.shape[0]
+    starts = list(range(0, numHymns, blockSize))
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs <= 1 or len(starts) <= 1:
+        sizes = _BitCounts(words)
+        for start in starts:
+            yield _UpperTrianglePairs(words, sizes, start, min(start + blockSize, numHymns), metric, minSimilarity)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        wordsPath = os.path.join(tmpDir, "vectors.npy")
+        np.save(wordsPath, words)
+        tasks = iter([(wordsPath, start, min(start + blockSize, numHymns), metric, minSimilarity) for start in starts])
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            inFlight = [executor.submit(_SimilarityBlockWorker, task) for task in islice(tasks, jobs * 2)]
+            while inFlight:
+                yield inFlight.pop(0).result()
+                nextTask = next(tasks, None)
+                if nextTask is not None:
+                    inFlight.append(executor.submit(_SimilarityBlockWorker, nextTask))
+
+def CalculateAllPairwiseSimilarities(metric: str = "cosine", minSimilarity: float = 0.0, jobs: Optional[int] = None) -> List[Dict]:
     """Calculate pairwise similarities for all hymns"""
     print("Loading all hymn vectors...")
-    hymns = GetAllHymnVectors()
-    hymnIds = list(hymns.keys())
+    hymns = GetHymnMetadata()
+    hymnIds, packed, _ = LoadPackedVectorMatrix()
     totalPairs = len(hymnIds) * (len(hymnIds) - 1) // 2
-    
+
     print(f"Calculating {totalPairs} pairwise similarities using {metric} metric...")
-    
+
     similarities = []
-    processed = 0
-    
-    for i, hymnId1 in enumerate(hymnIds):
-        vector1, title1, book1, hymn1 = hymns[hymnId1]
-        
-        for j in range(i + 1, len(hymnIds)):
-            hymnId2 = hymnIds[j]
-            vector2, title2, book2, hymn2 = hymns[hymnId2]
-            
-            if metric == "cosine":
-                similarity = CosineSimilarity(vector1, vector2)
-            elif metric == "jaccard":
-                similarity = JaccardSimilarity(vector1, vector2)
-            elif metric == "dice":
-                similarity = DiceSimilarity(vector1, vector2)
-            elif metric == "hamming":
-                similarity = float(HammingDistance(vector1, vector2))
-            else:
-                raise ValueError(f"Unknown metric: {metric}")
-            
-            if similarity >= minSimilarity:
-                similarities.append({
-                    'hymn1_id': hymnId1,
-                    'hymn2_id': hymnId2,
-                    'hymn1_book': book1,
-                    'hymn1_number': hymn1,
-                    'hymn2_book': book2,
-                    'hymn2_number': hymn2,
-                    'similarity': similarity
-                })
-            
-            processed += 1
-            if processed % 10000 == 0:
-                print(f"  Processed {processed}/{totalPairs} pairs...")
-    
+    for rows, cols, values in IterPairwiseSimilarityBlocks(packed, metric, minSimilarity, jobs):
+        for i, j, similarity in zip(rows.tolist(), cols.tolist(), values.tolist()):
+            _, _, book1, hymn1 = hymns[hymnIds[i]]
+            _, _, book2, hymn2 = hymns[hymnIds[j]]
+            similarities.append({
+                'hymn1_id': hymnIds[i],
+                'hymn2_id': hymnIds[j],
+                'hymn1_book': book1,
+                'hymn1_number': hymn1,
+                'hymn2_book': book2,
+                'hymn2_number': hymn2,
+                'similarity': similarity
+            })
+
     print(f"✓ Calculated {len(similarities)} similarities above threshold {minSimilarity}")
     return similarities
 
+SIMILARITY_COLUMNS = ("hymn1_id", "hymn2_id", "similarity")
+
 def SaveSimilaritiesToDatabase(similarities: List[Dict], metric: str):
     """Save pairwise similarities to database"""
+    rows = ((sim['hymn1_id'], sim['hymn2_id'], sim['similarity']) for sim in similarities)
+    saved = ReplaceTable(f'hymn_similarities_{metric}', SIMILARITY_TABLE_SQL, SIMILARITY_COLUMNS, rows,
+                         indexSql=SIMILARITY_INDEXES, dbPath=DB_PATH)
+    print(f"✓ Saved {saved} similarities to database table 'hymn_similarities_{metric}'")
+
+def SaveSimilarityBlocks(hymnIds: List[str], blocks: Iterator[PairBlock], metric: str) -> int:
+    """Stream pair blocks into a fresh similarity table and swap it in without building a pair list"""
+    ids = np.array(hymnIds, dtype=object)
+    def Rows():
+        for rows, cols, values in blocks:
+            yield from zip(ids[rows], ids[cols], values.tolist())
+
+    saved = ReplaceTable(f'hymn_similarities_{metric}', SIMILARITY_TABLE_SQL, SIMILARITY_COLUMNS, Rows(),
+                         indexSql=SIMILARITY_INDEXES, dbPath=DB_PATH)
+    print(f"✓ Saved {saved} similarities to database table 'hymn_similarities_{metric}'")
+    return saved
+
+def SaveRankedNeighbors(metric: str, hymnIds: Optional[Set[str]] = None) -> None:
+    """Re-rank hymn_neighbors for the metric from its freshly written pair table (only hymnIds if given)"""
+    ranked = RankPairNeighbors(metric, f'hymn_similarities_{metric}', hymnIds=hymnIds)
+    scope = "" if hymnIds is None else f" for {len(hymnIds)} affected hymns"
+    print(f"✓ Ranked {ranked} neighbor rows into 'hymn_neighbors' (metric='{metric}'){scope}")
+
+def VectorHashes(packed: np.ndarray, numDeities: int, minSimilarity: float) -> List[str]:
+    """Content hash of each hymn's packed vector, salted with what its pairs depend on"""
+    salt = f"{numDeities}:{minSimilarity!r}:".encode("utf-8")
+    return [hashlib.sha1(salt + row.tobytes()).hexdigest() for row in packed]
+
+def SaveVectorHashes(conn: sqlite3.Connection, metric: str, hymnIds: List[str], hashes: List[str],
+                     replaceAll: bool = True) -> None:
+    """Record the vector hashes a metric's similarity table was computed from (table created by Migrate)"""
+    if replaceAll:
+        conn.execute('DELETE FROM hymn_similarity_state WHERE metric = ?', (metric,))
+    conn.executemany(
+        'INSERT OR REPLACE INTO hymn_similarity_state (metric, hymn_id, vector_hash) VALUES (?, ?, ?)',
+        [(metric, hymnId, vectorHash) for hymnId, vectorHash in zip(hymnIds, hashes)]
+    )
+
+def LoadVectorHashes(metric: str) -> Optional[Dict[str, str]]:
+    """Hashes from the last run for a metric, or None if it cannot be updated incrementally"""
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute(f'''
-        CREATE TABLE IF NOT EXISTS hymn_similarities_{metric} (
-            hymn1_id TEXT,
-            hymn2_id TEXT,
-            similarity REAL,
-            PRIMARY KEY (hymn1_id, hymn2_id)
-        )
-    ''')
-    
-    cursor.execute(f'DELETE FROM hymn_similarities_{metric}')
-    
-    for sim in similarities:
+    try:
+        conn.execute(f'SELECT 1 FROM hymn_similarities_{metric} LIMIT 1')
+        rows = conn.execute('SELECT hymn_id, vector_hash FROM hymn_similarity_state WHERE metric = ?', (metric,)).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return dict(rows) if rows else None
+
+def UpdateChangedSimilarities(hymnIds: List[str], packed: np.ndarray, hashes: List[str], storedHashes: Dict[str, str],
+                              metric: str, minSimilarity: float) -> Tuple[int, int, Set[str]]:
+    """Recompute only the pairs of hymns whose vectors changed and upsert them in one transaction.
+
+    Costs O(changed x N) instead of O(N^2). Returns (changed hymns, pairs
+    written, hymns whose neighbor lists must be re-ranked).
+    """
+    changedRows = np.array([i for i, hymnId in enumerate(hymnIds) if storedHashes.get(hymnId) != hashes[i]], dtype=np.int64)
+    current = set(hymnIds)
+    removedIds = [hymnId for hymnId in storedHashes if hymnId not in current]
+    changedIds = [hymnIds[i] for i in changedRows]
+    if not changedIds and not removedIds:
+        return 0, 0, set()
+
+    words = _AsWords(packed)
+    similarities = ComputeSimilarityRows(words, changedRows, metric)
+    # Read the neighbor lists before they are re-ranked; removed hymns only lose their rows
+    affected = FindAffectedHymns(hymnIds, changedIds, removedIds, similarities, metric, NEIGHBORS_TOP_K,
+                                 minSimilarity, DB_PATH) | set(removedIds)
+    isChanged = np.zeros(len(hymnIds), dtype=bool)
+    isChanged[changedRows] = True
+
+    # Pairs are stored in corpus order; pairs between two changed hymns are emitted once
+    columns = np.arange(len(hymnIds))[None, :]
+    keep = (similarities >= minSimilarity) & (columns != changedRows[:, None])
+    keep &= ~(isChanged[None, :] & (columns < changedRows[:, None]))
+    rows, cols = np.nonzero(keep)
+    first = np.minimum(changedRows[rows], cols)
+    second = np.maximum(changedRows[rows], cols)
+    ids = np.array(hymnIds, dtype=object)
+
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        # The pair table and its indexes come from the full build (ReplaceTable) or the migrations
+        cursor = conn.cursor()
+        cursor.execute('CREATE TEMP TABLE stale_hymns (hymn_id TEXT PRIMARY KEY)')
+        cursor.executemany('INSERT INTO stale_hymns (hymn_id) VALUES (?)', [(h,) for h in changedIds + removedIds])
         cursor.execute(f'''
-            INSERT INTO hymn_similarities_{metric} (hymn1_id, hymn2_id, similarity)
-            VALUES (?, ?, ?)
-        ''', (sim['hymn1_id'], sim['hymn2_id'], sim['similarity']))
-    
-    conn.commit()
-    conn.close()
-    print(f"✓ Saved {len(similarities)} similarities to database table 'hymn_similarities_{metric}'")
+            DELETE FROM hymn_similarities_{metric}
+            WHERE hymn1_id IN (SELECT hymn_id FROM stale_hymns)
+               OR hymn2_id IN (SELECT hymn_id FROM stale_hymns)
+        ''')
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO hymn_similarities_{metric} (hymn1_id, hymn2_id, similarity) VALUES (?, ?, ?)',
+            zip(ids[first], ids[second], similarities[rows, cols].tolist())
+        )
+        cursor.executemany('DELETE FROM hymn_similarity_state WHERE metric = ? AND hymn_id = ?',
+                           [(metric, hymnId) for hymnId in removedIds])
+        SaveVectorHashes(conn, metric, changedIds, [hashes[i] for i in changedRows], replaceAll=False)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(changedIds) + len(removedIds), len(rows), affected
 
 def GetTopSimilarHymns(hymnId: str, metric: str = "cosine", topN: int = 10) -> List[Tuple]:
-    """Get top N most similar hymns for a given hymn"""
+    """Get top N most similar hymns for a given hymn (at most the k stored per hymn)"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute(f'''
-        SELECT hymn2_id, similarity 
-        FROM hymn_similarities_{metric}
-        WHERE hymn1_id = ?
-        UNION
-        SELECT hymn1_id, similarity 
-        FROM hymn_similarities_{metric}
-        WHERE hymn2_id = ?
-        ORDER BY similarity DESC
-        LIMIT ?
-    ''', (hymnId, hymnId, topN))
+    cursor.execute('''
+        SELECT other_id, similarity
+        FROM hymn_neighbors
+        WHERE metric = ? AND hymn_id = ? AND rank <= ?
+        ORDER BY rank
+    ''', (metric, hymnId, topN))
     
     results = cursor.fetchall()
     conn.close()
@@ -210,22 +451,66 @@ def GetTopSimilarHymns(hymnId: str, metric: str = "cosine", topN: int = 10) -> L
     return results
 
 def main():
+    parser = argparse.ArgumentParser(description="Compute deity-vector similarity for all hymn pairs")
+    parser.add_argument("--metric", choices=METRICS, default="cosine")
+    parser.add_argument("--min-similarity", type=float, default=0.3)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--full", action="store_true", help="recompute every pair even if only some hymns changed")
+    args = parser.parse_args()
+
     print("Hymn Similarity Calculator")
     print("=" * 50)
-    
-    metric = "cosine"
-    minThreshold = 0.3
-    
-    similarities = CalculateAllPairwiseSimilarities(metric=metric, minSimilarity=minThreshold)
-    
-    similarities.sort(key=lambda x: x['similarity'], reverse=True)
-    
+
+    metric = args.metric
+    minThreshold = args.min_similarity
+    Migrate(DB_PATH)
+
+    print("Loading all hymn vectors...")
+    hymns = GetHymnMetadata()
+    hymnIds, packed, numDeities = LoadPackedVectorMatrix()
+    hashes = VectorHashes(packed, numDeities, minThreshold)
+
+    # Incremental mode: only hymns whose vector hash changed are recomputed
+    storedHashes = None if args.full else LoadVectorHashes(metric)
+    if storedHashes is not None:
+        staleCount = sum(storedHashes.get(hymnId) != vectorHash for hymnId, vectorHash in zip(hymnIds, hashes))
+        if staleCount > len(hymnIds) // 2:
+            # Most rows changed (e.g. a new threshold): the tiled full run is cheaper
+            storedHashes = None
+    if storedHashes is not None:
+        changed, written, affected = UpdateChangedSimilarities(hymnIds, packed, hashes, storedHashes, metric, minThreshold)
+        print(f"✓ {changed} hymns changed; rewrote {written} pairs in 'hymn_similarities_{metric}'")
+        if changed:
+            SaveRankedNeighbors(metric, affected)
+        return
+
+    totalPairs = len(hymnIds) * (len(hymnIds) - 1) // 2
+    print(f"Calculating {totalPairs} pairwise similarities using {metric} metric...")
+
+    # Keep each tile's best pairs so the overall top 10 needs no full pair list
+    topPairs = []
+    def TrackTopPairs(blocks):
+        for rows, cols, values in blocks:
+            best = np.argsort(-values, kind="stable")[:10]
+            topPairs.extend(zip(values[best].tolist(), rows[best].tolist(), cols[best].tolist()))
+            yield rows, cols, values
+
+    blocks = IterPairwiseSimilarityBlocks(packed, metric, minThreshold, args.jobs)
+    saved = SaveSimilarityBlocks(hymnIds, TrackTopPairs(blocks), metric)
+    print(f"✓ Calculated {saved} similarities above threshold {minThreshold}")
+
+    conn = sqlite3.connect(DB_PATH)
+    SaveVectorHashes(conn, metric, hymnIds, hashes)
+    conn.commit()
+    conn.close()
+    SaveRankedNeighbors(metric)
+
     print(f"\nTop 10 most similar hymn pairs ({metric} similarity):")
-    for i, sim in enumerate(similarities[:10], 1):
-        print(f"{i}. Hymn {sim['hymn1_id']} (Book {sim['hymn1_book']}) <-> "
-              f"Hymn {sim['hymn2_id']} (Book {sim['hymn2_book']}): {sim['similarity']:.4f}")
-    
-    SaveSimilaritiesToDatabase(similarities, metric)
+    for rank, (similarity, i, j) in enumerate(heapq.nlargest(10, topPairs, key=lambda p: p[0]), 1):
+        _, _, book1, _ = hymns[hymnIds[i]]
+        _, _, book2, _ = hymns[hymnIds[j]]
+        print(f"{rank}. Hymn {hymnIds[i]} (Book {book1}) <-> "
+              f"Hymn {hymnIds[j]} (Book {book2}): {similarity:.4f}")
 
 if __name__ == "__main__":
     main()
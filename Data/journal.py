@@ -0,0 +1,95 @@
+"""
+Append-only JSON-lines journal for long-running Data jobs.
+
+Each record is one JSON object on its own line. Appends are buffered and
+fsynced every `syncEvery` records (and on close), so a crash loses at most
+the last unsynced batch. A torn final line left by a crash is ignored on
+replay and cut off before the next append.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator
+
+def ReplayJournal(path: Path) -> Iterator[Dict]:
+    """Yield every complete record in the journal; a missing file yields nothing"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                break
+
+def _ValidLength(path: Path) -> int:
+    """Byte length of the leading run of complete, parseable lines"""
+    length = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                json.loads(line)
+            except ValueError:
+                break
+            length += len(line)
+    return length
+
+class Journal:
+    """Append records to a JSON-lines file, fsyncing in batches"""
+
+    def __init__(self, path: Path, syncEvery: int = 64):
+        self.path = Path(path)
+        self.syncEvery = syncEvery
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            validLength = _ValidLength(self.path)
+            if validLength < self.path.stat().st_size:
+                os.truncate(self.path, validLength)
+        self._file = open(self.path, "ab")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def Append(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._pending += 1
+            if self._pending >= self.syncEvery:
+                self._Sync()
+
+    def _Sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def Flush(self):
+        with self._lock:
+            self._Sync()
+
+    def Reset(self):
+        """Drop every record (after they have been compacted elsewhere)"""
+        with self._lock:
+            self._file.flush()
+            self._file.truncate(0)
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def Close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._Sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
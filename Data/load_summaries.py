@@ -0,0 +1,27 @@
+"""
+Load hymn summaries into the hymn_summaries table served by the API.
+
+The API looks summaries up per hymn instead of holding the whole JSON map
+in every worker, and the frontend fetches them one hymn at a time.
+"""
+
+from pathlib import Path
+
+from bulk_load import ReplaceTable
+from migrations import SUMMARIES_TABLE_SQL, Migrate
+from summary_journal import LoadSummaries
+
+DB_PATH = Path(__file__).parent.parent / "hymn_vectors.db"
+
+def LoadSummariesIntoDatabase(dbPath: Path = DB_PATH) -> int:
+    Migrate(dbPath)
+    summaries = LoadSummaries()
+    rows = ((hymnId, summary) for hymnId, summary in summaries.items() if summary)
+    return ReplaceTable("hymn_summaries", SUMMARIES_TABLE_SQL, ("hymn_id", "summary"), rows, dbPath=dbPath)
+
+def main():
+    count = LoadSummariesIntoDatabase()
+    print(f"✓ Loaded {count} summaries into hymn_summaries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Versioned schema migrations for hymn_vectors.db.
+
+The schema of every table the API reads is defined here, together with an
+ordered list of migrations. schema_version records which migrations a
+database has had; Migrate applies the missing ones in order, each in its
+own transaction, and is safe to run from several scripts at once.
+
+Data scripts call Migrate() before writing. The API only reads the version
+once at startup (SchemaVersion) and never runs DDL itself. Tables rebuilt
+wholesale (ReplaceTable) use the same CREATE/INDEX statements, so a
+rebuilt table matches the migrated schema. ReplaceTable builds indexes
+before its swap, so their names alternate between idx_{table}_... and
+idx_{table}__b_... from one rebuild to the next.
+
+    python migrations.py            # bring the database up to date
+    python migrations.py --status   # show applied and pending migrations
+"""
+
+import argparse
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+DB_PATH = Path(__file__).parent.parent / "hymn_vectors.db"
+
+# Table and index templates with a {table} placeholder (see bulk_load.ReplaceTable)
+HYMN_VECTORS_SQL = '''
+    CREATE TABLE {table} (
+        hymn_id TEXT PRIMARY KEY,
+        book_number INTEGER,
+        hymn_number INTEGER,
+        title TEXT,
+        deity_vector BLOB,
+        deity_names TEXT,
+        deity_count INTEGER,
+        hymn_score REAL,
+        primary_deity_id INTEGER,
+        word_count INTEGER DEFAULT 0
+    )
+'''
+HYMN_VECTORS_INDEXES = (
+    # GetHymnLightByDeities (covered) and GetHymnRows/GetHymnRowsByDeities (ordered).
+    # Book order leads because the top deities cover most hymns, so walking
+    # this index and filtering beats seeking per deity and sorting the union.
+    'CREATE INDEX IF NOT EXISTS idx_{table}_book_hymn ON {table}(book_number, hymn_number, primary_deity_id, hymn_id, title, word_count)',
+    # GetTopHymnsByScore
+    'CREATE INDEX IF NOT EXISTS idx_{table}_score ON {table}(hymn_score DESC)',
+)
+
+DEITY_INDEX_SQL = '''
+    CREATE TABLE {table} (
+        deity_id INTEGER PRIMARY KEY,
+        deity_name TEXT UNIQUE,
+        vector_position INTEGER,
+        deity_frequency INTEGER,
+        deity_color TEXT
+    )
+'''
+DEITY_INDEX_INDEXES = (
+    # Deity snapshot in the API (deity_index by frequency)
+    'CREATE INDEX IF NOT EXISTS idx_{table}_frequency ON {table}(deity_frequency DESC, deity_id, deity_name, deity_color)',
+)
+
+SIMILARITY_TABLE_SQL = '''
+    CREATE TABLE {table} (
+        hymn1_id TEXT,
+        hymn2_id TEXT,
+        similarity REAL,
+        PRIMARY KEY (hymn1_id, hymn2_id)
+    )
+'''
+SIMILARITY_INDEXES = (
+    # Top neighbours of one hymn from either side of a pair, read off the index
+    'CREATE INDEX IF NOT EXISTS idx_{table}_by_hymn1 ON {table}(hymn1_id, similarity DESC, hymn2_id)',
+    'CREATE INDEX IF NOT EXISTS idx_{table}_by_hymn2 ON {table}(hymn2_id, similarity DESC, hymn1_id)',
+)
+
+# Vector hashes each metric's pair table was computed from (hymn_similarity.py)
+SIMILARITY_STATE_SQL = '''
+    CREATE TABLE {table} (
+        metric TEXT NOT NULL,
+        hymn_id TEXT NOT NULL,
+        vector_hash TEXT NOT NULL,
+        PRIMARY KEY (metric, hymn_id)
+    )
+'''
+
+SUMMARIES_TABLE_SQL = '''
+    CREATE TABLE {table} (
+        hymn_id TEXT PRIMARY KEY,
+        summary TEXT NOT NULL
+    ) WITHOUT ROWID
+'''
+
+# Each hymn's k most similar hymns per metric, both directions of every pair,
+# pre-ranked so a top-k lookup is one primary-key range scan (rank <= k)
+NEIGHBORS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        hymn_id TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        other_id TEXT NOT NULL,
+        similarity REAL NOT NULL,
+        metric TEXT NOT NULL,
+        PRIMARY KEY (metric, hymn_id, rank)
+    ) WITHOUT ROWID
+'''
+NEIGHBORS_TOP_K = 50  # enough for the API's diverse-neighbor candidates
+
+def RankNeighbors(conn: sqlite3.Connection, metric: str, pairTable: str, topK: int = NEIGHBORS_TOP_K,
+                  hymnIds: Optional[Sequence[str]] = None) -> int:
+    """Replace a metric's rows in hymn_neighbors with the top k of each hymn from a pair table.
+
+    Pair tables store each pair once; both directions are ranked here, ties
+    broken by the other hymn's id. With hymnIds only those hymns' rows are
+    replaced, reading just their pairs through the pair table's indexes.
+    Runs inside the caller's transaction.
+    """
+    conn.execute(NEIGHBORS_TABLE_SQL.format(table="hymn_neighbors"))
+    if hymnIds is None:
+        conn.execute('DELETE FROM hymn_neighbors WHERE metric = ?', (metric,))
+        pairs = f'''
+            SELECT hymn1_id AS hymn_id, hymn2_id AS other_id, similarity FROM {pairTable}
+            UNION ALL
+            SELECT hymn2_id, hymn1_id, similarity FROM {pairTable}
+        '''
+    else:
+        conn.execute('DROP TABLE IF EXISTS temp.rerank_hymns')
+        conn.execute('CREATE TEMP TABLE rerank_hymns (hymn_id TEXT PRIMARY KEY)')
+        conn.executemany('INSERT OR IGNORE INTO rerank_hymns (hymn_id) VALUES (?)', [(h,) for h in hymnIds])
+        conn.execute('DELETE FROM hymn_neighbors WHERE metric = ? AND hymn_id IN (SELECT hymn_id FROM rerank_hymns)', (metric,))
+        pairs = f'''
+            SELECT hymn1_id AS hymn_id, hymn2_id AS other_id, similarity FROM {pairTable}
+            WHERE hymn1_id IN (SELECT hymn_id FROM rerank_hymns)
+            UNION ALL
+            SELECT hymn2_id, hymn1_id, similarity FROM {pairTable}
+            WHERE hymn2_id IN (SELECT hymn_id FROM rerank_hymns)
+        '''
+    return conn.execute(f'''
+        INSERT INTO hymn_neighbors (hymn_id, rank, other_id, similarity, metric)
+        SELECT hymn_id, rank, other_id, similarity, ? FROM (
+            SELECT hymn_id, other_id, similarity,
+                   ROW_NUMBER() OVER (PARTITION BY hymn_id ORDER BY similarity DESC, other_id) AS rank
+            FROM ({pairs})
+        )
+        WHERE rank <= ?
+    ''', (metric, topK)).rowcount
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+def _Columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _CreateTable(conn: sqlite3.Connection, table: str, createSql: str) -> None:
+    if not _Columns(conn, table):
+        conn.execute(createSql.format(table=table))
+
+def _AddColumn(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+    # Databases from before schema_version may already have the column
+    if column not in _Columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _CreateIndexes(conn: sqlite3.Connection, table: str, indexSql: Sequence[str]) -> None:
+    for sql in indexSql:
+        conn.execute(sql.format(table=table))
+
+def _BaseTables(conn: sqlite3.Connection) -> None:
+    _CreateTable(conn, "hymn_vectors", HYMN_VECTORS_SQL)
+    _CreateTable(conn, "deity_index", DEITY_INDEX_SQL)
+    _CreateTable(conn, "hymn_similarities_cosine", SIMILARITY_TABLE_SQL)
+    _CreateTable(conn, "hymn_summaries", SUMMARIES_TABLE_SQL)
+
+def _DerivedColumns(conn: sqlite3.Connection) -> None:
+    # Filled in by count_hymn_words.py, assign_hymn_deities.py and create_deity_colors.py
+    _AddColumn(conn, "hymn_vectors", "word_count", "INTEGER DEFAULT 0")
+    _AddColumn(conn, "hymn_vectors", "primary_deity_id", "INTEGER")
+    _AddColumn(conn, "deity_index", "deity_color", "TEXT")
+
+def _CoveringIndexes(conn: sqlite3.Connection) -> None:
+    # Replaces the single-column similarity indexes the API used to create on startup
+    for name in ("idx_hymn_sim_h1", "idx_hymn_sim_h2", "idx_hymn_similarities_cosine_hymn2"):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    _CreateIndexes(conn, "hymn_vectors", HYMN_VECTORS_INDEXES)
+    _CreateIndexes(conn, "deity_index", DEITY_INDEX_INDEXES)
+    _CreateIndexes(conn, "hymn_similarities_cosine", SIMILARITY_INDEXES)
+
+def _NeighborsTable(conn: sqlite3.Connection) -> None:
+    # Derived from the pair tables already in the database, no similarity rerun needed
+    conn.execute(NEIGHBORS_TABLE_SQL.format(table="hymn_neighbors"))
+    for metric, pairTable in (("cosine", "hymn_similarities_cosine"), ("semantic", "hymn_similarities_semantic")):
+        hasRows = conn.execute('SELECT 1 FROM hymn_neighbors WHERE metric = ? LIMIT 1', (metric,)).fetchone()
+        if _Columns(conn, pairTable) and not hasRows:
+            RankNeighbors(conn, metric, pairTable)
+
+def _SimilarityState(conn: sqlite3.Connection) -> None:
+    _CreateTable(conn, "hymn_similarity_state", SIMILARITY_STATE_SQL)
+    # semantic_similarity.py used to create its own (hymnX_id, similarity DESC) indexes
+    if _Columns(conn, "hymn_similarities_semantic"):
+        for name in ("idx_hymn_similarities_semantic_hymn1", "idx_hymn_similarities_semantic_hymn2"):
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        _CreateIndexes(conn, "hymn_similarities_semantic", SIMILARITY_INDEXES)
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, "base tables", _BaseTables),
+    Migration(2, "word_count, primary_deity_id and deity_color columns", _DerivedColumns),
+    Migration(3, "covering indexes for the API queries", _CoveringIndexes),
+    Migration(4, "hymn_neighbors table ranked from the pair tables", _NeighborsTable),
+    Migration(5, "hymn_similarity_state table and shared indexes on the semantic pair table", _SimilarityState),
+)
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+def _CurrentVersion(conn: sqlite3.Connection) -> int:
+    try:
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+def SchemaVersion(dbPath: Path = DB_PATH) -> int:
+    """Version of the database schema, read without modifying the database"""
+    conn = sqlite3.connect(f"file:{dbPath}?mode=ro", uri=True, timeout=30)
+    try:
+        return _CurrentVersion(conn)
+    finally:
+        conn.close()
+
+def Migrate(dbPath: Path = DB_PATH, target: Optional[int] = None, verbose: bool = False) -> List[Migration]:
+    """Apply every pending migration up to target (default: all); returns those applied"""
+    target = SCHEMA_VERSION if target is None else target
+    applied = []
+    # Autocommit mode: each migration runs in its own explicit transaction
+    conn = sqlite3.connect(dbPath, isolation_level=None, timeout=30)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        for migration in MIGRATIONS:
+            if migration.version > target:
+                break
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Re-read under the write lock in case another script got here first
+                if migration.version <= _CurrentVersion(conn):
+                    conn.execute('COMMIT')
+                    continue
+                migration.apply(conn)
+                conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                             (migration.version, migration.description))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            applied.append(migration)
+            if verbose:
+                print(f"✓ Applied migration {migration.version}: {migration.description}")
+    finally:
+        conn.close()
+    return applied
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations to hymn_vectors.db")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    parser.add_argument("--target", type=int, default=None, help="stop after this version")
+    args = parser.parse_args()
+
+    if args.status:
+        current = SchemaVersion() if DB_PATH.exists() else 0
+        for migration in MIGRATIONS:
+            state = "applied" if migration.version <= current else "pending"
+            print(f"  {migration.version:>3}  {state:<8} {migration.description}")
+        return
+
+    applied = Migrate(target=args.target, verbose=True)
+    print(f"Schema at version {SchemaVersion()} ({len(applied)} migration(s) applied)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Local stand-in for a rate-limited chat-completions API.
+
+Accepts POSTs to any path ending in /chat/completions and answers with a
+one-sentence "summary" built from the prompt (or, for JSON-mode requests,
+a JSON object of them keyed by hymn id). Like the real provider it
+enforces requests-per-minute and tokens-per-minute limits (as continuously
+refilled buckets), reports them in x-ratelimit-* headers and rejects
+requests over the limit with 429 and Retry-After.
+
+    python mock_chat_server.py --port 8766 --rpm 300 --tpm 60000 --latency 0.5
+    python summarize_hymns_groq.py --api-url http://127.0.0.1:8766/openai/v1/chat/completions
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+
+def CountTokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+class _Limits:
+    """Server-side request and token buckets"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm, self.tpm = float(rpm), float(tpm)
+        self.requests, self.tokens = self.rpm, self.tpm
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def Take(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.updated
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60.0)
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60.0)
+            self.updated = now
+            allowed = self.requests >= 1 and self.tokens >= tokens
+            if allowed:
+                self.requests -= 1
+                self.tokens -= tokens
+            retryAfter = max((1 - self.requests) * 60.0 / self.rpm, (tokens - self.tokens) * 60.0 / self.tpm, 0.0)
+            headers = {
+                "x-ratelimit-limit-requests": str(int(self.rpm)),
+                "x-ratelimit-limit-tokens": str(int(self.tpm)),
+                "x-ratelimit-remaining-requests": str(int(self.requests)),
+                "x-ratelimit-remaining-tokens": str(int(self.tokens)),
+                "x-ratelimit-reset-requests": f"{(self.rpm - self.requests) * 60.0 / self.rpm:.2f}s",
+                "x-ratelimit-reset-tokens": f"{(self.tpm - self.tokens) * 60.0 / self.tpm:.2f}s",
+            }
+            if not allowed:
+                headers["retry-after"] = f"{retryAfter:.2f}"
+            return allowed, headers
+
+def _Sentence(text: str) -> str:
+    return f"This hymn begins with {' '.join(text.split()[:6])}."
+
+def MockReply(messages, jsonObject: bool = False) -> str:
+    """A deterministic one-sentence reply naming the first words of the prompt.
+
+    With jsonObject, the prompt holds several hymns under '### <id>' lines
+    and the reply maps each id to its sentence.
+    """
+    content = messages[-1]["content"]
+    if not jsonObject:
+        return _Sentence(content.split(":", 1)[-1])
+    sections = re.split(r"^### (\S+)\n", content, flags=re.MULTILINE)[1:]
+    return json.dumps({hymnId: _Sentence(text) for hymnId, text in zip(sections[::2], sections[1::2])})
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    # Set on the subclass built by StartMockChatServer
+    limits: _Limits = None
+    latency = 0.0
+    counter: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def _Send(self, status: int, body: Dict[str, Any], headers: Dict[str, str]):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        messages = request["messages"]
+        promptTokens = sum(CountTokens(message["content"]) for message in messages)
+        maxCompletion = int(request.get("max_completion_tokens", 64))
+
+        # Like the real provider, the limit is charged with the worst case up front
+        allowed, headers = self.limits.Take(promptTokens + maxCompletion)
+        with self.lock:
+            self.counter["requests"] += 1
+            if not allowed:
+                self.counter["rejected"] += 1
+        if not allowed:
+            self._Send(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}}, headers)
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+        content = MockReply(messages, (request.get("response_format") or {}).get("type") == "json_object")
+        completionTokens = min(maxCompletion, CountTokens(content))
+        with self.lock:
+            self.counter["completed"] += 1
+            self.counter["tokens"] += promptTokens + completionTokens
+        self._Send(200, {
+            "id": f"mock-{self.counter['completed']}",
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": promptTokens, "completion_tokens": completionTokens,
+                      "total_tokens": promptTokens + completionTokens},
+        }, headers)
+
+    def log_message(self, format, *args):
+        pass
+
+def StartMockChatServer(port: int = 0, rpm: int = 30, tpm: int = 8000, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Serve the mock API from a daemon thread; the endpoint is at server.api_url"""
+    handler = type("Handler", (MockChatHandler,), {
+        "limits": _Limits(rpm, tpm),
+        "latency": latency,
+        "counter": {"requests": 0, "rejected": 0, "completed": 0, "tokens": 0},
+        "lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.handler = handler
+    server.api_url = f"http://127.0.0.1:{server.server_address[1]}/openai/v1/chat/completions"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a rate-limited mock chat-completions API")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--rpm", type=int, default=30, help="requests per minute")
+    parser.add_argument("--tpm", type=int, default=8000, help="tokens per minute")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    args = parser.parse_args()
+
+    server = StartMockChatServer(args.port, args.rpm, args.tpm, args.latency)
+    print(f"Serving mock completions at {server.api_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
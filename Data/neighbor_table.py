@@ -0,0 +1,161 @@
+"""
+Compact top-k neighbor storage shared by the similarity scripts.
+
+Instead of one row per hymn pair, each hymn keeps only its k most similar
+hymns. Both directions are stored and pre-ranked, so fetching the top k for
+a hymn is a single primary-key range scan. Rows are written straight from
+NumPy blocks; the quadratic pair list is never materialized.
+"""
+
+import sqlite3
+from itertools import repeat
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from bulk_load import ReplaceTable
+from migrations import NEIGHBORS_TABLE_SQL, NEIGHBORS_TOP_K, RankNeighbors
+
+DB_PATH = Path(__file__).parent.parent / "hymn_vectors.db"
+NEIGHBORS_TABLE = "hymn_neighbors"
+
+NeighborBlock = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+NEIGHBOR_COLUMNS = ("hymn_id", "rank", "other_id", "similarity", "metric")
+
+def CreateNeighborsTable(conn: sqlite3.Connection) -> None:
+    """Create the neighbor table if it does not exist yet"""
+    conn.execute(NEIGHBORS_TABLE_SQL.format(table=NEIGHBORS_TABLE))
+
+def TopKNeighborBlocks(similarityRows: Callable[[np.ndarray], np.ndarray], rows: np.ndarray, topK: int,
+                       minSimilarity: Optional[float] = None, blockSize: int = 256) -> Iterator[NeighborBlock]:
+    """Yield (row, rank, other, similarity) arrays for the top k neighbors of each row.
+
+    similarityRows maps an array of row positions to their similarity
+    against every hymn, shape (len(rows), numHymns).
+    """
+    for start in range(0, len(rows), blockSize):
+        blockRows = np.asarray(rows[start:start + blockSize], dtype=np.int64)
+        similarities = np.array(similarityRows(blockRows), dtype=np.float32)
+        similarities[np.arange(len(blockRows)), blockRows] = -np.inf
+        if minSimilarity is not None:
+            similarities[similarities < minSimilarity] = -np.inf
+
+        k = min(topK, similarities.shape[1] - 1)
+        if k <= 0:
+            continue
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        values = np.take_along_axis(similarities, candidates, axis=1)
+        # Highest similarity first, ties broken by position for stable output
+        order = np.lexsort((candidates, -values))
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+
+        keep = np.isfinite(values)
+        yield (
+            np.repeat(blockRows, k).reshape(-1, k)[keep],
+            np.tile(np.arange(1, k + 1), (len(blockRows), 1))[keep],
+            candidates[keep],
+            values[keep],
+        )
+
+def SaveNeighbors(hymnIds: List[str], blocks: Iterable[NeighborBlock], metric: str,
+                  replaceHymnIds: Optional[Iterable[str]] = None, dbPath: Path = DB_PATH) -> int:
+    """Write neighbor blocks for one metric in a single transaction.
+
+    With replaceHymnIds=None every row of the metric is replaced; otherwise
+    only the rows belonging to those hymns are.
+    """
+    ids = np.array(hymnIds, dtype=object)
+    insertSql = f'INSERT INTO {NEIGHBORS_TABLE} (hymn_id, rank, other_id, similarity, metric) VALUES (?, ?, ?, ?, ?)'
+
+    if replaceHymnIds is None:
+        # Full rebuild: stage the new rows next to the other metrics' rows and swap
+        def Rows():
+            for rowIdx, ranks, otherIdx, similarities in blocks:
+                yield from zip(ids[rowIdx], ranks.tolist(), ids[otherIdx], similarities.tolist(), repeat(metric))
+        return ReplaceTable(NEIGHBORS_TABLE, NEIGHBORS_TABLE_SQL, NEIGHBOR_COLUMNS, Rows(),
+                            keepWhere=("metric != ?", (metric,)), dbPath=dbPath)
+
+    conn = sqlite3.connect(dbPath)
+    try:
+        CreateNeighborsTable(conn)
+        cursor = conn.cursor()
+        cursor.executemany(f'DELETE FROM {NEIGHBORS_TABLE} WHERE metric = ? AND hymn_id = ?',
+                           zip(repeat(metric), replaceHymnIds))
+
+        written = 0
+        for rowIdx, ranks, otherIdx, similarities in blocks:
+            cursor.executemany(insertSql, zip(ids[rowIdx], ranks.tolist(), ids[otherIdx], similarities.tolist(), repeat(metric)))
+            written += len(ranks)
+        conn.commit()
+    finally:
+        conn.close()
+    return written
+
+def RankPairNeighbors(metric: str, pairTable: str, topK: int = NEIGHBORS_TOP_K, dbPath: Path = DB_PATH,
+                      hymnIds: Optional[Iterable[str]] = None) -> int:
+    """Rebuild a metric's neighbor rows from its pair table in one transaction.
+
+    With hymnIds (e.g. from FindAffectedHymns) only those hymns are re-ranked,
+    so an incremental update costs their pairs rather than the whole table.
+    """
+    conn = sqlite3.connect(dbPath)
+    try:
+        ranked = RankNeighbors(conn, metric, pairTable, topK, None if hymnIds is None else list(hymnIds))
+        conn.commit()
+    finally:
+        conn.close()
+    return ranked
+
+def HasNeighbors(metric: str, dbPath: Path = DB_PATH) -> bool:
+    """Check whether neighbors for a metric have been stored"""
+    conn = sqlite3.connect(dbPath)
+    try:
+        return conn.execute(f'SELECT 1 FROM {NEIGHBORS_TABLE} WHERE metric = ? LIMIT 1', (metric,)).fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+def FindAffectedHymns(hymnIds: List[str], changedIds: List[str], removedIds: List[str], changedSimilarities: np.ndarray,
+                      metric: str, topK: int, minSimilarity: Optional[float] = None, dbPath: Path = DB_PATH) -> Set[str]:
+    """Find hymns whose stored top-k list can change after the given hymns changed.
+
+    changedSimilarities holds the new similarity of each changed hymn (rows,
+    in changedIds order) against every hymn in hymnIds (columns). A hymn is
+    affected if it changed, if its list mentions a changed or removed hymn,
+    or if a changed hymn now scores high enough to enter its list.
+    """
+    affected = set(changedIds)
+    conn = sqlite3.connect(dbPath)
+    try:
+        conn.execute('CREATE TEMP TABLE stale_hymns (hymn_id TEXT PRIMARY KEY)')
+        conn.executemany('INSERT INTO stale_hymns (hymn_id) VALUES (?)', [(h,) for h in changedIds + removedIds])
+        affected.update(row[0] for row in conn.execute(f'''
+            SELECT DISTINCT hymn_id FROM {NEIGHBORS_TABLE}
+            WHERE metric = ? AND other_id IN (SELECT hymn_id FROM stale_hymns)
+        ''', (metric,)))
+        floors = {hymnId: (count, lowest) for hymnId, count, lowest in conn.execute(f'''
+            SELECT hymn_id, COUNT(*), MIN(similarity) FROM {NEIGHBORS_TABLE}
+            WHERE metric = ? GROUP BY hymn_id
+        ''', (metric,))}
+    finally:
+        conn.close()
+
+    if len(changedIds) == 0:
+        return affected - set(removedIds)
+
+    position = {hymnId: i for i, hymnId in enumerate(hymnIds)}
+    similarities = np.array(changedSimilarities, dtype=np.float32)
+    similarities[np.arange(len(changedIds)), [position[h] for h in changedIds]] = -np.inf
+    best = similarities.max(axis=0)
+    entryFloor = -np.inf if minSimilarity is None else minSimilarity
+
+    for hymnId, i in position.items():
+        count, lowest = floors.get(hymnId, (0, None))
+        floor = entryFloor if count < topK else max(lowest, entryFloor)
+        if best[i] >= floor:
+            affected.add(hymnId)
+    return affected - set(removedIds)
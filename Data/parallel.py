@@ -0,0 +1,66 @@
+"""
+Per-book parallel map for the Data scripts.
+
+Work is split into one task per book and run on a process pool; results are
+put back in input order, so output does not depend on which worker finishes
+first. Corpus hymns are not pickled to the workers: each worker maps the
+corpus itself and receives only positions.
+
+func (and anything bound to it with functools.partial) must be picklable,
+i.e. defined at module level. Scripts using this must keep their work under
+an `if __name__ == "__main__":` guard, because on spawn-based platforms
+(macOS, Windows) every worker re-imports the main module.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from corpus import Hymn, LoadCorpus
+
+def _HymnTask(args: Tuple[Callable[[Hymn], Any], List[int]]) -> List[Any]:
+    func, positions = args
+    corpus = LoadCorpus()
+    return [func(corpus.Hymn(i)) for i in positions]
+
+def _ItemTask(args: Tuple[Callable[[Any], Any], List[Any]]) -> List[Any]:
+    func, items = args
+    return [func(item) for item in items]
+
+def _Partition(books: Sequence[int]) -> List[List[int]]:
+    """Indices grouped by book, largest book first so the pool stays busy"""
+    byBook: Dict[int, List[int]] = {}
+    for i, book in enumerate(books):
+        byBook.setdefault(book, []).append(i)
+    return sorted(byBook.values(), key=len, reverse=True)
+
+def MapByBook(func: Callable[[Any], Any], items: Optional[Sequence[Any]] = None,
+              bookOf: Optional[Callable[[Any], int]] = None, jobs: Optional[int] = None) -> List[Any]:
+    """Apply func to every corpus hymn (or to items, grouped by bookOf), one book per task.
+
+    Returns func's results in corpus (or items) order. jobs defaults to one
+    worker per core; jobs=1 runs everything in this process.
+    """
+    if items is None:
+        corpus = LoadCorpus()
+        groups = _Partition(corpus.hymns["book_number"].tolist())
+        tasks = [(_HymnTask, (func, group)) for group in groups]
+        total = len(corpus)
+    else:
+        groups = _Partition([bookOf(item) for item in items])
+        tasks = [(_ItemTask, (func, [items[i] for i in group])) for group in groups]
+        total = len(items)
+
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs <= 1:
+        outputs = [task(args) for task, args in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(task, args) for task, args in tasks]
+            outputs = [future.result() for future in futures]
+
+    results: List[Any] = [None] * total
+    for group, output in zip(groups, outputs):
+        for i, result in zip(group, output):
+            results[i] = result
+    return results
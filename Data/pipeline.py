@@ -0,0 +1,332 @@
+"""
+Incremental runner for the Data pipeline.
+
+Each stage is one of the Data scripts with declared inputs and outputs.
+Artifacts are paths under Data/ (files or directories) or SQLite tables,
+written "db:table" or "db:table:col1,col2" when a stage only owns some
+columns, and "db:table[col=value]" when it only owns the rows where col
+has that value. A stage is skipped when its code, arguments, input hashes and
+output hashes all match its last successful run; stages whose upstream
+stages are done run in parallel.
+
+    python pipeline.py                    # bring every stage up to date
+    python pipeline.py hymn_similarity    # one stage plus what it depends on
+    python pipeline.py --dry-run          # show what would run
+    python pipeline.py scrape             # on-demand stages only run when named
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+DATA_DIR = Path(__file__).parent
+DB_PATH = DATA_DIR.parent / "hymn_vectors.db"
+STATE_PATH = DATA_DIR / ".pipeline_state.json"
+LOG_DIR = DATA_DIR / ".pipeline_logs"
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    script: str
+    inputs: Tuple[str, ...]
+    outputs: Tuple[str, ...]
+    args: Tuple[str, ...] = ()
+    onDemand: bool = False
+
+STAGES = (
+    Stage("scrape", "rigveda_scraper.py", (),
+          ("JSONMaps/rigveda_data.json", "rigveda_texts"), onDemand=True),
+    Stage("corpus", "corpus.py",
+          ("JSONMaps/rigveda_data.json",),
+          ("Corpus",)),
+    Stage("explore", "Explore.py",
+          ("Corpus",),
+          ("JSONMaps/title_map.json",
+           "db:hymn_vectors:hymn_id,book_number,hymn_number,title,deity_vector,deity_names,deity_count,hymn_score",
+           "db:deity_index:deity_id,deity_name,vector_position,deity_frequency")),
+    Stage("count_words", "count_hymn_words.py",
+          ("Corpus", "db:hymn_vectors:hymn_id,book_number"),
+          ("db:hymn_vectors:word_count",)),
+    Stage("assign_deities", "assign_hymn_deities.py",
+          ("Corpus", "db:hymn_vectors:hymn_id,title,book_number,hymn_number",
+           "db:deity_index:deity_id,deity_name,deity_frequency"),
+          ("db:hymn_vectors:primary_deity_id",)),
+    Stage("deity_colors", "create_deity_colors.py",
+          ("db:hymn_vectors:hymn_id,primary_deity_id", "db:deity_index:deity_id,deity_name,deity_frequency"),
+          ("db:deity_index:deity_color", "JSONMaps/deity_colors.json")),
+    Stage("hymn_similarity", "hymn_similarity.py",
+          ("db:hymn_vectors:hymn_id,book_number,hymn_number,title,deity_vector", "db:deity_index:deity_id"),
+          ("db:hymn_similarities_cosine", "db:hymn_neighbors[metric=cosine]", "db:hymn_similarity_state")),
+    Stage("summaries", "load_summaries.py",
+          ("JSONMaps/rigveda_summaries.json", "JSONMaps/rigveda_summaries.jsonl"),
+          ("db:hymn_summaries",)),
+    Stage("semantic_similarity", "semantic_similarity.py",
+          ("JSONMaps/rigveda_summaries.json", "JSONMaps/rigveda_summaries.jsonl"),
+          ("Embeddings", "db:hymn_similarities_semantic", "db:hymn_neighbors[metric=semantic]")),
+)
+
+def _ParseArtifact(artifact: str) -> Tuple[str, str, Optional[Tuple[str, ...]], Optional[Tuple[str, str]]]:
+    """Split an artifact into (kind, name, columns, (column, value) row filter)"""
+    if artifact.startswith("db:"):
+        _, table, *columns = artifact.split(":")
+        rows = None
+        if table.endswith("]"):
+            table, condition = table[:-1].split("[", 1)
+            rows = tuple(condition.split("=", 1))
+        return "db", table, tuple(columns[0].split(",")) if columns else None, rows
+    return "path", artifact, None, None
+
+def _Overlaps(a: str, b: str, byColumn: bool = True) -> bool:
+    """Whether two artifacts can refer to the same data (byColumn: tell column and row subsets apart)"""
+    kindA, nameA, colsA, rowsA = _ParseArtifact(a)
+    kindB, nameB, colsB, rowsB = _ParseArtifact(b)
+    if kindA != kindB:
+        return False
+    if kindA == "path":
+        partsA, partsB = Path(nameA).parts, Path(nameB).parts
+        shorter = min(len(partsA), len(partsB))
+        return partsA[:shorter] == partsB[:shorter]
+    if nameA != nameB:
+        return False
+    if not byColumn:
+        return True
+    if rowsA is not None and rowsB is not None and rowsA[0] == rowsB[0] and rowsA[1] != rowsB[1]:
+        return False
+    return colsA is None or colsB is None or bool(set(colsA) & set(colsB))
+
+def _HashPath(path: Path) -> Optional[str]:
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    for file in files:
+        digest.update(str(file.relative_to(path if path.is_dir() else path.parent)).encode("utf-8") + b"\0")
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+def _HashTable(table: str, columns: Optional[Tuple[str, ...]], rows: Optional[Tuple[str, str]] = None,
+               dbPath: Path = DB_PATH) -> Optional[str]:
+    if not dbPath.exists():
+        return None
+    conn = sqlite3.connect(f"file:{dbPath}?mode=ro", uri=True, timeout=30)
+    try:
+        existing = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if not existing:
+            return None
+        columns = columns or tuple(existing)
+        if not set(columns) <= set(existing) or (rows is not None and rows[0] not in existing):
+            return None
+        columnList = ", ".join(columns)
+        order = ", ".join(str(i) for i in range(1, len(columns) + 1))
+        digest = hashlib.sha256(columnList.encode("utf-8"))
+        where, params = "", ()
+        if rows is not None:
+            where, params = f" WHERE {rows[0]} = ?", (rows[1],)
+            digest.update(f"{rows[0]}={rows[1]}".encode("utf-8"))
+        cursor = conn.execute(f"SELECT {columnList} FROM {table}{where} ORDER BY {order}", params)
+        for rows in iter(lambda: cursor.fetchmany(10000), []):
+            digest.update(repr(rows).encode("utf-8"))
+        return digest.hexdigest()
+    finally:
+        conn.close()
+
+def HashArtifact(artifact: str) -> Optional[str]:
+    """Content hash of an artifact, or None if it does not exist"""
+    kind, name, columns, rows = _ParseArtifact(artifact)
+    if kind == "db":
+        return _HashTable(name, columns, rows)
+    return _HashPath(DATA_DIR / name)
+
+def _LocalImports(script: Path) -> Set[Path]:
+    """The script plus every sibling Data module it imports, transitively"""
+    seen: Set[Path] = set()
+    pending = [script]
+    while pending:
+        path = pending.pop()
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"))):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                names = [node.module]
+            else:
+                continue
+            pending.extend(DATA_DIR / f"{name.split('.')[0]}.py" for name in names)
+    return seen
+
+def CodeHash(stage: Stage) -> str:
+    """Hash of a stage's script, its local imports and its arguments"""
+    digest = hashlib.sha256("\0".join(stage.args).encode("utf-8"))
+    for path in sorted(_LocalImports(DATA_DIR / stage.script)):
+        digest.update(path.name.encode("utf-8") + b"\0" + path.read_bytes())
+    return digest.hexdigest()
+
+def _CheckAcyclic(deps: Dict[str, Set[str]]) -> None:
+    """Raise if some stages can never start because they wait on each other"""
+    ordered: Set[str] = set()
+    ready = [name for name, upstream in deps.items() if not upstream]
+    while ready:
+        ordered.add(ready.pop())
+        ready.extend(name for name, upstream in deps.items()
+                     if name not in ordered and name not in ready and upstream <= ordered)
+    waiting = [name for name in deps if name not in ordered]
+    if waiting:
+        raise SystemExit(f"Dependency cycle between stage(s): {', '.join(waiting)}")
+
+class Pipeline:
+    def __init__(self, stages: Tuple[Stage, ...] = STAGES, statePath: Path = STATE_PATH):
+        self.stages = {stage.name: stage for stage in stages}
+        self.statePath = statePath
+        self.state: Dict[str, Dict] = json.loads(statePath.read_text()) if statePath.exists() else {}
+        self._hashes: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def Dependencies(self, stage: Stage) -> Set[str]:
+        """Names of the stages producing any of this stage's inputs"""
+        return {other.name for other in self.stages.values()
+                if other.name != stage.name
+                and any(_Overlaps(i, o) for i in stage.inputs for o in other.outputs)}
+
+    def Select(self, targets: List[str]) -> List[str]:
+        """Targets plus their upstream stages, in declaration order"""
+        unknown = [name for name in targets if name not in self.stages]
+        if unknown:
+            raise SystemExit(f"Unknown stage(s): {', '.join(unknown)}")
+        wanted = set(targets) or {name for name, stage in self.stages.items() if not stage.onDemand}
+        pending = list(wanted)
+        while pending:
+            for dep in self.Dependencies(self.stages[pending.pop()]):
+                # On-demand stages (e.g. scraping) are never pulled in implicitly
+                if dep not in wanted and not self.stages[dep].onDemand:
+                    wanted.add(dep)
+                    pending.append(dep)
+        return [name for name in self.stages if name in wanted]
+
+    def _Hash(self, artifact: str) -> Optional[str]:
+        with self._lock:
+            if artifact in self._hashes:
+                return self._hashes[artifact]
+        value = HashArtifact(artifact)
+        with self._lock:
+            self._hashes[artifact] = value
+        return value
+
+    def _Invalidate(self, artifacts: Tuple[str, ...]) -> None:
+        with self._lock:
+            # A stage may rebuild a whole table, so drop every cached hash of it
+            for cached in list(self._hashes):
+                if any(_Overlaps(cached, artifact, byColumn=False) for artifact in artifacts):
+                    del self._hashes[cached]
+
+    def _Key(self, stage: Stage) -> str:
+        digest = hashlib.sha256(CodeHash(stage).encode("utf-8"))
+        for artifact in stage.inputs:
+            digest.update(f"{artifact}={self._Hash(artifact)}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def IsFresh(self, stage: Stage) -> bool:
+        record = self.state.get(stage.name)
+        if record is None or record.get("key") != self._Key(stage):
+            return False
+        outputs = {artifact: self._Hash(artifact) for artifact in stage.outputs}
+        return None not in outputs.values() and outputs == record.get("outputs")
+
+    def RunStage(self, stage: Stage, force: bool, dryRun: bool) -> str:
+        """Run one stage unless it is up to date; returns its status"""
+        if not force and self.IsFresh(stage):
+            return "skipped"
+        if dryRun:
+            return "would run"
+
+        LOG_DIR.mkdir(exist_ok=True)
+        with open(LOG_DIR / f"{stage.name}.log", "w", encoding="utf-8") as log:
+            result = subprocess.run([sys.executable, stage.script, *stage.args], cwd=DATA_DIR,
+                                    stdout=log, stderr=subprocess.STDOUT)
+        self._Invalidate(stage.outputs)
+        if result.returncode != 0:
+            return f"failed ({result.returncode})"
+
+        record = {"key": self._Key(stage), "outputs": {artifact: self._Hash(artifact) for artifact in stage.outputs}}
+        with self._lock:
+            self.state[stage.name] = record
+            self._SaveState()
+        return "ran"
+
+    def _SaveState(self) -> None:
+        tmpPath = self.statePath.with_suffix(".tmp")
+        tmpPath.write_text(json.dumps(self.state, indent=2, sort_keys=True))
+        os.replace(tmpPath, self.statePath)
+
+    def Run(self, targets: List[str], jobs: int, force: bool = False, dryRun: bool = False) -> Dict[str, Tuple[str, float]]:
+        """Run the selected stages, each as soon as its upstream stages finish"""
+        selected = self.Select(targets)
+        deps = {name: self.Dependencies(self.stages[name]) & set(selected) for name in selected}
+        _CheckAcyclic(deps)
+        report: Dict[str, Tuple[str, float]] = {}
+        running: Dict = {}
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while len(report) < len(selected):
+                for name in selected:
+                    if name in report or any(name == runningName for runningName, _ in running.values()):
+                        continue
+                    if any(report.get(dep, ("",))[0].startswith(("failed", "blocked")) for dep in deps[name]):
+                        report[name] = ("blocked", 0.0)
+                    elif all(dep in report for dep in deps[name]):
+                        future = pool.submit(self.RunStage, self.stages[name], force, dryRun)
+                        running[future] = (name, time.perf_counter())
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    report[name] = (future.result(), time.perf_counter() - started)
+                    status = report[name][0]
+                    print(f"  {name:<22} {status:<12} {report[name][1]:>8.2f}s", flush=True)
+        return {name: report[name] for name in selected}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Data pipeline, skipping stages whose inputs are unchanged")
+    parser.add_argument("stages", nargs="*", help="stages to bring up to date (default: all except on-demand ones)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="stages to run at once")
+    parser.add_argument("--force", action="store_true", help="run the selected stages even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="report what would run without running it")
+    parser.add_argument("--list", action="store_true", help="list stages and their dependencies")
+    args = parser.parse_args()
+
+    pipeline = Pipeline()
+    if args.list:
+        for stage in pipeline.stages.values():
+            deps = ", ".join(sorted(pipeline.Dependencies(stage))) or "-"
+            print(f"{stage.name:<22} {stage.script:<26} after: {deps}{' (on demand)' if stage.onDemand else ''}")
+        return
+
+    start = time.perf_counter()
+    report = pipeline.Run(args.stages, args.jobs, args.force, args.dry_run)
+    print(f"\n{'stage':<22} {'status':<12} {'seconds':>9}")
+    for name, (status, seconds) in report.items():
+        print(f"{name:<22} {status:<12} {seconds:>9.2f}")
+    print(f"Total: {time.perf_counter() - start:.2f}s")
+
+    failed = [name for name, (status, _) in report.items() if status.startswith("failed")]
+    if failed:
+        print(f"Logs for failed stages are in {LOG_DIR}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
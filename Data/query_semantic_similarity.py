@@ -29,21 +29,17 @@ def GetSemanticSimilarity(hymnId1: str, hymnId2: str) -> Optional[float]:
     return result[0] if result else None
 
 def GetTopSemanticNeighbors(hymnId: str, topN: int = 10) -> List[Tuple[str, float]]:
-    """Get top N most semantically similar hymns for a given hymn"""
+    """Get top N most semantically similar hymns for a given hymn (at most the k stored per hymn)"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
+    # Pre-ranked in both directions by semantic_similarity.py: one primary-key range scan
     cursor.execute('''
-        SELECT hymn2_id, similarity
-        FROM hymn_similarities_semantic
-        WHERE hymn1_id = ?
-        UNION
-        SELECT hymn1_id, similarity
-        FROM hymn_similarities_semantic
-        WHERE hymn2_id = ?
-        ORDER BY similarity DESC
-        LIMIT ?
-    ''', (hymnId, hymnId, topN))
+        SELECT other_id, similarity
+        FROM hymn_neighbors
+        WHERE metric = 'semantic' AND hymn_id = ? AND rank <= ?
+        ORDER BY rank
+    ''', (hymnId, topN))
 
     results = cursor.fetchall()
     conn.close()
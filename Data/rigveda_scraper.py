@@ -1,25 +1,40 @@
-import requests
+import argparse
+import asyncio
 from bs4 import BeautifulSoup
+from concurrent.futures import ProcessPoolExecutor
 import time
 import json
 import os
 from urllib.parse import urljoin
-import random
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import logging
 import re
+from pathlib import Path
+
+from fetch_engine import FetchEngine
+from hymn_parser import MakeSoup, ParseHymnPages
+from journal import Journal, ReplayJournal
+
+DATA_DIR = Path(__file__).parent
+DATA_JSON_PATH = DATA_DIR / "JSONMaps" / "rigveda_data.json"
+TEXTS_DIR = DATA_DIR / "rigveda_texts"
+CACHE_DIR = DATA_DIR / ".http_cache"
+JOURNAL_PATH = DATA_DIR / ".scrape_journal.jsonl"
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class RigVedaScraper:
-    def __init__(self, base_url: str = "https://sacred-texts.com/hin/rigveda/index.htm"):
+    def __init__(self, base_url: str = "https://sacred-texts.com/hin/rigveda/index.htm",
+                 engine: Optional[FetchEngine] = None, journal_path: Optional[Path] = JOURNAL_PATH,
+                 parse_jobs: Optional[int] = None):
         self.base_url = base_url
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        self.engine = engine or FetchEngine(CACHE_DIR)
+        self.journal_path = journal_path
+        self.journal: Optional[Journal] = None
+        self.parse_jobs = parse_jobs
+        self.parse_pool: Optional[ProcessPoolExecutor] = None
         self.scraped_data = {
             'books': {},
             'total_hymns': 0,
@@ -31,44 +46,29 @@ class RigVedaScraper:
             }
         }
         
-    def AddDelay(self, min_delay: float = 1.0, max_delay: float = 3.0):
-        """Add random delay between requests to avoid rate limiting"""
-        delay = random.uniform(min_delay, max_delay)
-        time.sleep(delay)
+    async def FetchPage(self, url: str) -> Optional[bytes]:
+        """Fetch a page through the engine (cache, politeness limits and retries live there)"""
+        body = await self.engine.Fetch(url)
+        self.scraped_data['scraping_metadata']['total_requests'] = self.engine.stats['requests']
+        if body is None:
+            error_msg = f"Failed to fetch {url} after {self.engine.maxRetries} attempts"
+            self.scraped_data['scraping_metadata']['errors'].append(error_msg)
+        return body
         
-    def MakeRequest(self, url: str, max_retries: int = 3) -> Optional[BeautifulSoup]:
-        """Make HTTP request with retry logic and error handling"""
-        for attempt in range(max_retries):
-            try:
-                self.AddDelay()
-                response = self.session.get(url, timeout=30)
-                self.scraped_data['scraping_metadata']['total_requests'] += 1
-                
-                if response.status_code == 200:
-                    return BeautifulSoup(response.content, 'html.parser')
-                elif response.status_code == 429:  # Rate limited
-                    wait_time = 2 ** attempt * 5  # Exponential backoff
-                    logger.warning(f"Rate limited. Waiting {wait_time} seconds before retry {attempt + 1}")
-                    time.sleep(wait_time)
-                else:
-                    logger.error(f"HTTP {response.status_code} for URL: {url}")
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Request failed for {url}: {str(e)}")
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt
-                    logger.info(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                    
-        error_msg = f"Failed to fetch {url} after {max_retries} attempts"
-        logger.error(error_msg)
-        self.scraped_data['scraping_metadata']['errors'].append(error_msg)
-        return None
+    async def MakeRequest(self, url: str) -> Optional[BeautifulSoup]:
+        body = await self.FetchPage(url)
+        return MakeSoup(body) if body is not None else None
+        
+    async def ParsePages(self, pages: List[Tuple[Optional[bytes], str]]) -> List[Dict[str, str]]:
+        """Parse hymn pages on the process pool, or inline when there is none"""
+        if self.parse_pool is None:
+            return ParseHymnPages(pages)
+        return await asyncio.get_running_loop().run_in_executor(self.parse_pool, ParseHymnPages, pages)
         
-    def GetBookLinks(self) -> List[Dict[str, str]]:
+    async def GetBookLinks(self) -> List[Dict[str, str]]:
         """Extract all Rig-Veda book links from the main page"""
         logger.info("Fetching book links from main page...")
-        soup = self.MakeRequest(self.base_url)
+        soup = await self.MakeRequest(self.base_url)
         if not soup:
             return []
             
@@ -96,8 +96,6 @@ class RigVedaScraper:
         
     def ExtractBookNumber(self, text: str, href: str) -> int:
         """Extract book number from text or URL"""
-        import re
-        
         # Try to extract from text first
         numbers = re.findall(r'\d+', text)
         if numbers:
@@ -111,10 +109,10 @@ class RigVedaScraper:
         # Default fallback
         return 0
         
-    def GetHymnLinks(self, book_url: str) -> List[Dict[str, str]]:
+    async def GetHymnLinks(self, book_url: str) -> List[Dict[str, str]]:
         """Extract all hymn links from a book page"""
         logger.info(f"Fetching hymn links from: {book_url}")
-        soup = self.MakeRequest(book_url)
+        soup = await self.MakeRequest(book_url)
         if not soup:
             return []
             
@@ -148,91 +146,74 @@ class RigVedaScraper:
             return int(numbers[0])
         return 0
         
-    def ScrapeHymnText(self, hymn_url: str) -> Dict[str, str]:
-        """Extract hymn text and metadata from a hymn page"""
-        logger.info(f"Scraping hymn text from: {hymn_url}")
-        soup = self.MakeRequest(hymn_url)
-        if not soup:
-            return {'text': '', 'title': '', 'error': 'Failed to fetch page'}
-            
-        # Extract title
-        title = ''
-        title_element = soup.find('h3')
-        if title_element:
-            title = title_element.get_text(strip=True)
-            
-        # Extract main text content - only paragraphs that are siblings of h3 elements
-        text_content = ''
-        
-        # Find all h3 elements and get their following sibling paragraphs
-        h3_elements = soup.find_all('h3')
-        text_parts = []
+    def LoadJournal(self) -> int:
+        """Rebuild scraped_data from the journal; returns the number of hymns recovered"""
+        for record in ReplayJournal(self.journal_path) if self.journal_path else ():
+            if record['type'] == 'book':
+                book = self.scraped_data['books'].setdefault(record['book_number'], {'hymns': {}, 'total_hymns': 0})
+                book.update(book_number=record['book_number'], title=record['title'], url=record['url'])
+            elif record['type'] == 'hymn':
+                book = self.scraped_data['books'].setdefault(record['book_number'], {'hymns': {}, 'total_hymns': 0})
+                if record['hymn_number'] not in book['hymns']:
+                    book['total_hymns'] += 1
+                    self.scraped_data['total_hymns'] += 1
+                book['hymns'][record['hymn_number']] = {key: record[key] for key in ('text', 'title', 'url', 'hymn_number')}
+        return self.scraped_data['total_hymns']
         
-        for h3 in h3_elements:
-            # Get the next sibling paragraph
-            next_p = h3.find_next_sibling('p')
-            if next_p:
-                text = next_p.get_text(strip=True)
-                if text:  # Filter out short/empty content
-                    text_parts.append(text)
-        text_content=""
-        if text_parts:
-            for text_part in text_parts:
-                split_parts = re.split(r'(\d)', text_part)
-                filtered_parts = [f for f in split_parts if f.strip() and not f.isdigit()]
-                for f in filtered_parts:
-                    text_content += f
-        return {
-            'text': text_content,
-            'title': title,
-            'url': hymn_url
-        }
-        
-    def ScrapeBook(self, book_info: Dict[str, str]) -> Dict:
-        """Scrape all hymns from a single book"""
+    async def ScrapeBook(self, book_info: Dict[str, str]) -> Dict:
+        """Scrape all hymns from a single book, skipping hymns already in the journal"""
         book_number = book_info['book_number']
         book_url = book_info['url']
         
         logger.info(f"Starting to scrape Book {book_number}: {book_info['title']}")
         
-        book_data = {
-            'book_number': book_number,
-            'title': book_info['title'],
-            'url': book_url,
-            'hymns': {},
-            'total_hymns': 0
-        }
+        book_data = self.scraped_data['books'].setdefault(book_number, {'hymns': {}, 'total_hymns': 0})
+        book_data.update(book_number=book_number, title=book_info['title'], url=book_url)
+        self.JournalRecord({'type': 'book', 'book_number': book_number, 'title': book_info['title'], 'url': book_url})
         
         # Get all hymn links for this book
-        hymn_links = self.GetHymnLinks(book_url)
+        hymn_links = await self.GetHymnLinks(book_url)
+        pending = [hymn_info for hymn_info in hymn_links if hymn_info['hymn_number'] not in book_data['hymns']]
+        if len(pending) < len(hymn_links):
+            logger.info(f"Book {book_number}: {len(hymn_links) - len(pending)} hymns already in the journal")
         
-        for hymn_info in hymn_links:
+        # Fetch stage: the engine's per-host limits decide how many of these are actually in flight
+        urls = [hymn_info['url'] for hymn_info in pending]
+        bodies = await asyncio.gather(*(self.FetchPage(url) for url in urls))
+        
+        # Parse stage: runs on the pool while other books are still fetching
+        hymn_pages = await self.ParsePages(list(zip(bodies, urls)))
+        
+        for hymn_info, hymn_data in zip(pending, hymn_pages):
             hymn_number = hymn_info['hymn_number']
-            hymn_url = hymn_info['url']
-            
-            logger.info(f"Scraping Book {book_number}, Hymn {hymn_number}")
-            
-            # Scrape the hymn text
-            hymn_data = self.ScrapeHymnText(hymn_url)
             hymn_data['hymn_number'] = hymn_number
             
             book_data['hymns'][hymn_number] = hymn_data
             book_data['total_hymns'] += 1
             self.scraped_data['total_hymns'] += 1
-            
-            # Add extra delay for hymn scraping to be respectful
-            self.AddDelay(2.0, 4.0)
+            # Failed pages stay out of the journal so a rerun retries them
+            if 'error' not in hymn_data:
+                self.JournalRecord({'type': 'hymn', 'book_number': book_number, **hymn_data})
+        book_data['hymns'] = dict(sorted(book_data['hymns'].items()))
             
         logger.info(f"Completed Book {book_number} with {book_data['total_hymns']} hymns")
         return book_data
         
-    def ScrapeAllBooks(self) -> Dict:
-        """Scrape all Rig-Veda books and hymns"""
+    def JournalRecord(self, record: Dict):
+        if self.journal is not None:
+            self.journal.Append(record)
+        
+    async def ScrapeAllBooks(self) -> Dict:
+        """Scrape all Rig-Veda books and hymns, resuming from the journal"""
         logger.info("Starting Rig-Veda scraping process...")
         self.scraped_data['scraping_metadata']['start_time'] = time.time()
         
+        recovered = self.LoadJournal()
+        if recovered:
+            logger.info(f"Resuming with {recovered} hymns from {self.journal_path}")
+        
         # Get all book links
-        book_links = self.GetBookLinks()
+        book_links = await self.GetBookLinks()
         
         if not book_links:
             logger.error("No book links found!")
@@ -240,37 +221,49 @@ class RigVedaScraper:
             
         logger.info(f"Found {len(book_links)} books to scrape")
         
-        # Scrape each book
-        for book_info in book_links:
-            try:
-                book_data = self.ScrapeBook(book_info)
-                self.scraped_data['books'][book_data['book_number']] = book_data
-                
-                # Save progress after each book
-                self.SaveProgress()
-                self.SaveToTextFiles()
-                
-            except Exception as e:
-                error_msg = f"Error scraping book {book_info['book_number']}: {str(e)}"
+        # Scrape every book concurrently; every parsed hymn is journaled as it arrives
+        self.journal = Journal(self.journal_path) if self.journal_path else None
+        parse_jobs = self.parse_jobs or os.cpu_count() or 1
+        self.parse_pool = ProcessPoolExecutor(max_workers=parse_jobs) if parse_jobs > 1 else None
+        try:
+            results = await asyncio.gather(*(self.ScrapeBook(book_info) for book_info in book_links),
+                                           return_exceptions=True)
+        finally:
+            if self.journal is not None:
+                self.journal.Close()
+            if self.parse_pool is not None:
+                self.parse_pool.shutdown()
+                self.parse_pool = None
+        for book_info, book_data in zip(book_links, results):
+            if isinstance(book_data, Exception):
+                error_msg = f"Error scraping book {book_info['book_number']}: {str(book_data)}"
                 logger.error(error_msg)
                 self.scraped_data['scraping_metadata']['errors'].append(error_msg)
+        self.scraped_data['books'] = dict(sorted(self.scraped_data['books'].items()))
                 
         self.scraped_data['scraping_metadata']['end_time'] = time.time()
         
         logger.info(f"Scraping completed! Total hymns scraped: {self.scraped_data['total_hymns']}")
+        logger.info(f"Fetch stats: {self.engine.stats}")
         return self.scraped_data
         
-    def SaveProgress(self):
+    def Compact(self, output_file: Path = DATA_JSON_PATH, output_dir: Path = TEXTS_DIR):
+        """Write rigveda_data.json and the text tree once from the scraped data"""
+        self.SaveProgress(output_file)
+        self.SaveToTextFiles(output_dir)
+        
+    def SaveProgress(self, output_file: Path = DATA_JSON_PATH):
         """Save current progress to JSON file"""
-        output_file = 'rigveda_data.json'
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
+            tmp_file = Path(output_file).with_suffix('.json.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(self.scraped_data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_file, output_file)
             logger.info(f"Progress saved to {output_file}")
         except Exception as e:
             logger.error(f"Failed to save progress: {str(e)}")
             
-    def SaveToTextFiles(self, output_dir: str = 'rigveda_texts'):
+    def SaveToTextFiles(self, output_dir: Path = TEXTS_DIR):
         """Save scraped data to individual text files"""
         os.makedirs(output_dir, exist_ok=True)
         
@@ -293,19 +286,45 @@ class RigVedaScraper:
 
 def main():
     """Main function to run the scraper"""
-    scraper = RigVedaScraper()
+    parser = argparse.ArgumentParser(description="Scrape the Rig-Veda from sacred-texts.com")
+    parser.add_argument("--base-url", default="https://sacred-texts.com/hin/rigveda/index.htm")
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR, help="on-disk HTTP cache (resume point)")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight per host")
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second per host")
+    parser.add_argument("--revalidate", action="store_true", help="check cached pages with conditional requests")
+    parser.add_argument("--offline", action="store_true", help="use only cached pages")
+    parser.add_argument("--fresh", action="store_true", help="discard the progress journal and start over")
+    parser.add_argument("--compact", action="store_true",
+                        help="only rebuild rigveda_data.json and the text files from the journal")
+    parser.add_argument("--reparse", action="store_true",
+                        help="re-extract every hymn from the cached pages (no network, journal untouched)")
+    parser.add_argument("--parse-jobs", type=int, default=None, help="parser processes (default: one per core)")
+    args = parser.parse_args()
+
+    if args.fresh and JOURNAL_PATH.exists():
+        JOURNAL_PATH.unlink()
+
+    engine = FetchEngine(args.cache_dir, concurrencyPerHost=args.concurrency, requestsPerSecond=args.rate,
+                         burst=args.concurrency, revalidate=args.revalidate, offline=args.offline or args.reparse)
+    scraper = RigVedaScraper(args.base_url, engine, None if args.reparse else JOURNAL_PATH, args.parse_jobs)
+    
+    if args.compact:
+        print(f"Recovered {scraper.LoadJournal()} hymns from {JOURNAL_PATH}")
+        scraper.Compact()
+        return
     
     try:
         
         # Start scraping
-        result = scraper.ScrapeAllBooks()
-        print(result)
+        result = asyncio.run(scraper.ScrapeAllBooks())
+        scraper.Compact()
         
         # Print summary
         print("\nScraping Summary:")
         print(f"Total books scraped: {len(result['books'])}")
         print(f"Total hymns scraped: {result['total_hymns']}")
         print(f"Total requests made: {result['scraping_metadata']['total_requests']}")
+        print(f"Pages served from cache: {engine.stats['cache_hits'] + engine.stats['not_modified']}")
         print(f"Errors encountered: {len(result['scraping_metadata']['errors'])}")
         
         if result['scraping_metadata']['errors']:
@@ -314,11 +333,12 @@ def main():
                 print(f"  - {error}")
                 
     except KeyboardInterrupt:
+        # Every finished hymn is in the journal; rerunning picks up from there
         logger.info("Scraping interrupted by user")
-        scraper.SaveProgress()
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        scraper.SaveProgress()
+    finally:
+        engine.Close()
 
 if __name__ == "__main__":
     main()
@@ -1,38 +1,45 @@
-import json
+import argparse
 import sqlite3
 import numpy as np
 from pathlib import Path
-from typing import List, Dict, Tuple
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Dict, Optional, Set, Tuple
+from bulk_load import ReplaceTable
+from embedding_store import EmbeddingStore
+from migrations import NEIGHBORS_TOP_K, SIMILARITY_INDEXES, SIMILARITY_TABLE_SQL, Migrate
+from neighbor_table import FindAffectedHymns, HasNeighbors, RankPairNeighbors, SaveNeighbors, TopKNeighborBlocks
+from summary_journal import LoadSummaries
 
 # Paths
 DATA_DIR = Path(__file__).parent
 DB_PATH = DATA_DIR.parent / "hymn_vectors.db"
 SUMMARIES_PATH = DATA_DIR / "JSONMaps" / "rigveda_summaries.json"
+MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+_MODELS = {}
 
 def LoadHymnSummaries() -> Dict[str, str]:
-    """Load hymn summaries from JSON file"""
+    """Load hymn summaries (compacted JSON map plus any uncompacted journal records)"""
     print("Loading hymn summaries...")
-    with open(SUMMARIES_PATH, 'r', encoding='utf-8') as f:
-        summaries = json.load(f)
+    summaries = LoadSummaries(SUMMARIES_PATH)
     print(f"✓ Loaded {len(summaries)} hymn summaries")
     return summaries
 
-def GenerateEmbeddings(summaries: Dict[str, str], modelName: str = 'all‑mpnet‑base‑v2') -> Tuple[List[str], np.ndarray]:
-    """Generate embeddings for all hymn summaries using SentenceTransformers"""
-    print(f"\nLoading SentenceTransformer model: {modelName}...")
-    model = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
-
-    # Sort by hymn ID to ensure consistent ordering
-    hymnIds = sorted(summaries.keys())
-    summaryTexts = [summaries[hymnId] for hymnId in hymnIds]
+def EncodeTexts(texts: List[str], modelName: str = MODEL_NAME) -> np.ndarray:
+    """Encode texts with SentenceTransformers, loading the model on first use"""
+    if modelName not in _MODELS:
+        from sentence_transformers import SentenceTransformer
+        print(f"\nLoading SentenceTransformer model: {modelName}...")
+        _MODELS[modelName] = SentenceTransformer(modelName)
 
-    print(f"Generating embeddings for {len(summaryTexts)} hymns...")
-    embeddings = model.encode(summaryTexts, show_progress_bar=True, batch_size=32)
+    print(f"Generating embeddings for {len(texts)} hymns...")
+    return _MODELS[modelName].encode(texts, show_progress_bar=True, batch_size=32)
 
-    print(f"✓ Generated embeddings with shape: {embeddings.shape}")
-    return hymnIds, embeddings
+def GenerateEmbeddings(summaries: Dict[str, str], modelName: str = MODEL_NAME) -> Tuple[List[str], np.ndarray, List[str], List[str]]:
+    """Bring the embedding store up to date, encoding only new or changed summaries"""
+    store = EmbeddingStore()
+    changed, removed = store.Update(summaries, lambda texts: EncodeTexts(texts, modelName), modelName)
+    print(f"✓ Re-encoded {len(changed)} summaries ({len(removed)} removed); store holds {len(store.ids)} embeddings")
+    return store.ids, store.Normalized(), changed, removed
 
 def ComputeAllPairwiseSimilarities(hymnIds: List[str], embeddings: np.ndarray) -> List[Dict]:
     """Compute cosine similarity for all hymn pairs"""
@@ -41,8 +48,8 @@ def ComputeAllPairwiseSimilarities(hymnIds: List[str], embeddings: np.ndarray) -
 
     print(f"\nComputing pairwise cosine similarities for {totalPairs:,} pairs...")
 
-    # Compute full similarity matrix at once (much faster than loop)
-    similarityMatrix = cosine_similarity(embeddings)
+    # Embeddings are unit length, so the Gram matrix holds the cosine similarities
+    similarityMatrix = embeddings @ embeddings.T
 
     # Extract upper triangle (avoid duplicates and self-similarity)
     similarities = []
@@ -64,49 +71,99 @@ def ComputeAllPairwiseSimilarities(hymnIds: List[str], embeddings: np.ndarray) -
     return similarities
 
 def SaveSimilaritiesToDatabase(similarities: List[Dict], tableName: str = "hymn_similarities_semantic"):
-    """Save all pairwise similarities to database"""
+    """Load all pairwise similarities into a fresh table and swap it in atomically"""
     print(f"\nSaving similarities to database table '{tableName}'...")
+    print(f"  Loading {len(similarities):,} rows into a staging table...")
+
+    saved = ReplaceTable(
+        tableName,
+        SIMILARITY_TABLE_SQL,
+        ("hymn1_id", "hymn2_id", "similarity"),
+        ((s['hymn1_id'], s['hymn2_id'], s['similarity']) for s in similarities),
+        indexSql=SIMILARITY_INDEXES,
+        dbPath=DB_PATH,
+    )
+
+    print(f"✓ Saved {saved:,} similarities to database")
+    print(f"✓ Created indexes for fast retrieval")
 
+def TableHasRows(tableName: str = "hymn_similarities_semantic") -> bool:
+    """Check whether a previous run already populated the similarity table"""
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Create table
-    cursor.execute(f'''
-        CREATE TABLE IF NOT EXISTS {tableName} (
-            hymn1_id TEXT NOT NULL,
-            hymn2_id TEXT NOT NULL,
-            similarity REAL NOT NULL,
-            PRIMARY KEY (hymn1_id, hymn2_id)
-        )
-    ''')
-
-    # Drop existing data
-    cursor.execute(f'DELETE FROM {tableName}')
-    print(f"  Cleared existing data from '{tableName}'")
-
-    # Batch insert for performance
-    print(f"  Inserting {len(similarities):,} rows...")
-
-    batchSize = 10000
-    for i in range(0, len(similarities), batchSize):
-        batch = similarities[i:i + batchSize]
-        cursor.executemany(
-            f'INSERT INTO {tableName} (hymn1_id, hymn2_id, similarity) VALUES (?, ?, ?)',
-            [(s['hymn1_id'], s['hymn2_id'], s['similarity']) for s in batch]
-        )
-        conn.commit()
-        print(f"    Inserted {min(i + batchSize, len(similarities)):,}/{len(similarities):,} rows...")
+    try:
+        return conn.execute(f'SELECT 1 FROM {tableName} LIMIT 1').fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
 
-    # Create indexes for fast retrieval
-    print("  Creating indexes...")
-    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{tableName}_hymn1 ON {tableName}(hymn1_id, similarity DESC)')
-    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{tableName}_hymn2 ON {tableName}(hymn2_id, similarity DESC)')
+def UpdateSimilarityRows(hymnIds: List[str], embeddings: np.ndarray, changedIds: List[str], removedIds: List[str],
+                         tableName: str = "hymn_similarities_semantic") -> Tuple[int, Set[str]]:
+    """Recompute only the pairs that involve changed hymns and replace them in one transaction.
+
+    Returns (pairs written, hymns whose neighbor lists must be re-ranked).
+    """
+    position = {hymnId: i for i, hymnId in enumerate(hymnIds)}
+    changedRows = np.array([position[hymnId] for hymnId in changedIds], dtype=np.int64)
+    isChanged = np.zeros(len(hymnIds), dtype=bool)
+    isChanged[changedRows] = True
+
+    print(f"\nUpdating {len(changedIds)} changed and {len(removedIds)} removed hymns in '{tableName}'...")
+    similarityRows = embeddings[changedRows] @ embeddings.T if len(changedRows) else np.empty((0, len(hymnIds)))
+    # Read the neighbor lists before they are re-ranked; removed hymns only lose their rows
+    affected = FindAffectedHymns(hymnIds, changedIds, removedIds, similarityRows, "semantic", NEIGHBORS_TOP_K,
+                                 dbPath=DB_PATH) | set(removedIds)
+
+    rows = []
+    for k, i in enumerate(changedRows):
+        for j in range(len(hymnIds)):
+            # Pairs between two changed hymns are emitted once, from the lower row
+            if j == i or (isChanged[j] and j < i):
+                continue
+            a, b = (i, j) if i < j else (j, i)
+            rows.append((hymnIds[a], hymnIds[b], float(similarityRows[k, j])))
 
-    conn.commit()
-    conn.close()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('CREATE TEMP TABLE affected_hymns (hymn_id TEXT PRIMARY KEY)')
+        cursor.executemany('INSERT INTO affected_hymns (hymn_id) VALUES (?)', [(h,) for h in changedIds + removedIds])
+        cursor.execute(f'''
+            DELETE FROM {tableName}
+            WHERE hymn1_id IN (SELECT hymn_id FROM affected_hymns)
+               OR hymn2_id IN (SELECT hymn_id FROM affected_hymns)
+        ''')
+        cursor.executemany(f'INSERT INTO {tableName} (hymn1_id, hymn2_id, similarity) VALUES (?, ?, ?)', rows)
+        conn.commit()
+    finally:
+        conn.close()
 
-    print(f"✓ Saved {len(similarities):,} similarities to database")
-    print(f"✓ Created indexes for fast retrieval")
+    print(f"✓ Replaced {len(rows):,} pairs")
+    return len(rows), affected
+
+def SaveTopKNeighbors(hymnIds: List[str], embeddings: np.ndarray, topK: int, minSimilarity: Optional[float] = None,
+                      changedIds: Optional[List[str]] = None, removedIds: Optional[List[str]] = None) -> int:
+    """Store only the top k semantic neighbors per hymn, optionally above a threshold.
+
+    When changedIds is given, only the hymns whose lists can change are
+    recomputed; otherwise every hymn is.
+    """
+    similarityRows = lambda rows: embeddings[rows] @ embeddings.T
+    if changedIds is None:
+        rows = np.arange(len(hymnIds))
+        replaceIds = None
+        print(f"\nComputing top {topK} semantic neighbors for {len(hymnIds):,} hymns...")
+    else:
+        position = {hymnId: i for i, hymnId in enumerate(hymnIds)}
+        changedSimilarities = similarityRows(np.array([position[h] for h in changedIds], dtype=np.int64))
+        affected = FindAffectedHymns(hymnIds, changedIds, removedIds, changedSimilarities, "semantic", topK, minSimilarity)
+        rows = np.array(sorted(position[h] for h in affected), dtype=np.int64)
+        replaceIds = sorted(affected) + removedIds
+        print(f"\nRecomputing top {topK} semantic neighbors for {len(rows):,} affected hymns...")
+
+    written = SaveNeighbors(hymnIds, TopKNeighborBlocks(similarityRows, rows, topK, minSimilarity), "semantic", replaceIds)
+    print(f"✓ Saved {written:,} neighbor rows to 'hymn_neighbors' (metric='semantic')")
+    return written
 
 def GetStatistics(similarities: List[Dict]) -> None:
     """Print statistics about the similarity scores"""
@@ -201,16 +258,39 @@ def ValidateDatabase(tableName: str = "hymn_similarities_semantic") -> None:
 
 def main():
     """Main execution pipeline"""
+    parser = argparse.ArgumentParser(description="Compute semantic similarity between hymn summaries")
+    parser.add_argument("--full", action="store_true", help="recompute every pair, not just those of changed summaries")
+    parser.add_argument("--top-k", type=int, default=0, help="store only the top K neighbors per hymn in hymn_neighbors")
+    parser.add_argument("--min-similarity", type=float, default=None, help="with --top-k, drop neighbors below this similarity")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("SEMANTIC SIMILARITY COMPUTATION")
-    print("Using SentenceTransformers: all-MiniLM-L6-v2")
+    print(f"Using SentenceTransformers: {MODEL_NAME}")
     print("=" * 60)
 
+    Migrate(DB_PATH)
+
     # Step 1: Load summaries
     summaries = LoadHymnSummaries()
 
-    # Step 2: Generate embeddings
-    hymnIds, embeddings = GenerateEmbeddings(summaries)
+    # Step 2: Bring embeddings up to date (only changed summaries are encoded)
+    hymnIds, embeddings, changedIds, removedIds = GenerateEmbeddings(summaries)
+
+    # Sparse output: top-k neighbors per hymn instead of every pair
+    if args.top_k:
+        if args.full or not HasNeighbors("semantic"):
+            SaveTopKNeighbors(hymnIds, embeddings, args.top_k, args.min_similarity)
+        else:
+            SaveTopKNeighbors(hymnIds, embeddings, args.top_k, args.min_similarity, changedIds, removedIds)
+        return
+
+    # Incremental run: only rows of changed hymns need recomputing
+    if not args.full and len(changedIds) < len(hymnIds) and TableHasRows():
+        _, affected = UpdateSimilarityRows(hymnIds, embeddings, changedIds, removedIds)
+        RankPairNeighbors("semantic", "hymn_similarities_semantic", hymnIds=affected)
+        print("\n✓ SEMANTIC SIMILARITY UPDATE COMPLETE")
+        return
 
     # Step 3: Compute all pairwise similarities
     similarities = ComputeAllPairwiseSimilarities(hymnIds, embeddings)
@@ -218,8 +298,9 @@ def main():
     # Step 4: Display statistics
     GetStatistics(similarities)
 
-    # Step 5: Save to database
+    # Step 5: Save to database, plus the pre-ranked neighbor lists read by queries
     SaveSimilaritiesToDatabase(similarities)
+    RankPairNeighbors("semantic", "hymn_similarities_semantic")
 
     # Step 6: Validate database
     ValidateDatabase()
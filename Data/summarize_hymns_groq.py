@@ -1,234 +1,256 @@
+import argparse
+import asyncio
 import json
 import os
-import random
 import sys
 import time
-from collections import deque
-from typing import Any, Deque, Dict, List, Tuple
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chat_client import ChatClient, Log, TokenBucketLimiter
+from corpus import Corpus, LoadCorpus
+from summary_cache import SummaryCache, SummaryKey
+from summary_journal import SUMMARIES_PATH, SUMMARY_JOURNAL_PATH, LoadSummaries, SummaryJournal
 
 MAX_REQUESTS_PER_MINUTE = 30
 MAX_TOKENS_PER_MINUTE = 8000
 GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-PER_CALL_DELAY_SECONDS = 10
-inputPath = "/Users/nikunjgoyal/Codes/rigveda/Data/JSONMaps/rigveda_data.json"
-outputPath = "/Users/nikunjgoyal/Codes/rigveda/Data/JSONMaps/rigveda_summaries.json"
+MODEL = "openai/gpt-oss-120b"
+MAX_COMPLETION_TOKENS = 64
+COMPLETION_PARAMS = {"temperature": 0.2, "reasoning_effort": "low"}
+inputPath = Path(__file__).parent / "JSONMaps" / "rigveda_data.json"
+outputPath = SUMMARIES_PATH
+journalPath = SUMMARY_JOURNAL_PATH
+
+SYSTEM_PROMPT = (
+    "You are a concise literary summarizer. "
+    "Summarize the given Rigveda hymn in exactly one sentence, tone should be interesting and engaging, not boring and dry."
+    "plain modern English, no proper nouns beyond those present, no markdown."
+)
+USER_PREFIX = "Summarize in one sentence:\n\n"
+BATCH_SYSTEM_PROMPT = (
+    "You are a concise literary summarizer. "
+    "Summarize each of the given Rigveda hymns in exactly one sentence, tone should be interesting and engaging, not boring and dry."
+    "plain modern English, no proper nouns beyond those present, no markdown. "
+    "Reply with only a JSON object mapping each hymn id to its summary."
+)
+BATCH_USER_PREFIX = "Summarize each hymn in one sentence. Each hymn starts with a line '### <hymn id>'.\n\n"
+BATCH_PARAMS = {**COMPLETION_PARAMS, "response_format": {"type": "json_object"}}
 
-def LoadJson(path: str) -> Dict[str, Any]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
 
-
-def SaveJson(path: str, data: Dict[str, Any]) -> None:
-    tmpPath = f"{path}.tmp"
-    with open(tmpPath, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmpPath, path)
+def BuildMessages(hymnText: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_PREFIX + hymnText.strip()},
+    ]
 
 
-def BuildMessages(hymnText: str) -> List[Dict[str, str]]:
-    system = (
-        "You are a concise literary summarizer. "
-        "Summarize the given Rigveda hymn in exactly one sentence, tone should be interesting and engaging, not boring and dry."
-        "plain modern English, no proper nouns beyond those present, no markdown."
-    )
-    user = (
-        "Summarize in one sentence:\n\n" + hymnText.strip()
-    )
+def BuildBatchMessages(hymns: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    sections = "\n\n".join(f"### {hymnId}\n{text.strip()}" for hymnId, text in hymns)
     return [
-        {"role": "system", "content": system},
-        {"role": "user", "content": user},
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": BATCH_USER_PREFIX + sections},
     ]
 
 
-def Log(message: str) -> None:
-    print(message, file=sys.stderr, flush=True)
-
-
-def PostChatCompletion(apiKey: str, messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, Any]]:
-    body = {
-        "model": "openai/gpt-oss-120b",
-        "messages": messages,
-        "temperature": 0.2,
-        "max_completion_tokens": 64,
-        "reasoning_effort": "low",
-    }
-    payload = json.dumps(body).encode("utf-8")
-    req = Request(
-        GROQ_API_URL,
-        data=payload,
-        headers={
-            "Authorization": f"Bearer {apiKey}",
-            "Content-Type": "application/json",
-        },
-        method="POST",
-    )
-    with urlopen(req, timeout=90) as resp:
-        respBody = resp.read().decode("utf-8")
-        data = json.loads(respBody)
-        content = data["choices"][0]["message"]["content"].strip()
-        return content, data
-
-
-def SendWithRetries(fn, maxAttempts: int = 8, baseDelaySeconds: float = 1.5) -> Any:
-    attempt = 0
-    while True:
+def CacheKeys(hymnText: str, model: str, batched: bool) -> List[str]:
+    """Cache keys for a hymn, the one for the prompt in use first.
+
+    Single and batched prompts ask for the same summary, so either one's
+    cached answer is accepted; any change to the prompt text, model or
+    parameters still misses both.
+    """
+    single = SummaryKey(hymnText, SYSTEM_PROMPT + USER_PREFIX, model,
+                        {**COMPLETION_PARAMS, "max_completion_tokens": MAX_COMPLETION_TOKENS})
+    batch = SummaryKey(hymnText, BATCH_SYSTEM_PROMPT + BATCH_USER_PREFIX, model,
+                       {**BATCH_PARAMS, "max_completion_tokens": MAX_COMPLETION_TOKENS})
+    return [batch, single] if batched else [single, batch]
+
+
+def PackBatches(pending: List[Tuple[str, str]], maxHymns: int, maxTokens: int) -> List[List[Tuple[str, str]]]:
+    """Group consecutive hymns into requests of at most maxHymns hymns and about maxTokens prompt tokens"""
+    batches: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    size = 0
+    for hymnId, text in pending:
+        tokens = len(text) // 3
+        if current and (len(current) >= maxHymns or size + tokens > maxTokens):
+            batches.append(current)
+            current, size = [], 0
+        current.append((hymnId, text))
+        size += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def ParseBatchReply(content: str, hymnIds: List[str]) -> Dict[str, str]:
+    """Per-hymn summaries from a batched reply; ids that are missing or malformed are left out"""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.strip("`").removeprefix("json").strip()
+    try:
+        reply = json.loads(content)
+    except ValueError:
+        return {}
+    if not isinstance(reply, dict):
+        return {}
+    return {hymnId: reply[hymnId].strip() for hymnId in hymnIds
+            if isinstance(reply.get(hymnId), str) and reply[hymnId].strip()}
+
+
+async def SummarizeHymn(client: ChatClient, hymnText: str) -> Tuple[str, Dict[str, Any]]:
+    return await client.Complete(BuildMessages(hymnText), MAX_COMPLETION_TOKENS, **COMPLETION_PARAMS)
+
+
+async def SummarizeBatch(client: ChatClient, hymns: List[Tuple[str, str]]) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    content, raw = await client.Complete(BuildBatchMessages(hymns), MAX_COMPLETION_TOKENS * len(hymns) + 32,
+                                         **BATCH_PARAMS)
+    return ParseBatchReply(content, [hymnId for hymnId, _ in hymns]), raw
+
+
+def IterateHymns(corpus: Corpus):
+    # Book order, then hymn order within a book
+    order = np.lexsort((corpus.hymns["hymn_number"], corpus.hymns["book_number"]))
+    hymnIds = corpus.hymnIds
+    for i in order.tolist():
+        yield hymnIds[i], corpus.Text(i)
+
+async def SummarizeAll(client: ChatClient, batches: List[List[Tuple[str, str]]], summaries: Dict[str, str],
+                       concurrency: int, cache: Optional[SummaryCache] = None,
+                       journal: Optional[SummaryJournal] = None) -> Dict[str, int]:
+    """Summarize every batch of (hymnId, text) with up to `concurrency` requests in flight.
+
+    Batches of one use the single-hymn prompt. Hymns a batched reply leaves
+    out are retried on their own.
+    """
+    work = iter(batches)
+    total = sum(len(batch) for batch in batches)
+    counts = {"processed": 0, "failed": 0, "requests": 0}
+
+    def Record(hymnId: str, text: str, summary: str, batched: bool) -> None:
+        if journal is not None:
+            journal.Record(hymnId, summary)
+        else:
+            summaries[hymnId] = summary
+        if cache is not None:
+            cache.Put(CacheKeys(text, client.model, batched)[0], summary, hymnId)
+        counts["processed"] += 1
+
+    async def Single(hymnId: str, text: str) -> None:
         try:
-            return fn()
-        except HTTPError as e:
-            print(e.headers)
-            attempt += 1
-            if attempt >= maxAttempts:
-                Log(f"request: failed after {attempt} attempts, status={getattr(e, 'code', None)}")
-                raise
-            status = getattr(e, "code", None)
-            retryAfter = e.headers.get("Retry-After") if hasattr(e, "headers") and e.headers else None
-            if status in (429, 500, 502, 503, 504):
-                if retryAfter:
-                    try:
-                        delay = float(retryAfter)
-                    except ValueError:
-                        delay = baseDelaySeconds * attempt
-                else:
-                    delay = baseDelaySeconds * attempt
-                delay += random.uniform(0, 0.5)
-                Log(f"request: transient error status={status}, attempt={attempt}, sleeping={delay:.2f}s")
-                time.sleep(delay)
+            summary, raw = await SummarizeHymn(client, text)
+        except Exception as e:
+            counts["failed"] += 1
+            Log(f"failed: hymnId={hymnId} error={e!r}")
+            return
+        counts["requests"] += 1
+        Record(hymnId, text, summary, batched=False)
+        usedTokens = (raw.get("usage") or {}).get("total_tokens", 0)
+        Log(f"done: hymnId={hymnId} usedTokens={usedTokens} summaryChars={len(summary)} "
+            f"processed={counts['processed']}/{total}")
+
+    async def Worker() -> None:
+        # Workers share one iterator, so each batch is taken exactly once
+        for batch in work:
+            if len(batch) == 1:
+                Log(f"send: hymnId={batch[0][0]}")
+                await Single(*batch[0])
                 continue
-            Log(f"request: non-retryable HTTP error status={status}, attempt={attempt}")
-            raise
-        except URLError:
-            Log(f"request: URLError, attempt={attempt}")
-            raise
-
-
-def SummarizeHymn(apiKey: str, hymnText: str) -> Tuple[str, Dict[str, Any]]:
-    messages = BuildMessages(hymnText)
-    content, data = SendWithRetries(lambda: PostChatCompletion(apiKey, messages))
-    return content, data
-
-
-def IterateHymns(data: Dict[str, Any]):
-    books = data.get("books", {})
-    for bookKey in sorted(books.keys(), key=lambda x: int(x)):
-        hymns = books[bookKey].get("hymns", {})
-        for hymnId in sorted(hymns.keys(), key=lambda x: int(x)):
-            hymn = hymns[hymnId]
-            text = hymn.get("text", "") or ""
-            yield hymnId, text
-
-class RateLimiter:
-    def __init__(self, maxRequestsPerMinute: int = 30, maxTokensPerMinute: int = 8000) -> None:
-        self.maxRequestsPerMinute = maxRequestsPerMinute
-        self.maxTokensPerMinute = maxTokensPerMinute
-        self.requestTimes: Deque[float] = deque()
-        self.tokenEvents: Deque[Tuple[float, int]] = deque()
-
-    def _prune(self, now: float) -> None:
-        cutoff = now - 60.0
-        while self.requestTimes and self.requestTimes[0] < cutoff:
-            self.requestTimes.popleft()
-        while self.tokenEvents and self.tokenEvents[0][0] < cutoff:
-            self.tokenEvents.popleft()
-
-    def _currentTokenSum(self) -> int:
-        return sum(t for _, t in self.tokenEvents)
-
-    def WaitForCapacity(self, neededTokens: int) -> None:
-        while True:
-            now = time.time()
-            self._prune(now)
-            reqs = len(self.requestTimes)
-            tokens = self._currentTokenSum()
-            if reqs < self.maxRequestsPerMinute and (tokens + neededTokens) <= self.maxTokensPerMinute:
-                return
-
-            sleepUntil = None
-
-            if reqs >= self.maxRequestsPerMinute and self.requestTimes:
-                t = self.requestTimes[0] + 60.0
-                sleepUntil = t if sleepUntil is None else min(sleepUntil, t)
-
-            if (tokens + neededTokens) > self.maxTokensPerMinute and self.tokenEvents:
-                running = tokens
-                target = self.maxTokensPerMinute - neededTokens
-                expireTime = None
-                for ts, tok in self.tokenEvents:
-                    running -= tok
-                    expireTime = ts + 60.0
-                    if running <= target:
-                        break
-                if expireTime is not None:
-                    sleepUntil = expireTime if sleepUntil is None else min(sleepUntil, expireTime)
-
-            if sleepUntil is None:
-                sleepUntil = now + 1.0
-            delay = max(0.0, sleepUntil - now) + random.uniform(0, 0.1)
-            Log(
-                f"rate-limit: waiting {delay:.2f}s (reqs={reqs}/30, tokens={tokens}/8000, need={neededTokens})"
-            )
-            time.sleep(delay)
-
-    def Record(self, usedTokens: int) -> None:
-        now = time.time()
-        self.requestTimes.append(now)
-        self.tokenEvents.append((now, max(0, usedTokens)))
+
+            hymnIds = [hymnId for hymnId, _ in batch]
+            Log(f"send: batch of {len(batch)} hymnIds={','.join(hymnIds)}")
+            try:
+                results, raw = await SummarizeBatch(client, batch)
+            except Exception as e:
+                counts["failed"] += len(batch)
+                Log(f"failed: batch hymnIds={','.join(hymnIds)} error={e!r}")
+                continue
+            counts["requests"] += 1
+            for hymnId, text in batch:
+                if hymnId in results:
+                    Record(hymnId, text, results[hymnId], batched=True)
+            usedTokens = (raw.get("usage") or {}).get("total_tokens", 0)
+            Log(f"done: batch of {len(batch)} usedTokens={usedTokens} split={len(results)}/{len(batch)} "
+                f"processed={counts['processed']}/{total}")
+            for hymnId, text in batch:
+                if hymnId not in results:
+                    Log(f"retry alone: hymnId={hymnId}")
+                    await Single(hymnId, text)
+
+    await asyncio.gather(*(Worker() for _ in range(concurrency)))
+    return counts
 
 
 def Main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize every hymn in one sentence")
+    parser.add_argument("--api-url", default=GROQ_API_URL)
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight")
+    parser.add_argument("--rpm", type=int, default=MAX_REQUESTS_PER_MINUTE, help="provider requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, default=MAX_TOKENS_PER_MINUTE, help="provider tokens-per-minute limit")
+    parser.add_argument("--limit", type=int, default=None, help="summarize at most this many hymns")
+    parser.add_argument("--batch-size", type=int, default=1, help="hymns packed into one request (1 = no batching)")
+    parser.add_argument("--batch-tokens", type=int, default=1500, help="approximate prompt tokens per batched request")
+    parser.add_argument("--compact-every", type=int, default=200, help="fold the journal into the JSON map every N summaries")
+    args = parser.parse_args()
+
     apiKey = os.environ.get("GROQ_API_KEY")
     if not apiKey:
         print("GROQ_API_KEY is required in environment", file=sys.stderr)
         sys.exit(1)
 
-    perCallDelaySeconds = PER_CALL_DELAY_SECONDS
-
-    data = LoadJson(inputPath)
-    summaries: Dict[str, str] = {}
-    if os.path.exists(outputPath):
-        existing = LoadJson(outputPath)
-        for k, v in existing.items():
-            summaries[k] = v
-    else:
+    corpus = LoadCorpus(inputPath)
+    if not os.path.exists(outputPath):
         print(f"output file {outputPath} does not exist")
         sys.exit(1)
-
-    total = 1028
-    processed = 0
-    skipped = 0
-    limiter = RateLimiter(maxRequestsPerMinute=30, maxTokensPerMinute=8000)
-
-    for hymnId, text in IterateHymns(data):
-        if hymnId in summaries and summaries[hymnId]:
-            skipped += 1
-            processed += 1
-            Log(f"skip: already summarized hymnId={hymnId}")
-            continue
-
-        Log(f"prepare: hymnId={hymnId} processed={processed}/{total}")
-        Log(f"send: hymnId={hymnId}")
-        summary, raw = SummarizeHymn(apiKey, text)
-        summaries[hymnId] = summary
-        usedTokens = 0
+    # Picks up anything a crashed run journaled but never compacted
+    summaries = LoadSummaries(outputPath, journalPath)
+
+    total = len(corpus)
+    batched = args.batch_size > 1
+    cache = SummaryCache()
+    cachedIds = set(cache.hymnIds)
+    pending = []
+    for hymnId, text in IterateHymns(corpus):
+        keys = CacheKeys(text, MODEL, batched)
+        cached = next((cache.Get(key) for key in keys if cache.Get(key)), None)
+        if cached is None and summaries.get(hymnId) and hymnId not in cachedIds:
+            # Summaries written before the cache existed came from the single-hymn prompt
+            cached = summaries[hymnId]
+            cache.Put(keys[1] if batched else keys[0], cached, hymnId)
+        if cached is None:
+            pending.append((hymnId, text))
+        else:
+            summaries[hymnId] = cached
+    skipped = total - len(pending)
+    Log(f"skip: {skipped} hymns found in the summary cache")
+    if args.limit is not None:
+        pending = pending[:args.limit]
+    batches = PackBatches(pending, args.batch_size, args.batch_tokens)
+    journal = SummaryJournal(summaries, outputPath, journalPath, args.compact_every)
+    # Cache hits and adopted summaries may have changed the map
+    journal.Compact()
+
+    async def Run() -> Dict[str, int]:
+        limiter = TokenBucketLimiter(args.rpm, args.tpm)
+        client = ChatClient(apiKey, args.api_url, limiter, concurrency=args.concurrency, model=MODEL)
         try:
-            usage = raw.get("usage")
-            if isinstance(usage, dict):
-                totalTokens = usage.get("total_tokens")
-                if isinstance(totalTokens, int) and totalTokens > 0:
-                    usedTokens = totalTokens
-        except Exception:
-            pass
-        limiter.Record(usedTokens)
-        processed += 1
-        Log(f"done: hymnId={hymnId} usedTokens={usedTokens} summaryChars={len(summary)}")
-        Log(f"post-request: sleeping {perCallDelaySeconds}s")
-        time.sleep(perCallDelaySeconds)
-        SaveJson(outputPath, summaries)    
-    print(json.dumps({"total": total, "processed": processed, "skipped": skipped}, ensure_ascii=False))
+            return await SummarizeAll(client, batches, summaries, args.concurrency, cache, journal)
+        finally:
+            client.Close()
+            cache.Close()
+            journal.Close()
+
+    start = time.monotonic()
+    counts = asyncio.run(Run())
+    elapsed = time.monotonic() - start
+    Log(f"finished: {counts['processed']} summaries in {counts['requests']} requests, {elapsed:.1f}s "
+        f"({counts['processed'] * 60.0 / max(elapsed, 1e-9):.1f}/min)")
+    print(json.dumps({"total": total, "processed": counts["processed"] + skipped, "skipped": skipped,
+                      "failed": counts["failed"]}, ensure_ascii=False))
 
 
 if __name__ == "__main__":
     Main()
-
-
@@ -0,0 +1,54 @@
+"""
+Content-addressed cache of hymn summaries.
+
+A summary is keyed by a hash of everything that determines it: the hymn
+text, the prompt template, the model and the request parameters. Changing
+any of them misses the cache, so a rerun only pays for hymns whose text
+changed or for the prompt being experimented with, and switching back to an
+earlier prompt is free. Entries are appended to a JSON-lines journal.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from journal import Journal, ReplayJournal
+
+CACHE_PATH = Path(__file__).parent / "JSONMaps" / "summary_cache.jsonl"
+
+def SummaryKey(text: str, prompt: str, model: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps([text.strip(), prompt, model, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SummaryCache:
+    def __init__(self, path: Path = CACHE_PATH):
+        self.path = Path(path)
+        self.entries: Dict[str, str] = {}
+        self.hymnIds: Set[str] = set()
+        for record in ReplayJournal(self.path):
+            self.entries[record["key"]] = record["summary"]
+            if record.get("hymn_id"):
+                self.hymnIds.add(record["hymn_id"])
+        self._journal: Optional[Journal] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def Get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def Put(self, key: str, summary: str, hymnId: Optional[str] = None) -> None:
+        if self.entries.get(key) == summary:
+            return
+        self.entries[key] = summary
+        if hymnId:
+            self.hymnIds.add(hymnId)
+        if self._journal is None:
+            self._journal = Journal(self.path, syncEvery=16)
+        self._journal.Append({"key": key, "hymn_id": hymnId, "summary": summary})
+
+    def Close(self) -> None:
+        if self._journal is not None:
+            self._journal.Close()
+            self._journal = None
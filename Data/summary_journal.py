@@ -0,0 +1,72 @@
+"""
+Hymn summaries as a compacted JSON map plus an append-only journal.
+
+New summaries are appended to rigveda_summaries.jsonl as they arrive
+instead of rewriting rigveda_summaries.json each time. Every
+`compactEvery` records (and on close) the journal is folded into the JSON
+map, written atomically, and then emptied. Readers load the map and replay
+whatever the journal still holds, so a crash between the two steps loses
+nothing.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+try:
+    from journal import Journal, ReplayJournal
+except ImportError:
+    # Imported as Data.summary_journal by the API
+    from Data.journal import Journal, ReplayJournal
+
+SUMMARIES_PATH = Path(__file__).parent / "JSONMaps" / "rigveda_summaries.json"
+SUMMARY_JOURNAL_PATH = SUMMARIES_PATH.with_suffix(".jsonl")
+
+def LoadSummaries(path: Path = SUMMARIES_PATH, journalPath: Path = SUMMARY_JOURNAL_PATH) -> Dict[str, str]:
+    """hymn id -> summary from the compacted map, with any uncompacted journal records applied"""
+    summaries: Dict[str, str] = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            summaries = json.load(f)
+    for record in ReplayJournal(journalPath):
+        summaries[record["hymn_id"]] = record["summary"]
+    return summaries
+
+def WriteSummaries(path: Path, summaries: Dict[str, str]) -> None:
+    tmpPath = f"{path}.tmp"
+    with open(tmpPath, "w", encoding="utf-8") as f:
+        json.dump(summaries, f, ensure_ascii=False, indent=2)
+    os.replace(tmpPath, path)
+
+class SummaryJournal:
+    """Record summaries into `summaries`, journaling each and compacting periodically"""
+
+    def __init__(self, summaries: Dict[str, str], path: Path = SUMMARIES_PATH,
+                 journalPath: Path = SUMMARY_JOURNAL_PATH, compactEvery: int = 200):
+        self.summaries = summaries
+        self.path = Path(path)
+        self.journalPath = Path(journalPath)
+        self.compactEvery = compactEvery
+        self._journal = Journal(self.journalPath, syncEvery=16)
+        self._sinceCompaction = sum(1 for _ in ReplayJournal(self.journalPath))
+
+    def Record(self, hymnId: str, summary: str) -> None:
+        self.summaries[hymnId] = summary
+        self._journal.Append({"hymn_id": hymnId, "summary": summary})
+        self._sinceCompaction += 1
+        if self._sinceCompaction >= self.compactEvery:
+            self.Compact()
+
+    def Compact(self) -> None:
+        """Fold the journal into the JSON map and start a new, empty journal"""
+        if not self._sinceCompaction:
+            return
+        self._journal.Flush()
+        WriteSummaries(self.path, self.summaries)
+        self._journal.Reset()
+        self._sinceCompaction = 0
+
+    def Close(self) -> None:
+        self.Compact()
+        self._journal.Close()
@@ -1,9 +1,14 @@
-import json
 import sqlite3
 from collections import Counter
+from pathlib import Path
+
+from bulk_load import BulkUpdate
+from corpus import LoadCorpus
+from deity_matcher import DeityMatcher
 
 # Connect to database
-db_path = '/Users/nikunjgoyal/Codes/rigveda/hymn_vectors.db'
+DATA_DIR = Path(__file__).parent
+db_path = DATA_DIR.parent / 'hymn_vectors.db'
 conn = sqlite3.connect(db_path)
 cursor = conn.cursor()
 
@@ -15,44 +20,26 @@ print(f"Processing top 25 deities...")
 for deity_id, deity_name in top_25_deities:
     print(f"  {deity_id}: {deity_name}")
 
-# Read rigveda_data.json
-print("\nReading rigveda_data.json...")
-with open('/Users/nikunjgoyal/Codes/rigveda/Data/JSONMaps/rigveda_data.json', 'r') as f:
-    rigveda_data = json.load(f)
-
-# Count mentions for each deity across all books
-deity_counts = {}
-
-for deity_id, deity_name in top_25_deities:
-    count = 0
-
-    # Search through all 10 books
-    for book_num in range(1, 11):
-        book_key = str(book_num)
-        if book_key in rigveda_data['books']:
-            book = rigveda_data['books'][book_key]
-            if 'hymns' in book:
-                for hymn_id, hymn_data in book['hymns'].items():
-                    # Count mentions in hymn text (case insensitive)
-                    text = hymn_data.get('text', '').lower()
-                    title = hymn_data.get('title', '').lower()
+# Lowercase every hymn text and title once, straight from the memory-mapped corpus
+corpus = LoadCorpus()
+hymn_strings = [(hymn.text.lower(), hymn.title.lower()) for hymn in corpus if 1 <= hymn.book_number <= 10]
 
-                    # Count occurrences in text and title
-                    count += text.count(deity_name.lower())
-                    count += title.count(deity_name.lower())
+# Count mentions for every deity with one scan of each text and title
+matcher = DeityMatcher([deity_name.lower() for _, deity_name in top_25_deities])
+totals = [0] * len(top_25_deities)
+for text, title in hymn_strings:
+    for counts in (matcher.Counts(text), matcher.Counts(title)):
+        totals = [total + count for total, count in zip(totals, counts)]
 
+deity_counts = {}
+for (deity_id, deity_name), count in zip(top_25_deities, totals):
     deity_counts[deity_id] = count
     print(f"Deity '{deity_name}' (ID: {deity_id}) mentioned {count} times")
 
 # Update database
 print("\nUpdating database...")
-for deity_id, count in deity_counts.items():
-    cursor.execute(
-        "UPDATE deity_index SET deity_frequency = ? WHERE deity_id = ?",
-        (count, deity_id)
-    )
-
-conn.commit()
+BulkUpdate("deity_index", "deity_id", ("deity_frequency",),
+           [(count, deity_id) for deity_id, count in deity_counts.items()], dbPath=db_path)
 print("Database updated successfully!")
 
 # Show updated values
@@ -0,0 +1,172 @@
+import asyncio
+import math
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    concurrency: int  # requests of this class running at once
+    queueSize: int  # requests allowed to wait for a slot; beyond this they are shed
+    maxWaitSeconds: float  # a queued request still waiting after this is shed
+    retryAfterSeconds: int = 1
+
+def _FromEnv(name: str, concurrency: int, queueSize: int, maxWaitSeconds: float) -> RouteClass:
+    # RIGVEDA_ADMISSION_<NAME>="concurrency,queue size,max wait seconds"
+    value = os.environ.get(f"RIGVEDA_ADMISSION_{name.upper()}")
+    if value:
+        parts = value.split(",")
+        concurrency, queueSize = int(parts[0]), int(parts[1])
+        if len(parts) > 2:
+            maxWaitSeconds = float(parts[2])
+    return RouteClass(name, concurrency, queueSize, maxWaitSeconds)
+
+# Expensive routes get few slots so they can never take every threadpool
+# thread; cheap, cached routes get their own larger budget and so are not
+# stuck behind them. /health and /metrics are never limited.
+ROUTE_CLASSES = (
+    _FromEnv("cheap", concurrency=24, queueSize=128, maxWaitSeconds=2.0),
+    _FromEnv("expensive", concurrency=6, queueSize=24, maxWaitSeconds=5.0),
+    _FromEnv("default", concurrency=8, queueSize=32, maxWaitSeconds=5.0),
+)
+ROUTE_PATTERNS: Tuple[Tuple[str, Optional[str]], ...] = (
+    (r"^/(health|metrics)$", None),
+    (r"^/api/graph/light-by-deities$", "cheap"),
+    (r"^/api/deities/stats$", "cheap"),
+    (r"^/api/hymn/[^/]+/(summary|text)$", "cheap"),
+    (r"^/api/hymns/summaries$", "cheap"),
+    (r"^/api/node/[^/]+$", "expensive"),
+    (r"^/api/semantic-search$", "expensive"),
+    (r"^/api/(nodes|graph/initial|graph/by-deities)$", "expensive"),
+    (r"^/api/", "default"),
+)
+
+class RouteLimiter:
+    """Concurrency limit with a bounded FIFO wait queue for one route class.
+
+    Only touched from the event loop, so it needs no locks.
+    """
+
+    def __init__(self, routeClass: RouteClass):
+        self.routeClass = routeClass
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._counts = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_timeout": 0}
+        self._maxQueued = 0
+        self._waitSeconds = 0.0
+
+    async def Acquire(self) -> Optional[str]:
+        """Take a slot, waiting if needed; returns the reason if the request is shed"""
+        if self.active < self.routeClass.concurrency and not self._waiters:
+            self.active += 1
+            self._counts["admitted"] += 1
+            return None
+        if len(self._waiters) >= self.routeClass.queueSize:
+            self._counts["shed_queue_full"] += 1
+            return "queue full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._counts["queued"] += 1
+        self._maxQueued = max(self._maxQueued, len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.routeClass.maxWaitSeconds)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Handed a slot just as the wait ran out: keep it
+                pass
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+                self._counts["shed_timeout"] += 1
+                return "timed out in queue"
+        except BaseException:
+            # Client went away while queued; give back a slot we may have been handed
+            if waiter.done() and not waiter.cancelled():
+                self.Release()
+            elif waiter in self._waiters:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            self._waitSeconds += time.perf_counter() - started
+        self._counts["admitted"] += 1
+        return None
+
+    def Release(self) -> None:
+        # Hand the slot straight to the oldest waiter, so active stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def Metrics(self) -> Dict:
+        queued = self._counts["queued"]
+        return dict(
+            self._counts,
+            active=self.active,
+            queue_depth=len(self._waiters),
+            max_queue_depth=self._maxQueued,
+            concurrency=self.routeClass.concurrency,
+            queue_size=self.routeClass.queueSize,
+            mean_wait_ms=round(1000 * self._waitSeconds / queued, 2) if queued else 0.0,
+        )
+
+class AdmissionControl:
+    """ASGI middleware applying per-route-class concurrency limits and shedding with 503"""
+
+    def __init__(self, app, routeClasses: Tuple[RouteClass, ...] = ROUTE_CLASSES,
+                 routePatterns: Tuple[Tuple[str, Optional[str]], ...] = ROUTE_PATTERNS):
+        self.app = app
+        self.limiters = {routeClass.name: RouteLimiter(routeClass) for routeClass in routeClasses}
+        self.patterns: List[Tuple[re.Pattern, Optional[str]]] = [(re.compile(p), name) for p, name in routePatterns]
+        self._classOf: Dict[str, Optional[str]] = {}
+        _CONTROLLERS.append(self)
+
+    def ClassOf(self, path: str) -> Optional[str]:
+        name = self._classOf.get(path)
+        if name is None and path not in self._classOf:
+            name = next((name for pattern, name in self.patterns if pattern.match(path)), None)
+            if len(self._classOf) < 10000:
+                self._classOf[path] = name
+        return name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = self.ClassOf(scope["path"])
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        limiter = self.limiters[name]
+        reason = await limiter.Acquire()
+        if reason is not None:
+            retryAfter = limiter.routeClass.retryAfterSeconds
+            response = ORJSONResponse({"detail": f"Server busy ({reason}), retry later"}, status_code=503,
+                                      headers={"Retry-After": str(math.ceil(retryAfter))})
+            return await response(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.Release()
+
+    def Metrics(self) -> Dict[str, Dict]:
+        return {name: limiter.Metrics() for name, limiter in self.limiters.items()}
+
+_CONTROLLERS: List[AdmissionControl] = []
+
+def AdmissionMetrics() -> Dict[str, Dict]:
+    """Queue depth, admitted and shed counts of the running middleware, by route class"""
+    metrics: Dict[str, Dict] = {}
+    for controller in _CONTROLLERS:
+        metrics.update(controller.Metrics())
+    return metrics
@@ -0,0 +1,184 @@
+import inspect
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+class SingleFlightCache:
+    """Thread-safe LRU cache where concurrent misses on one key share a single computation.
+
+    The first caller to miss a key computes it; callers arriving while that
+    computation runs wait for its result (or exception) instead of repeating
+    it. Cached values are shared between callers and must not be modified.
+    With a version callable (e.g. DataVersion.Current) every entry is
+    dropped once the version changes. A caller only joins a computation
+    started under the version it saw, and results computed across a change
+    are not stored.
+    """
+
+    def __init__(self, name: str, maxSize: int = 1024, version: Optional[Callable[[], int]] = None):
+        self.name = name
+        self.maxSize = maxSize
+        self.version = version
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._inFlight: Dict[Hashable, Tuple[Optional[int], Future]] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "invalidations": 0}
+
+    def _Sync(self) -> Optional[int]:
+        # Called with the lock held
+        if self.version is None:
+            return None
+        current = self.version()
+        if current != self._version:
+            if self._version is not None:
+                self._counts["invalidations"] += 1
+            self._entries.clear()
+            self._version = current
+        return current
+
+    def _Finish(self, key: Hashable, future: Future) -> None:
+        # Called with the lock held; a newer-version leader may have replaced this entry
+        inFlight = self._inFlight.get(key)
+        if inFlight is not None and inFlight[1] is future:
+            del self._inFlight[key]
+
+    def GetOrCompute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            version = self._Sync()
+            if key in self._entries:
+                self._counts["hits"] += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            inFlight = self._inFlight.get(key)
+            # A computation started before the data changed may return stale
+            # data, so only callers that saw the same version join it
+            isLeader = inFlight is None or inFlight[0] != version
+            if isLeader:
+                future = Future()
+                self._inFlight[key] = (version, future)
+                self._counts["misses"] += 1
+            else:
+                future = inFlight[1]
+                self._counts["coalesced"] += 1
+
+        if not isLeader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._Finish(key, future)
+                self._counts["errors"] += 1
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._Finish(key, future)
+            if version == self._version:
+                self._entries[key] = value
+                while len(self._entries) > self.maxSize:
+                    self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def GetOrComputeMany(self, keys: Iterable[Hashable],
+                         compute: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """GetOrCompute for several keys; the misses this caller leads are computed in one call.
+
+        compute receives those keys and must return a value for each of them.
+        The result maps every key, in the order given.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, Future] = {}
+        leading: Dict[Hashable, Future] = {}
+        with self._lock:
+            version = self._Sync()
+            for key in keys:
+                if key in self._entries:
+                    self._counts["hits"] += 1
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                    continue
+                inFlight = self._inFlight.get(key)
+                if inFlight is None or inFlight[0] != version:
+                    leading[key] = Future()
+                    self._inFlight[key] = (version, leading[key])
+                    self._counts["misses"] += 1
+                else:
+                    waiting[key] = inFlight[1]
+                    self._counts["coalesced"] += 1
+
+        if leading:
+            try:
+                computed = compute(list(leading))
+                values = {key: computed[key] for key in leading}
+            except BaseException as e:
+                with self._lock:
+                    for key, future in leading.items():
+                        self._Finish(key, future)
+                    self._counts["errors"] += 1
+                for future in leading.values():
+                    future.set_exception(e)
+                raise
+
+            with self._lock:
+                for key, future in leading.items():
+                    self._Finish(key, future)
+                    if version == self._version:
+                        self._entries[key] = values[key]
+                        self._entries.move_to_end(key)
+                while len(self._entries) > self.maxSize:
+                    self._entries.popitem(last=False)
+            for key, future in leading.items():
+                future.set_result(values[key])
+            found.update(values)
+
+        for key, future in waiting.items():
+            found[key] = future.result()
+        return {key: found[key] for key in keys}
+
+    def Clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def Metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts, size=len(self._entries), in_flight=len(self._inFlight), max_size=self.maxSize)
+
+_CACHES: Dict[str, SingleFlightCache] = {}
+
+def NamedCache(name: str, maxSize: int = 1024, version: Optional[Callable[[], int]] = None) -> SingleFlightCache:
+    """A SingleFlightCache reported by CacheMetrics, for callers that batch their lookups"""
+    cache = _CACHES[name] = SingleFlightCache(name, maxSize, version)
+    return cache
+
+def Cached(name: str, maxSize: int = 1024, version: Optional[Callable[[], int]] = None,
+           ignore: tuple = ("db",)):
+    """Decorate a crud function with a SingleFlightCache keyed on its arguments.
+
+    Arguments named in `ignore` (the database session) are left out of the
+    key; defaults are filled in so f(db, x) and f(db, x, 4) share an entry.
+    """
+    def Decorate(function: Callable) -> Callable:
+        signature = inspect.signature(function)
+        cache = NamedCache(name, maxSize, version)
+
+        @wraps(function)
+        def Wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(value for param, value in bound.arguments.items() if param not in ignore)
+            return cache.GetOrCompute(key, lambda: function(*args, **kwargs))
+
+        Wrapper.cache = cache
+        return Wrapper
+    return Decorate
+
+def CacheMetrics() -> Dict[str, Dict[str, int]]:
+    """Counters of every cache created through Cached, by name"""
+    return {name: cache.Metrics() for name, cache in _CACHES.items()}
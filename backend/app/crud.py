@@ -1,10 +1,24 @@
+import os
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, desc
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict
 from . import models
-
-_SIMILAR_CACHE: Dict[Tuple[str, int], List[Tuple[str, float]]] = {}
-
+from .cache import Cached, NamedCache
+from .db import DATABASE_PATH
+from .snapshots import DataVersion, DeitySnapshot
+
+SUMMARY_CACHE_SIZE = int(os.environ.get("RIGVEDA_SUMMARY_CACHE_SIZE", "512"))
+SIMILAR_CACHE_SIZE = int(os.environ.get("RIGVEDA_SIMILAR_CACHE_SIZE", "4096"))
+
+# Deity rankings, colors and stats are rebuilt only when a Data script commits
+_DATA_VERSION = DataVersion(DATABASE_PATH)
+_DEITY_SNAPSHOT = DeitySnapshot(_DATA_VERSION)
+# Keyed by hymn id; "" marks a hymn without a summary
+_SUMMARY_CACHE = NamedCache("summary", maxSize=SUMMARY_CACHE_SIZE, version=_DATA_VERSION.Current)
+
+# GetAllHymns and GetHymnsByDeities are no longer used by the routes (see
+# GetHymnRows); they remain for demo.py and as the old path that
+# check_fast_serialization compares against.
 def GetAllHymns(db: Session) -> List[models.HymnVector]:
     return db.query(models.HymnVector).order_by(models.HymnVector.book_number, models.HymnVector.hymn_number).all()
 
@@ -15,39 +29,21 @@ def GetHymnById(db: Session, hymnId: str) -> Optional[models.HymnVector]:
     return db.query(models.HymnVector).filter(models.HymnVector.hymn_id == hymnId).first()
 
 def GetSimilarHymns(db: Session, hymnId: str, limit: int = 8) -> List[tuple]:
-    # Fetch from both sides separately to leverage individual indexes
-    left = db.query(
-        models.HymnSimilarity.hymn2_id.label("other_id"),
-        models.HymnSimilarity.similarity
-    ).filter(
-        models.HymnSimilarity.hymn1_id == hymnId
-    ).order_by(desc(models.HymnSimilarity.similarity)).limit(limit).all()
-
-    right = db.query(
-        models.HymnSimilarity.hymn1_id.label("other_id"),
-        models.HymnSimilarity.similarity
+    """Top `limit` cosine neighbors (at most the NEIGHBORS_TOP_K stored per hymn)"""
+    # Both directions are stored pre-ranked, so this is one primary-key range scan
+    rows = db.query(
+        models.HymnNeighbor.other_id,
+        models.HymnNeighbor.similarity
     ).filter(
-        models.HymnSimilarity.hymn2_id == hymnId
-    ).order_by(desc(models.HymnSimilarity.similarity)).limit(limit).all()
-
-    combined: Dict[str, float] = {}
-    for oid, sim in left:
-        if oid not in combined or sim > combined[oid]:
-            combined[oid] = sim
-    for oid, sim in right:
-        if oid not in combined or sim > combined[oid]:
-            combined[oid] = sim
-
-    # Sort by similarity and take top N
-    sorted_pairs = sorted(combined.items(), key=lambda x: x[1], reverse=True)[:limit]
-    return [(oid, sim) for oid, sim in sorted_pairs]
+        models.HymnNeighbor.metric == "cosine",
+        models.HymnNeighbor.hymn_id == hymnId,
+        models.HymnNeighbor.rank <= limit
+    ).order_by(models.HymnNeighbor.rank).all()
+    return [(oid, sim) for oid, sim in rows]
 
+@Cached("diverse_similar", maxSize=SIMILAR_CACHE_SIZE, version=_DATA_VERSION.Current)
 def GetDiverseSimilarHymns(db: Session, hymnId: str, limit: int = 4) -> List[tuple]:
-    """Get similar hymns from different deities for diversity"""
-    cacheKey = (hymnId, limit)
-    cached = _SIMILAR_CACHE.get(cacheKey)
-    if cached is not None:
-        return cached
+    """Get similar hymns from different deities for diversity (cached; do not modify the result)"""
     # Get the source hymn's deity
     sourceHymn = GetHymnById(db, hymnId)
     if not sourceHymn:
@@ -82,57 +78,59 @@ def GetDiverseSimilarHymns(db: Session, hymnId: str, limit: int = 4) -> List[tup
                 if len(result) >= limit:
                     break
 
-    _SIMILAR_CACHE[cacheKey] = result
     return result
 
 def GetHymnsByIds(db: Session, hymnIds: List[str]) -> List[models.HymnVector]:
     return db.query(models.HymnVector).filter(models.HymnVector.hymn_id.in_(hymnIds)).all()
 
+def GetSummaries(db: Session, hymnIds: List[str]) -> Dict[str, str]:
+    """Summaries for the given hymns (hymns without one are left out), cached per hymn"""
+    def Fetch(missing: List[str]) -> Dict[str, str]:
+        rows = dict(db.query(models.HymnSummary.hymn_id, models.HymnSummary.summary)
+                    .filter(models.HymnSummary.hymn_id.in_(missing)).all())
+        return {hymnId: rows.get(hymnId) or "" for hymnId in missing}
+
+    return {hymnId: summary for hymnId, summary in _SUMMARY_CACHE.GetOrComputeMany(hymnIds, Fetch).items() if summary}
+
+def GetSummary(db: Session, hymnId: str) -> Optional[str]:
+    return GetSummaries(db, [hymnId]).get(hymnId)
+
 def GetDeityColors(db: Session) -> Dict[int, str]:
-    """Get mapping of deity_id to color"""
-    deities = db.query(models.DeityIndex.deity_id, models.DeityIndex.deity_color).all()
-    return {deity_id: color for deity_id, color in deities if color}
+    """Get mapping of deity_id to color (shared snapshot; do not modify)"""
+    return _DEITY_SNAPSHOT.Get().colors
 
 def GetTopNDeities(db: Session, n: int = 20) -> List[int]:
     """Get top N deities by number of hymns assigned (primary_deity_id)"""
-    from sqlalchemy import func
-
-    # Get deities ordered by count of hymns where they are the primary deity
-    result = db.query(
-        models.HymnVector.primary_deity_id,
-        func.count(models.HymnVector.hymn_id).label('hymn_count')
-    ).filter(
-        models.HymnVector.primary_deity_id.isnot(None)
-    ).group_by(
-        models.HymnVector.primary_deity_id
-    ).order_by(
-        desc('hymn_count')
-    ).limit(n).all()
-
-    return [deity_id for deity_id, count in result]
+    return _DEITY_SNAPSHOT.Get().ranking[:n]
 
 def GetHymnsByDeities(db: Session, deityIds: List[int]) -> List[models.HymnVector]:
     """Get all hymns that belong to the specified deities"""
     return db.query(models.HymnVector).filter(models.HymnVector.primary_deity_id.in_(deityIds)).order_by(models.HymnVector.book_number, models.HymnVector.hymn_number).all()
 
+# Row layout of GetHymnRows/GetHymnRowsByDeities, in schemas.HymnNode field order
+HYMN_NODE_COLUMNS = (
+    models.HymnVector.hymn_id,
+    models.HymnVector.title,
+    models.HymnVector.book_number,
+    models.HymnVector.hymn_number,
+    models.HymnVector.deity_names,
+    models.HymnVector.deity_count,
+    models.HymnVector.hymn_score,
+    models.HymnVector.primary_deity_id,
+    models.HymnVector.word_count,
+)
+
+def GetHymnRows(db: Session) -> List[tuple]:
+    """All hymns as HYMN_NODE_COLUMNS tuples in book order (no ORM objects, no deity vectors)"""
+    return db.query(*HYMN_NODE_COLUMNS).order_by(models.HymnVector.book_number, models.HymnVector.hymn_number).all()
+
+def GetHymnRowsByDeities(db: Session, deityIds: List[int]) -> List[tuple]:
+    """Hymns of the given deities as HYMN_NODE_COLUMNS tuples in book order"""
+    return db.query(*HYMN_NODE_COLUMNS).filter(models.HymnVector.primary_deity_id.in_(deityIds)).order_by(models.HymnVector.book_number, models.HymnVector.hymn_number).all()
+
 def GetDeityStats(db: Session) -> List[Dict]:
     """Get statistics for all deities including hymn count"""
-    deities = db.query(
-        models.DeityIndex.deity_id,
-        models.DeityIndex.deity_name,
-        models.DeityIndex.deity_color,
-        models.DeityIndex.deity_frequency
-    ).order_by(desc(models.DeityIndex.deity_frequency)).all()
-
-    return [
-        {
-            "deity_id": d.deity_id,
-            "deity_name": d.deity_name,
-            "deity_color": d.deity_color,
-            "hymn_count": d.deity_frequency
-        }
-        for d in deities if d.deity_color  # Only include deities with colors
-    ]
+    return _DEITY_SNAPSHOT.Get().stats
 
 def GetHymnLightByDeities(db: Session, deityIds: List[int]):
     rows = db.query(
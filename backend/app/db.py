@@ -1,9 +1,15 @@
-from sqlalchemy import create_engine, text
+import logging
+from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from pathlib import Path
 
+from Data.migrations import SCHEMA_VERSION, SchemaVersion
+
+logger = logging.getLogger(__name__)
+
 # Always use the bundled SQLite database inside the image
-DATABASE_URL = f"sqlite:///{Path(__file__).parent.parent.parent / 'hymn_vectors.db'}"
+DATABASE_PATH = Path(__file__).parent.parent.parent / 'hymn_vectors.db'
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -15,10 +21,10 @@ def GetDatabase():
     finally:
         db.close()
 
-def EnsureIndexes():
-    conn = engine.connect()
-    try:
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_hymn_sim_h1 ON hymn_similarities_cosine(hymn1_id)"))
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_hymn_sim_h2 ON hymn_similarities_cosine(hymn2_id)"))
-    finally:
-        conn.close()
+def CheckSchemaVersion() -> int:
+    """Warn if the database is behind the migrations; the API never runs DDL itself"""
+    version = SchemaVersion(DATABASE_PATH)
+    if version < SCHEMA_VERSION:
+        logger.warning("hymn_vectors.db is at schema version %d, expected %d; run Data/migrations.py",
+                       version, SCHEMA_VERSION)
+    return version
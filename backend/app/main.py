@@ -4,12 +4,17 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import ORJSONResponse
 from .routes import nodes
-from .db import EnsureIndexes
+from .admission import AdmissionControl, AdmissionMetrics
+from .cache import CacheMetrics
+from .db import CheckSchemaVersion
 
 app = FastAPI(title="Rigveda Hymn Similarity API", version="1.0.0", default_response_class=ORJSONResponse)
 # Compression
 app.add_middleware(GZipMiddleware, minimum_size=500)
 
+# Per-route concurrency limits; sheds with 503 + Retry-After when a queue is full
+app.add_middleware(AdmissionControl)
+
 # Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +29,11 @@ app.add_middleware(
 def HealthCheck():
     return {"status": "healthy"}
 
+# Admission queue depths and shed counts, and the crud cache counters
+@app.get("/metrics")
+def Metrics():
+    return {"admission": AdmissionMetrics(), "caches": CacheMetrics()}
+
 # Include API routes
 app.include_router(nodes.router, prefix="/api")
 
@@ -33,5 +43,5 @@ app.mount("/Data", StaticFiles(directory="Data"), name="data")
 # Serve static files (frontend) - must be last as catch-all
 app.mount("/", StaticFiles(directory="frontend", html=True), name="static")
 
-# Ensure DB indexes on startup
-EnsureIndexes()
+# Schema changes are applied by Data/migrations.py; only check the version here
+CheckSchemaVersion()
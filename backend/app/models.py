@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Text
+from sqlalchemy import Column, String, Integer, Float, Text, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -10,7 +10,7 @@ class HymnVector(Base):
     book_number = Column(Integer)
     hymn_number = Column(Integer)
     title = Column(Text)
-    deity_vector = Column(Text)
+    deity_vector = Column(LargeBinary)  # np.packbits of the 0/1 deity vector
     deity_names = Column(Text)
     deity_count = Column(Integer)
     hymn_score = Column(Float)
@@ -24,6 +24,21 @@ class HymnSimilarity(Base):
     hymn2_id = Column(String, primary_key=True)
     similarity = Column(Float)
 
+class HymnNeighbor(Base):
+    __tablename__ = "hymn_neighbors"
+
+    metric = Column(String, primary_key=True)
+    hymn_id = Column(String, primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 1 = most similar
+    other_id = Column(String)
+    similarity = Column(Float)
+
+class HymnSummary(Base):
+    __tablename__ = "hymn_summaries"
+
+    hymn_id = Column(String, primary_key=True)
+    summary = Column(Text)
+
 class DeityIndex(Base):
     __tablename__ = "deity_index"
     
@@ -1,64 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from .. import crud, schemas
+from .. import crud, schemas, semantic, serialize
 from ..db import GetDatabase
-import json
-import os
+from Data.corpus import OpenCorpus
 
 router = APIRouter()
 
-# Load summaries once at startup
-SUMMARIES = {}
-summaries_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'Data', 'JSONMaps', 'rigveda_summaries.json')
-if os.path.exists(summaries_path):
-    with open(summaries_path, 'r') as f:
-        SUMMARIES = json.load(f)
+MAX_SUMMARY_BATCH = 100
 
+# The list routes below return an ORJSONResponse built straight from row
+# tuples (see serialize.py); response_model only documents the schema.
 @router.get("/nodes", response_model=schemas.GraphResponse)
 def GetAllNodes(db: Session = Depends(GetDatabase)):
     """Get all hymn nodes with basic metadata"""
-    hymns = crud.GetAllHymns(db)
+    hymns = crud.GetHymnRows(db)
     deity_colors = crud.GetDeityColors(db)
-
-    nodes = [
-        schemas.HymnNode(
-            id=hymn.hymn_id,
-            title=hymn.title,
-            book_number=hymn.book_number,
-            hymn_number=hymn.hymn_number,
-            deity_names=hymn.deity_names or "",
-            deity_count=hymn.deity_count or 0,
-            hymn_score=hymn.hymn_score or 0.0,
-            primary_deity_id=hymn.primary_deity_id,
-            deity_color=deity_colors.get(hymn.primary_deity_id, "#95A5A6"),
-            word_count=getattr(hymn, 'word_count', None) or 0
-        )
-        for hymn in hymns
-    ]
-    return schemas.GraphResponse(nodes=nodes)
+    return serialize.NodesResponse(serialize.HymnNodes(hymns, deity_colors))
 
 @router.get("/graph/initial", response_model=schemas.GraphResponse)
 def GetInitialGraph(db: Session = Depends(GetDatabase)):
     """Get all hymns for initial graph"""
-    hymns = crud.GetAllHymns(db)
+    hymns = crud.GetHymnRows(db)
     deity_colors = crud.GetDeityColors(db)
-
-    nodes = [
-        schemas.HymnNode(
-            id=hymn.hymn_id,
-            title=hymn.title,
-            book_number=hymn.book_number,
-            hymn_number=hymn.hymn_number,
-            deity_names=hymn.deity_names or "",
-            deity_count=hymn.deity_count or 0,
-            hymn_score=hymn.hymn_score or 0.0,
-            primary_deity_id=hymn.primary_deity_id,
-            deity_color=deity_colors.get(hymn.primary_deity_id, "#95A5A6"),
-            word_count=getattr(hymn, 'word_count', None) or 0
-        )
-        for hymn in hymns
-    ]
-    return schemas.GraphResponse(nodes=nodes)
+    return serialize.NodesResponse(serialize.HymnNodes(hymns, deity_colors))
 
 @router.get("/graph/by-deities", response_model=schemas.GraphResponse)
 def GetGraphByTopDeities(n: int = 20, db: Session = Depends(GetDatabase)):
@@ -67,49 +31,17 @@ def GetGraphByTopDeities(n: int = 20, db: Session = Depends(GetDatabase)):
     topDeityIds = crud.GetTopNDeities(db, n)
 
     # Get hymns for these deities
-    hymns = crud.GetHymnsByDeities(db, topDeityIds)
+    hymns = crud.GetHymnRowsByDeities(db, topDeityIds)
     deity_colors = crud.GetDeityColors(db)
-
-    nodes = [
-        schemas.HymnNode(
-            id=hymn.hymn_id,
-            title=hymn.title,
-            book_number=hymn.book_number,
-            hymn_number=hymn.hymn_number,
-            deity_names=hymn.deity_names or "",
-            deity_count=hymn.deity_count or 0,
-            hymn_score=hymn.hymn_score or 0.0,
-            primary_deity_id=hymn.primary_deity_id,
-            deity_color=deity_colors.get(hymn.primary_deity_id, "#95A5A6"),
-            word_count=getattr(hymn, 'word_count', None) or 0
-        )
-        for hymn in hymns
-    ]
-    return schemas.GraphResponse(nodes=nodes)
+    return serialize.NodesResponse(serialize.HymnNodes(hymns, deity_colors))
 
 @router.get("/graph/light-by-deities", response_model=schemas.GraphLightResponse)
-def GetLightGraphByTopDeities(n: int = 20, response: Response = None, db: Session = Depends(GetDatabase)):
+def GetLightGraphByTopDeities(n: int = 20, db: Session = Depends(GetDatabase)):
     topDeityIds = crud.GetTopNDeities(db, n)
     hymns = crud.GetHymnLightByDeities(db, topDeityIds)
     deity_colors = crud.GetDeityColors(db)
-
-    nodes = [
-        schemas.HymnLightNode(
-            id=h[0],
-            title=h[1],
-            book_number=h[2],
-            hymn_number=h[3],
-            primary_deity_id=h[4],
-            deity_color=deity_colors.get(h[4], "#95A5A6"),
-            word_count=h[5] or 0
-        )
-        for h in hymns
-    ]
-
-    if response is not None:
-        response.headers["Cache-Control"] = "public, max-age=600"
-
-    return schemas.GraphLightResponse(nodes=nodes)
+    return serialize.NodesResponse(serialize.HymnLightNodes(hymns, deity_colors),
+                                   headers={"Cache-Control": "public, max-age=600"})
 
 @router.get("/deities/stats")
 def GetDeityStatistics(db: Session = Depends(GetDatabase)):
@@ -136,6 +68,7 @@ def GetNodeWithNeighbors(hymnId: str, limit: int = 4, db: Session = Depends(GetD
     
     # Create similarity lookup
     similarityLookup = {sim[0]: sim[1] for sim in similarHymns}
+    summaries = crud.GetSummaries(db, neighborIds)
     
     # Build response
     node = schemas.HymnNode(
@@ -163,10 +96,79 @@ def GetNodeWithNeighbors(hymnId: str, limit: int = 4, db: Session = Depends(GetD
             similarity=similarityLookup[neighbor.hymn_id],
             primary_deity_id=neighbor.primary_deity_id,
             deity_color=deity_colors.get(neighbor.primary_deity_id, "#95A5A6"),
-            summary=SUMMARIES.get(neighbor.hymn_id, ""),
+            summary=summaries.get(neighbor.hymn_id, ""),
             word_count=getattr(neighbor, 'word_count', None) or 0
         )
         for neighbor in neighborHymns
     ]
     
     return schemas.NodeResponse(node=node, neighbors=neighbors)
+
+@router.get("/hymn/{hymnId}/text", response_model=schemas.HymnText)
+def GetHymnText(hymnId: str):
+    """Get the English translation of a hymn from the memory-mapped corpus"""
+    # Built at image build time; the request path never builds or re-checks it
+    try:
+        hymn = OpenCorpus().GetHymn(hymnId)
+    except FileNotFoundError:
+        raise HTTPException(status_code=503, detail="Hymn corpus not available")
+    if hymn is None:
+        raise HTTPException(status_code=404, detail="Hymn not found")
+    return schemas.HymnText(id=hymn.hymn_id, title=hymn.title, book_number=hymn.book_number,
+                            hymn_number=hymn.hymn_number, text=hymn.text.strip())
+
+@router.get("/hymn/{hymnId}/summary", response_model=schemas.HymnSummary)
+def GetHymnSummary(hymnId: str, response: Response, db: Session = Depends(GetDatabase)):
+    """Get the one-sentence summary of a hymn"""
+    summary = crud.GetSummary(db, hymnId)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    response.headers["Cache-Control"] = "public, max-age=600"
+    return schemas.HymnSummary(id=hymnId, summary=summary)
+
+@router.get("/hymns/summaries", response_model=schemas.HymnSummariesResponse)
+def GetHymnSummaries(ids: str, db: Session = Depends(GetDatabase)):
+    """Get summaries for a comma-separated list of hymn ids; hymns without one are left out"""
+    hymnIds = list(dict.fromkeys(hymnId for hymnId in (part.strip() for part in ids.split(",")) if hymnId))
+    if len(hymnIds) > MAX_SUMMARY_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SUMMARY_BATCH} ids per request")
+    return schemas.HymnSummariesResponse(summaries=crud.GetSummaries(db, hymnIds))
+
+@router.get("/semantic-search", response_model=schemas.SemanticSearchResponse)
+def SemanticSearch(q: str, limit: int = 10, db: Session = Depends(GetDatabase)):
+    """Find hymns whose summaries are closest in meaning to free text"""
+    query = q.strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    limit = max(1, min(limit, 50))
+
+    try:
+        matches = semantic.SearchSummaries(query, limit)
+    except semantic.EmbeddingStoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    deity_colors = crud.GetDeityColors(db)
+    matchIds = [hymnId for hymnId, _ in matches]
+    hymnsById = {hymn.hymn_id: hymn for hymn in crud.GetHymnsByIds(db, matchIds)}
+    summaries = crud.GetSummaries(db, matchIds)
+
+    results = [
+        schemas.HymnNeighbor(
+            id=hymn.hymn_id,
+            title=hymn.title,
+            book_number=hymn.book_number,
+            hymn_number=hymn.hymn_number,
+            deity_names=hymn.deity_names or "",
+            deity_count=hymn.deity_count or 0,
+            hymn_score=hymn.hymn_score or 0.0,
+            similarity=similarity,
+            primary_deity_id=hymn.primary_deity_id,
+            deity_color=deity_colors.get(hymn.primary_deity_id, "#95A5A6"),
+            summary=summaries.get(hymn.hymn_id, ""),
+            word_count=getattr(hymn, 'word_count', None) or 0
+        )
+        for hymnId, similarity in matches
+        if (hymn := hymnsById.get(hymnId)) is not None
+    ]
+
+    return schemas.SemanticSearchResponse(query=query, results=results)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List
 
 class HymnNode(BaseModel):
     id: str
@@ -45,3 +45,21 @@ class GraphResponse(BaseModel):
 
 class GraphLightResponse(BaseModel):
     nodes: List[HymnLightNode]
+
+class HymnText(BaseModel):
+    id: str
+    title: str
+    book_number: int
+    hymn_number: int
+    text: str
+
+class HymnSummary(BaseModel):
+    id: str
+    summary: str
+
+class HymnSummariesResponse(BaseModel):
+    summaries: Dict[str, str]
+
+class SemanticSearchResponse(BaseModel):
+    query: str
+    results: List[HymnNeighbor]
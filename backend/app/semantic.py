@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Written by Data/semantic_similarity.py
+EMBEDDINGS_DIR = Path(__file__).parent.parent.parent / "Data" / "Embeddings"
+EMBEDDINGS_PATH = EMBEDDINGS_DIR / "summary_embeddings.npy"
+EMBEDDINGS_META_PATH = EMBEDDINGS_DIR / "summary_embeddings.json"
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+QUERY_CACHE_SIZE = int(os.environ.get("RIGVEDA_QUERY_CACHE_SIZE", "1024"))
+MAX_BATCH_SIZE = 32
+BATCH_WAIT_SECONDS = 0.005
+
+class EmbeddingStoreUnavailable(RuntimeError):
+    """Raised when the summary embedding store is missing or unusable"""
+
+class SentenceTransformerEncoder:
+    """Encode text with a SentenceTransformer model, loaded on first use"""
+
+    def __init__(self, modelName: str = DEFAULT_MODEL_NAME):
+        self.modelName = modelName
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _GetModel(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.modelName)
+        return self._model
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._GetModel().encode(texts, batch_size=MAX_BATCH_SIZE), dtype=np.float32)
+
+class HashingEncoder:
+    """Deterministic bag-of-words encoder for tests and offline use"""
+
+    def __init__(self, dimension: int = 768, modelName: str = "hashing"):
+        self.dimension = dimension
+        self.modelName = modelName
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest, "little")
+                sign = 1.0 if bucket & 1 else -1.0
+                vectors[row, (bucket >> 1) % self.dimension] += sign
+        return vectors
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU cache of query embeddings"""
+
+    def __init__(self, maxSize: int = QUERY_CACHE_SIZE):
+        self.maxSize = maxSize
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def Get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def Put(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxSize:
+                self._entries.popitem(last=False)
+
+    def Clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class MicroBatcher:
+    """Coalesce concurrent encode calls into a single batched encoder call.
+
+    The first caller to arrive becomes the leader: it waits briefly for other
+    threads to queue their texts, then encodes everything pending at once and
+    hands each caller its own row.
+    """
+
+    def __init__(self, encoder: Callable[[List[str]], np.ndarray],
+                 maxBatchSize: int = MAX_BATCH_SIZE, maxWaitSeconds: float = BATCH_WAIT_SECONDS):
+        self.encoder = encoder
+        self.maxBatchSize = maxBatchSize
+        self.maxWaitSeconds = maxWaitSeconds
+        self._pending: List[Tuple[str, Future]] = []
+        self._draining = False
+        self._lock = threading.Lock()
+
+    def Encode(self, text: str) -> np.ndarray:
+        future: Future = Future()
+        with self._lock:
+            self._pending.append((text, future))
+            isLeader = not self._draining
+            self._draining = True
+        if isLeader:
+            time.sleep(self.maxWaitSeconds)
+            self._Drain()
+        return future.result()
+
+    def _Drain(self) -> None:
+        while True:
+            with self._lock:
+                batch = self._pending[:self.maxBatchSize]
+                del self._pending[:self.maxBatchSize]
+                if not batch:
+                    self._draining = False
+                    return
+
+            uniqueTexts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = self.encoder(uniqueTexts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            rows = {text: vectors[i] for i, text in enumerate(uniqueTexts)}
+            for text, future in batch:
+                future.set_result(rows[text])
+
+class EmbeddingIndex:
+    """Unit-normalized summary embeddings with brute-force top-k search"""
+
+    def __init__(self, hymnIds: List[str], embeddings: np.ndarray, modelName: str):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.hymnIds = hymnIds
+        self.matrix = (embeddings / norms).astype(np.float32)
+        self.modelName = modelName
+
+    @classmethod
+    def Load(cls, embeddingsPath: Path = EMBEDDINGS_PATH, metaPath: Path = EMBEDDINGS_META_PATH) -> "EmbeddingIndex":
+        if not embeddingsPath.exists() or not metaPath.exists():
+            raise EmbeddingStoreUnavailable(f"Embedding store not found at {embeddingsPath}")
+        with open(metaPath, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        embeddings = np.load(embeddingsPath, mmap_mode="r")
+        if embeddings.shape[0] != len(meta["ids"]):
+            raise EmbeddingStoreUnavailable("Embedding store ids do not match matrix rows")
+        return cls(meta["ids"], np.asarray(embeddings, dtype=np.float32), meta.get("model", DEFAULT_MODEL_NAME))
+
+    def Search(self, queryVector: np.ndarray, limit: int) -> List[Tuple[str, float]]:
+        if queryVector.shape[-1] != self.matrix.shape[1]:
+            raise EmbeddingStoreUnavailable("Query encoder dimension does not match embedding store")
+        norm = float(np.linalg.norm(queryVector))
+        if norm == 0.0:
+            return []
+        scores = self.matrix @ (queryVector.astype(np.float32) / norm)
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.hymnIds[i], float(scores[i])) for i in top]
+
+class SemanticSearcher:
+    """Embed free-text queries and rank hymns against the summary embeddings"""
+
+    def __init__(self, encoder: Callable[[List[str]], np.ndarray], index: EmbeddingIndex,
+                 cacheSize: int = QUERY_CACHE_SIZE):
+        # Equal dimensions do not make vectors comparable; the models must match
+        encoderModel = getattr(encoder, "modelName", None)
+        if encoderModel != index.modelName:
+            raise EmbeddingStoreUnavailable(
+                f"Query encoder model {encoderModel!r} does not match embedding store model {index.modelName!r}")
+        self.encoder = encoder
+        self.index = index
+        self.cache = QueryEmbeddingCache(cacheSize)
+        self.batcher = MicroBatcher(encoder)
+
+    def EmbedQuery(self, query: str) -> np.ndarray:
+        key = " ".join(query.split())
+        vector = self.cache.Get(key)
+        if vector is None:
+            vector = self.batcher.Encode(key)
+            self.cache.Put(key, vector)
+        return vector
+
+    def Search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        return self.index.Search(self.EmbedQuery(query), limit)
+
+_ENCODERS: Dict[str, Callable[[], Callable[[List[str]], np.ndarray]]] = {
+    "sentence-transformers": SentenceTransformerEncoder,
+    "hashing": HashingEncoder,
+}
+
+_searcher: Optional[SemanticSearcher] = None
+_searcherLock = threading.Lock()
+
+def CreateEncoder(name: Optional[str] = None) -> Callable[[List[str]], np.ndarray]:
+    """Build the query encoder named by RIGVEDA_ENCODER (default: sentence-transformers)"""
+    name = name or os.environ.get("RIGVEDA_ENCODER", "sentence-transformers")
+    if name not in _ENCODERS:
+        raise ValueError(f"Unknown encoder: {name}")
+    return _ENCODERS[name]()
+
+def GetSearcher() -> SemanticSearcher:
+    """Return the per-process searcher, loading the encoder and store once.
+
+    Raises EmbeddingStoreUnavailable if the store is missing or was built
+    with a different model than the query encoder.
+    """
+    global _searcher
+    if _searcher is None:
+        with _searcherLock:
+            if _searcher is None:
+                _searcher = SemanticSearcher(CreateEncoder(), EmbeddingIndex.Load())
+    return _searcher
+
+def SetSearcher(searcher: Optional[SemanticSearcher]) -> None:
+    """Install a searcher (e.g. one built on HashingEncoder), or reset with None"""
+    global _searcher
+    with _searcherLock:
+        _searcher = searcher
+
+def SearchSummaries(query: str, limit: int = 10) -> List[Tuple[str, float]]:
+    return GetSearcher().Search(query, limit)
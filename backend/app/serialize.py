@@ -0,0 +1,56 @@
+"""
+Fast serialization for the bulk list endpoints.
+
+Building one pydantic model per hymn, then having FastAPI validate and dump
+them again against response_model, costs more than the query. These
+helpers turn crud row tuples straight into plain dicts with the same keys,
+order and types as schemas.HymnNode / HymnLightNode. The result is returned
+as an ORJSONResponse, which FastAPI sends as is. Routes keep response_model
+for the OpenAPI schema.
+
+backend/check_fast_serialization.py checks that the bytes match the pydantic
+path.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from fastapi.responses import ORJSONResponse
+
+DEFAULT_DEITY_COLOR = "#95A5A6"
+
+def HymnNodes(rows: Iterable[tuple], deityColors: Dict[int, str]) -> List[Dict]:
+    """schemas.HymnNode dicts from crud.HYMN_NODE_COLUMNS rows"""
+    return [
+        {
+            "id": hymnId,
+            "title": title,
+            "book_number": bookNumber,
+            "hymn_number": hymnNumber,
+            "deity_names": deityNames or "",
+            "deity_count": deityCount or 0,
+            "hymn_score": float(hymnScore or 0.0),  # pydantic turns an int score into a float
+            "primary_deity_id": primaryDeityId,
+            "deity_color": deityColors.get(primaryDeityId, DEFAULT_DEITY_COLOR),
+            "word_count": wordCount or 0,
+        }
+        for hymnId, title, bookNumber, hymnNumber, deityNames, deityCount, hymnScore, primaryDeityId, wordCount in rows
+    ]
+
+def HymnLightNodes(rows: Iterable[tuple], deityColors: Dict[int, str]) -> List[Dict]:
+    """schemas.HymnLightNode dicts from crud.GetHymnLightByDeities rows"""
+    return [
+        {
+            "id": hymnId,
+            "title": title,
+            "book_number": bookNumber,
+            "hymn_number": hymnNumber,
+            "primary_deity_id": primaryDeityId,
+            "deity_color": deityColors.get(primaryDeityId, DEFAULT_DEITY_COLOR),
+            "word_count": wordCount or 0,
+        }
+        for hymnId, title, bookNumber, hymnNumber, primaryDeityId, wordCount in rows
+    ]
+
+def NodesResponse(nodes: List[Dict], headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """{"nodes": [...]} serialized by orjson, bypassing response_model validation"""
+    return ORJSONResponse({"nodes": nodes}, headers=headers)
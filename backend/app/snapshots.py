@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+class DataVersion:
+    """PRAGMA data_version on a dedicated connection.
+
+    The value changes whenever another connection commits to the database
+    (e.g. a Data pipeline script), so comparing it with the value seen at
+    build time tells whether derived data is stale. Reading it costs about
+    a microsecond.
+    """
+
+    def __init__(self, dbPath: Path):
+        self.dbPath = dbPath
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def Fetch(self, sql: str) -> List[tuple]:
+        """Run a read query on the watching connection"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.dbPath, check_same_thread=False)
+            return self._conn.execute(sql).fetchall()
+
+    def Current(self) -> int:
+        return self.Fetch("PRAGMA data_version")[0][0]
+
+RANKING_SQL = """
+    SELECT primary_deity_id, COUNT(hymn_id) AS hymn_count
+    FROM hymn_vectors
+    WHERE primary_deity_id IS NOT NULL
+    GROUP BY primary_deity_id
+    ORDER BY hymn_count DESC
+"""
+
+DEITIES_SQL = """
+    SELECT deity_id, deity_name, deity_color, deity_frequency
+    FROM deity_index
+    ORDER BY deity_frequency DESC
+"""
+
+@dataclass(frozen=True)
+class DeityData:
+    ranking: List[int]  # deity ids by number of hymns they are primary for, most first
+    colors: Dict[int, str]  # deity_id -> color, deities without a color left out
+    stats: List[Dict]  # as returned by /api/deities/stats
+
+class DeitySnapshot:
+    """Deity rankings, colors and stats computed once per database version"""
+
+    def __init__(self, version: DataVersion):
+        self.version = version
+        self._data: Optional[DeityData] = None
+        self._builtAt: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def Get(self) -> DeityData:
+        current = self.version.Current()
+        if self._data is not None and self._builtAt == current:
+            return self._data
+        with self._lock:
+            current = self.version.Current()
+            if self._data is None or self._builtAt != current:
+                self._data = self._Build()
+                self._builtAt = current
+            return self._data
+
+    def _Build(self) -> DeityData:
+        ranking = [deityId for deityId, _ in self.version.Fetch(RANKING_SQL)]
+        deities = self.version.Fetch(DEITIES_SQL)
+
+        colors = {deityId: color for deityId, _, color, _ in deities if color}
+        stats = [
+            {
+                "deity_id": deityId,
+                "deity_name": name,
+                "deity_color": color,
+                "hymn_count": frequency
+            }
+            for deityId, name, color, frequency in deities if color  # Only include deities with colors
+        ]
+        return DeityData(ranking=ranking, colors=colors, stats=stats)
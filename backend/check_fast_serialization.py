@@ -0,0 +1,140 @@
+"""
+Check that the fast list endpoints return the same bytes as the pydantic path.
+
+/api/nodes, /api/graph/initial, /api/graph/by-deities and
+/api/graph/light-by-deities build their JSON straight from row tuples (see
+app/serialize.py). For each one this builds the response the old way, with
+schemas.HymnNode / HymnLightNode models from ORM rows serialized through
+FastAPI's response_model handling. It then compares that with the bytes
+the endpoint returns. It also checks that the OpenAPI schema still
+documents the response models, and prints the time each path takes.
+
+Run from the repository root:
+
+    python -m backend.check_fast_serialization
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from typing import Callable, List, Tuple
+
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from fastapi.testclient import TestClient
+
+from .app import crud, schemas, serialize
+from .app.db import SessionLocal
+from .app.main import app
+from .app.routes import nodes
+
+def _PydanticNodes(hymns, deityColors) -> schemas.GraphResponse:
+    # The model-per-hymn construction the routes used before the fast path
+    return schemas.GraphResponse(nodes=[
+        schemas.HymnNode(
+            id=hymn.hymn_id,
+            title=hymn.title,
+            book_number=hymn.book_number,
+            hymn_number=hymn.hymn_number,
+            deity_names=hymn.deity_names or "",
+            deity_count=hymn.deity_count or 0,
+            hymn_score=hymn.hymn_score or 0.0,
+            primary_deity_id=hymn.primary_deity_id,
+            deity_color=deityColors.get(hymn.primary_deity_id, "#95A5A6"),
+            word_count=getattr(hymn, 'word_count', None) or 0
+        )
+        for hymn in hymns
+    ])
+
+def _PydanticLightNodes(rows, deityColors) -> schemas.GraphLightResponse:
+    return schemas.GraphLightResponse(nodes=[
+        schemas.HymnLightNode(
+            id=h[0],
+            title=h[1],
+            book_number=h[2],
+            hymn_number=h[3],
+            primary_deity_id=h[4],
+            deity_color=deityColors.get(h[4], "#95A5A6"),
+            word_count=h[5] or 0
+        )
+        for h in rows
+    ])
+
+def _Cases(db) -> List[Tuple[str, Callable, Callable]]:
+    """(url, pydantic path, fast path); both build the response from fresh queries"""
+    colors = crud.GetDeityColors(db)
+    cases = [
+        ("/api/nodes",
+         lambda: _PydanticNodes(crud.GetAllHymns(db), colors),
+         lambda: serialize.HymnNodes(crud.GetHymnRows(db), colors)),
+        ("/api/graph/initial",
+         lambda: _PydanticNodes(crud.GetAllHymns(db), colors),
+         lambda: serialize.HymnNodes(crud.GetHymnRows(db), colors)),
+    ]
+    for n in (20, 5):
+        deityIds = crud.GetTopNDeities(db, n)
+        cases += [
+            (f"/api/graph/by-deities?n={n}",
+             lambda deityIds=deityIds: _PydanticNodes(crud.GetHymnsByDeities(db, deityIds), colors),
+             lambda deityIds=deityIds: serialize.HymnNodes(crud.GetHymnRowsByDeities(db, deityIds), colors)),
+            (f"/api/graph/light-by-deities?n={n}",
+             lambda deityIds=deityIds: _PydanticLightNodes(crud.GetHymnLightByDeities(db, deityIds), colors),
+             lambda deityIds=deityIds: serialize.HymnLightNodes(crud.GetHymnLightByDeities(db, deityIds), colors)),
+        ]
+    return cases
+
+def _Route(path: str) -> APIRoute:
+    # Routes are registered on nodes.router, mounted under /api
+    return next(route for route in nodes.router.routes if "/api" + route.path == path)
+
+def PydanticBytes(path: str, model) -> bytes:
+    """Serialize model the way FastAPI does for a route returning it under response_model"""
+    content = asyncio.run(serialize_response(field=_Route(path).response_field, response_content=model))
+    return ORJSONResponse(content).body
+
+def _MedianMs(call: Callable, repeat: int = 15) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - started)
+    return 1000 * statistics.median(times)
+
+def main() -> int:
+    client = TestClient(app)
+    schema = app.openapi()
+    failures = 0
+    db = SessionLocal()
+    try:
+        for url, pydanticPath, fastPath in _Cases(db):
+            path = url.split("?")[0]
+            response = client.get(url)
+            expected = PydanticBytes(path, pydanticPath())
+
+            problems = []
+            if response.status_code != 200:
+                problems.append(f"status {response.status_code}")
+            if response.content != expected:
+                problems.append(f"body differs ({len(response.content)} bytes vs {len(expected)} expected)")
+            documented = schema["paths"][path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+            if documented != {"$ref": f"#/components/schemas/{_Route(path).response_model.__name__}"}:
+                problems.append(f"OpenAPI response schema is {documented}")
+            if path.endswith("light-by-deities") and response.headers.get("cache-control") != "public, max-age=600":
+                problems.append("Cache-Control header missing")
+
+            slowMs = _MedianMs(lambda: PydanticBytes(path, pydanticPath()))
+            fastMs = _MedianMs(lambda: serialize.NodesResponse(fastPath()).body)
+            print(f"{'✗' if problems else '✓'} {url}: {len(response.content)} bytes, "
+                  f"pydantic {slowMs:.1f} ms, fast {fastMs:.1f} ms")
+            for problem in problems:
+                print(f"    !! {problem}")
+            failures += bool(problems)
+    finally:
+        db.close()
+
+    print(f"\n{'All responses identical' if not failures else f'{failures} endpoint(s) differ'}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Check the query plans of every query the API runs against hymn_vectors.db.
+
+Calls each crud function with representative arguments, captures the SQL it
+sends to SQLite, and runs EXPLAIN QUERY PLAN on it. A query fails the check
+if its plan reads a table without an index ("SCAN hymn_vectors") or sorts
+rows in a temporary B-tree. Walking an index in order ("SCAN ... USING
+INDEX") is fine.
+
+Run from the repository root after rebuilding and migrating the database
+(it never modifies the database):
+
+    python -m backend.check_query_plans
+"""
+
+import re
+import sys
+from typing import Callable, List, Sequence, Tuple
+
+from sqlalchemy import event
+
+from Data.migrations import SCHEMA_VERSION, SchemaVersion
+from .app import crud, models
+from .app.db import DATABASE_PATH, SessionLocal, engine
+from .app.snapshots import RANKING_SQL, DEITIES_SQL
+
+TABLE_SCAN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?$")
+TEMP_BTREE = "TEMP B-TREE"
+
+# Queries allowed a temp B-tree, with the reason
+SORT_ALLOWED = {
+    RANKING_SQL: "orders by an aggregate; runs once per database version",
+}
+
+def _Cases(db) -> List[Tuple[str, Callable]]:
+    hymnIds = [hymnId for hymnId, in db.query(models.HymnVector.hymn_id).limit(5)]
+    hymnId = hymnIds[0]
+    deityIds = crud.GetTopNDeities(db, 20)
+    return [
+        ("GetHymnRows", lambda: crud.GetHymnRows(db)),
+        ("GetTopHymnsByScore", lambda: crud.GetTopHymnsByScore(db, 20)),
+        ("GetHymnById", lambda: crud.GetHymnById(db, hymnId)),
+        ("GetSimilarHymns", lambda: crud.GetSimilarHymns(db, hymnId, 8)),
+        ("GetHymnsByIds", lambda: crud.GetHymnsByIds(db, hymnIds)),
+        ("GetSummaries", lambda: crud.GetSummaries(db, hymnIds)),
+        ("GetHymnRowsByDeities", lambda: crud.GetHymnRowsByDeities(db, deityIds)),
+        ("GetHymnLightByDeities", lambda: crud.GetHymnLightByDeities(db, deityIds)),
+    ]
+
+def CaptureQueries(call: Callable) -> List[Tuple[str, Sequence]]:
+    """Statements (with parameters) executed by call()"""
+    captured = []
+    def Capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", Capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", Capture)
+    return captured
+
+def ExplainQuery(sql: str, parameters: Sequence = ()) -> List[str]:
+    rawConn = engine.raw_connection()
+    try:
+        return [row[3] for row in rawConn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+    finally:
+        rawConn.close()
+
+def PlanProblems(sql: str, plan: List[str]) -> List[str]:
+    problems = []
+    for detail in plan:
+        if TABLE_SCAN.match(detail):
+            problems.append(f"table scan: {detail}")
+        if TEMP_BTREE in detail and sql not in SORT_ALLOWED:
+            problems.append(f"sort: {detail}")
+    return problems
+
+def main() -> int:
+    # Only inspects the database; the indexes it checks come from the migrations
+    version = SchemaVersion(DATABASE_PATH)
+    if version != SCHEMA_VERSION:
+        print(f"✗ hymn_vectors.db is at schema version {version}, expected {SCHEMA_VERSION}; "
+              f"run Data/migrations.py first")
+        return 1
+    crud._SUMMARY_CACHE.Clear()  # so GetSummaries reaches the database
+
+    queries: List[Tuple[str, str, Sequence]] = [
+        ("DeitySnapshot ranking", RANKING_SQL, ()),
+        ("DeitySnapshot deities", DEITIES_SQL, ()),
+    ]
+    db = SessionLocal()
+    try:
+        for name, call in _Cases(db):
+            statements = CaptureQueries(call)
+            if not statements:
+                print(f"✗ {name}: ran no query")
+                return 1
+            queries.extend((name, sql, parameters) for sql, parameters in statements)
+    finally:
+        db.close()
+
+    failures = 0
+    for name, sql, parameters in queries:
+        plan = ExplainQuery(sql, parameters)
+        problems = PlanProblems(sql, plan)
+        print(f"{'✗' if problems else '✓'} {name}")
+        for detail in plan:
+            print(f"    {detail}")
+        for problem in problems:
+            print(f"    !! {problem}")
+        failures += bool(problems)
+
+    print(f"\n{len(queries) - failures}/{len(queries)} query plans OK")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
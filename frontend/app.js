@@ -21,7 +21,7 @@ class HymnSimilarityMap
 
 		this.hymnTexts = {}; // Cache for hymn texts
 		this.deityIdToName = {}; // deity_id -> deity_name
-        this.summaries = null; // cache summaries JSON
+        this.summaries = new Map(); // hymn id -> summary, fetched on demand
 
         this.InitializeSvg();
         this.InitializeSimulation();
@@ -565,13 +565,10 @@ class HymnSimilarityMap
         // Load once if not loaded
         if (!container.dataset.loaded) {
             try {
-                const hymnPath = `/Data/rigveda_texts/book_${bookNumber}/hymn_${nodeId}.txt`;
-                const textResponse = await fetch(hymnPath);
+                const textResponse = await fetch(`/api/hymn/${nodeId}/text`);
                 if (textResponse.ok) {
-                    const fullText = await textResponse.text();
-                    const parts = fullText.split('==================================================');
-                    const hymnText = (parts.length > 1 ? parts[1] : fullText).trim();
-                    container.innerHTML = hymnText;
+                    const hymn = await textResponse.json();
+                    container.innerHTML = hymn.text;
                 } else {
                     container.textContent = 'Translation not available.';
                 }
@@ -943,17 +940,19 @@ class HymnSimilarityMap
         infoPanel.style("display", "block");
         backdrop.style("display", "block");
 
-        // Fetch summary once and cache
-        let summary = "Loading summary...";
-        try {
-            if (!this.summaries) {
-                const summaryResponse = await fetch('/Data/JSONMaps/rigveda_summaries.json');
-                this.summaries = await summaryResponse.json();
+        // Fetch this hymn's summary once and cache it
+        let summary = this.summaries.get(nodeId);
+        if (summary === undefined) {
+            try {
+                const summaryResponse = await fetch(`/api/hymn/${nodeId}/summary`);
+                summary = summaryResponse.ok ? (await summaryResponse.json()).summary : "Summary not available.";
+                if (summaryResponse.ok || summaryResponse.status === 404) {
+                    this.summaries.set(nodeId, summary);
+                }
+            } catch (error) {
+                console.error('Error loading summary:', error);
+                summary = "Summary not available.";
             }
-            summary = this.summaries[nodeId] || "Summary not available.";
-        } catch (error) {
-            console.error('Error loading summary:', error);
-            summary = "Summary not available.";
         }
 
 		// English translation will be loaded on demand via button